@@ -0,0 +1,67 @@
+"""
+python -m benchmarks [--filter evm] [--latency 0.005] [--error-rate 0.01] [--save]
+
+Runs the cases against local mock nodes, prints throughput and p50/p99 latency and compares them with
+the saved baseline. Exits with 1 when a case regressed by more than the threshold or failed more calls
+than the baseline and --error-rate allow
+"""
+import argparse
+import os
+import sys
+
+from wallet import metrics
+
+from benchmarks.suite import (CASES, DEFAULT_ITERATIONS, THRESHOLD, WARMUP, compare, format_results, load_baseline,
+                              run, save_baseline)
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--filter', default='', help='run cases whose name contains this text')
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument('--warmup', type=int, default=WARMUP)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every mock request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of mock requests that fail')
+    parser.add_argument('--max-batch', type=int, default=None, help='JSON-RPC batch limit of the mocks')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--save', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--metrics', action='store_true', help='print per method request metrics')
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if args.filter in case.name]
+    settings = {'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+                'max_batch': args.max_batch, 'iterations': args.iterations}
+    collector = metrics.add_hook(metrics.Collector()) if args.metrics else None
+    results = run(cases, args.iterations, args.warmup,
+                  {'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+                   'max_batch': args.max_batch})
+    baseline = None if args.save else load_baseline(args.baseline)
+    if baseline is not None and baseline['settings'] != settings:
+        print(f"Baseline was recorded with {baseline['settings']}, not comparing", file=sys.stderr)
+        baseline = None
+    print(format_results(results, baseline))
+
+    if collector is not None:
+        print()
+        for row in collector.summary():
+            print(f"{row['network'] or '':<14}{row['kind']:<8}{row['method']:<40}{row['count']:>8}"
+                  f"{row['errors']:>6}{row['p50'] * 1000:>10.3f} ms")
+
+    # Failed calls are checked with or without a baseline, a run with unexpected errors is never saved
+    regressions = compare(results, baseline, args.threshold, args.error_rate)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if regressions:
+        return 1
+    if args.save:
+        save_baseline(args.baseline, results, settings)
+        print(f"Baseline saved to {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
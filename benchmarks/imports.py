@@ -0,0 +1,123 @@
+"""
+python -m benchmarks.imports [--repeat 7] [--save]
+
+Times `import wallet` and every adapter module in fresh interpreters and checks that no dependency
+of another chain gets loaded. Exits with 1 when an import is over its budget, slower than the saved
+baseline by more than the threshold, or loads a forbidden module
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from benchmarks.suite import load_baseline
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'imports.json')
+DEFAULT_REPEAT = 7
+THRESHOLD = 0.2  # relative slowdown that fails a run
+
+EVM_MODULES = ('web3', 'eth_account', 'eth_abi', 'hexbytes')
+TRON_MODULES = ('tronpy',)
+SOLANA_MODULES = ('solana', 'solders')
+PARALLEL_MODULES = ('multiprocessing',)
+
+# module: (budget in seconds, top level packages it must not load)
+TARGETS: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    'wallet': (0.3, EVM_MODULES + TRON_MODULES + SOLANA_MODULES + PARALLEL_MODULES + ('requests', 'httpx', 'pydantic')),
+    'wallet.adapters.w3': (2.0, TRON_MODULES + SOLANA_MODULES),
+    'wallet.adapters.tron': (1.0, ('web3', 'eth_account') + SOLANA_MODULES),
+    'wallet.adapters.solana': (1.0, EVM_MODULES + TRON_MODULES + ('requests',)),
+}
+
+# Runs in a fresh interpreter, wallet is imported first so adapter times exclude the package itself
+PROBE = '''
+import json, sys, time
+import_wallet = {import_wallet}
+if import_wallet:
+    import wallet
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted({{name.split('.')[0] for name in sys.modules}})}}))
+'''
+
+
+class ImportResult(NamedTuple):
+    name: str
+    seconds: float  # median of the runs
+    budget: float
+    leaked: List[str]  # forbidden packages that were loaded
+
+
+def probe(module: str) -> dict:
+    code = PROBE.format(module=module, import_wallet=module != 'wallet')
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def measure(module: str, repeat: int = DEFAULT_REPEAT) -> ImportResult:
+    budget, forbidden = TARGETS[module]
+    runs = [probe(module) for _ in range(repeat)]
+    loaded = set(runs[0]['modules'])
+    return ImportResult(module, statistics.median(run['seconds'] for run in runs), budget,
+                        sorted(loaded.intersection(forbidden)))
+
+
+def save_baseline(path: str, results: List[ImportResult]):
+    with open(path, 'w') as f:
+        json.dump({'results': {result.name: result._asdict() for result in results}}, f, indent=2, sort_keys=True)
+
+
+def check(results: List[ImportResult], baseline: Optional[dict], threshold: float = THRESHOLD) -> List[str]:
+    """
+    :return: a message per import over budget, slower than the baseline or loading forbidden modules
+    """
+    problems = []
+    for result in results:
+        if result.leaked:
+            problems.append(f"{result.name}: loads {', '.join(result.leaked)}")
+        if result.seconds > result.budget:
+            problems.append(f"{result.name}: {result.seconds * 1000:.1f} ms > budget {result.budget * 1000:.0f} ms")
+        base = baseline['results'].get(result.name) if baseline else None
+        if base is not None and result.seconds > base['seconds'] * (1 + threshold):
+            problems.append(f"{result.name}: {result.seconds * 1000:.1f} ms > baseline {base['seconds'] * 1000:.1f} ms")
+    return problems
+
+
+def format_results(results: List[ImportResult], baseline: dict = None) -> str:
+    lines = [f"{'module':<28}{'ms':>10}{'budget':>10}{'vs base':>10}  leaked"]
+    for result in results:
+        base = baseline['results'].get(result.name) if baseline else None
+        change = f"{result.seconds / base['seconds'] - 1:+.1%}" if base else ''
+        lines.append(f"{result.name:<28}{result.seconds * 1000:>10.1f}{result.budget * 1000:>10.0f}{change:>10}"
+                     f"  {', '.join(result.leaked)}")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.imports')
+    parser.add_argument('--filter', default='', help='measure modules whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='fresh interpreters per module')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--save', action='store_true', help='store this run as the baseline')
+    args = parser.parse_args(argv)
+
+    results = [measure(module, args.repeat) for module in TARGETS if args.filter in module]
+    baseline = None if args.save else load_baseline(args.baseline)
+    print(format_results(results, baseline))
+    problems = check(results, baseline, args.threshold)
+    for problem in problems:
+        print(f"REGRESSION {problem}", file=sys.stderr)
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""
+Local stand-ins for an EVM JSON-RPC node, the TronGrid HTTP API and a Solana JSON-RPC node.
+Answers are synthetic but shaped like the real ones, so the adapters run their full request path
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+
+import base58
+
+BLOCK_NUMBER = 20_000_000
+EVM_BALANCE = 10 ** 18
+TOKEN_BALANCE = 1_000_000
+TRON_BALANCE = 5_000_000
+SOLANA_BALANCE = 2_000_000_000
+GAS_PRICE = 10 ** 9
+
+RATE_LIMIT_ERROR = {'code': -32005, 'message': 'rate limit exceeded'}
+BATCH_LIMIT_ERROR = {'code': -32600, 'message': 'batch too large'}
+
+
+class MockServer:
+    """
+    Threaded HTTP server on 127.0.0.1. Every request waits latency plus up to jitter seconds,
+    and fails with probability error_rate
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, max_batch: int = None,
+                 seed: int = 0, port: int = 0):
+        """
+        :param max_batch: JSON-RPC arrays longer than this are refused like a node with a batch limit
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_batch = max_batch
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}/'
+
+    def start(self) -> 'MockServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _delay_and_fail(self) -> bool:
+        """
+        Sleep for the simulated latency
+        :return: True if this request should fail
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0.0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        return bool(fail)
+
+    def handle(self, path: str, body: bytes) -> tuple:
+        """
+        :return: (status, response object)
+        """
+        raise NotImplementedError()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body in one segment, otherwise delayed ACKs add 40 ms to every keep-alive request
+            disable_nagle_algorithm = True
+            wbufsize = 65536
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, response: Any):
+                data = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                self._reply(*server.handle(self.path, body))
+
+            def do_GET(self):
+                # Solana health check
+                self._reply(200, 'ok')
+
+        return Handler
+
+
+class JsonRpcServer(MockServer):
+    """
+    JSON-RPC over HTTP with batches. Injected errors are JSON-RPC errors of single requests
+    """
+
+    def handle(self, path: str, body: bytes) -> tuple:
+        request = json.loads(body)
+        if isinstance(request, list):
+            if self.max_batch and len(request) > self.max_batch:
+                with self._lock:
+                    self.requests += 1
+                return 200, {'jsonrpc': '2.0', 'id': None, 'error': BATCH_LIMIT_ERROR}
+            return 200, [self._call(item) for item in request]
+        return 200, self._call(request)
+
+    def _call(self, request: dict) -> dict:
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        if self._delay_and_fail():
+            response['error'] = RATE_LIMIT_ERROR
+            return response
+        handler: Optional[Callable] = getattr(self, 'rpc_' + request['method'], None)
+        if handler is None:
+            response['error'] = {'code': -32601, 'message': f"the method {request['method']} does not exist"}
+            return response
+        response['result'] = handler(*request.get('params', []))
+        return response
+
+
+def _hex(value: int) -> str:
+    return hex(value)
+
+
+def _digest(*parts) -> bytes:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).digest()
+
+
+def _view(selector: str, native_balance: int = EVM_BALANCE) -> bytes:
+    # Every view returns one word, a balance for balanceOf and getEthBalance and true for bool functions
+    value = TOKEN_BALANCE if selector == '0x70a08231' else native_balance if selector == '0x4d2301cc' else 1
+    return value.to_bytes(32, 'big')
+
+
+def _aggregate3(parameter: bytes, native_balance: int = EVM_BALANCE) -> str:
+    # Multicall3 aggregate3, every call succeeds
+    from eth_abi import decode, encode
+    calls = decode(['(address,bool,bytes)[]'], parameter)[0]
+    return encode(['(bool,bytes)[]'], [[(True, _view('0x' + call[:4].hex(), native_balance))
+                                        for _, _, call in calls]]).hex()
+
+
+class EvmNode(JsonRpcServer):
+    chain_id = 1
+
+    def rpc_eth_chainId(self):
+        return _hex(self.chain_id)
+
+    def rpc_eth_blockNumber(self):
+        return _hex(BLOCK_NUMBER)
+
+    def rpc_eth_getBalance(self, address, block='latest'):
+        return _hex(EVM_BALANCE)
+
+    def rpc_eth_call(self, transaction, block='latest'):
+        data = transaction.get('data') or transaction.get('input') or '0x'
+        if data[:10] == '0x82ad56cb':
+            return '0x' + _aggregate3(bytes.fromhex(data[10:]))
+        return '0x' + _view(data[:10]).hex()
+
+    def rpc_eth_getCode(self, address, block='latest'):
+        return '0x6080604052'
+
+    def rpc_eth_getTransactionCount(self, address, block='latest'):
+        return _hex(0)
+
+    def rpc_eth_gasPrice(self):
+        return _hex(GAS_PRICE)
+
+    def rpc_eth_maxPriorityFeePerGas(self):
+        return _hex(GAS_PRICE // 10)
+
+    def rpc_eth_feeHistory(self, count, newest, percentiles=None):
+        count = int(count, 16) if isinstance(count, str) else count
+        return {'oldestBlock': _hex(BLOCK_NUMBER - count + 1),
+                'baseFeePerGas': [_hex(GAS_PRICE)] * (count + 1),
+                'gasUsedRatio': [0.5] * count,
+                'reward': [[_hex(GAS_PRICE // 10)] for _ in range(count)]}
+
+    def rpc_eth_estimateGas(self, transaction, block=None):
+        return _hex(21000 if not transaction.get('data') and not transaction.get('input') else 52000)
+
+    def rpc_eth_sendRawTransaction(self, raw):
+        return '0x' + _digest(raw).hex()
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        return {'transactionHash': tx_hash, 'blockHash': '0x' + _digest(tx_hash).hex(),
+                'blockNumber': _hex(BLOCK_NUMBER), 'transactionIndex': '0x0', 'status': '0x1',
+                'from': '0x' + '11' * 20, 'to': '0x' + '22' * 20, 'cumulativeGasUsed': '0x5208',
+                'gasUsed': '0x5208', 'effectiveGasPrice': _hex(GAS_PRICE), 'contractAddress': None,
+                'logs': [], 'logsBloom': '0x' + '00' * 256, 'type': '0x2'}
+
+    def rpc_eth_getBlockByNumber(self, block, full=False):
+        number = BLOCK_NUMBER if not block.startswith('0x') else int(block, 16)
+        return {'number': _hex(number), 'hash': '0x' + _digest(number).hex(),
+                'parentHash': '0x' + _digest(number - 1).hex(), 'timestamp': _hex(1_700_000_000 + number * 12),
+                'baseFeePerGas': _hex(GAS_PRICE), 'gasLimit': _hex(30_000_000), 'gasUsed': _hex(15_000_000),
+                'transactions': []}
+
+
+class TronGrid(MockServer):
+    """
+    TronGrid HTTP API. Injected errors are HTTP 503 responses
+    """
+
+    def handle(self, path: str, body: bytes) -> tuple:
+        if self._delay_and_fail():
+            return 503, {'Error': 'service unavailable'}
+        params = json.loads(body) if body else {}
+        handler = getattr(self, path.strip('/').replace('/', '_'), None)
+        if handler is None:
+            return 404, {'Error': f'{path} not found'}
+        return 200, handler(params)
+
+    def wallet_getaccount(self, params):
+        return {'address': params['address'], 'balance': TRON_BALANCE, 'create_time': 1_600_000_000_000}
+
+    def wallet_getaccountresource(self, params):
+        return {'freeNetLimit': 600, 'freeNetUsed': 0, 'EnergyLimit': 0, 'EnergyUsed': 0}
+
+    def wallet_triggerconstantcontract(self, params):
+        function = params.get('function_selector', '')
+        if function.startswith('aggregate3'):
+            result = _aggregate3(bytes.fromhex(params.get('parameter', '')), TRON_BALANCE)
+        else:
+            result = _view('0x70a08231' if function.startswith('balanceOf') else '').hex()
+        return {'result': {'result': True}, 'energy_used': 14650, 'constant_result': [result],
+                'transaction': {'txID': _digest(params).hex()}}
+
+    def wallet_getnodeinfo(self, params):
+        block_id = BLOCK_NUMBER.to_bytes(8, 'big').hex() + _digest(BLOCK_NUMBER).hex()[16:]
+        return {'block': f'Num:{BLOCK_NUMBER},ID:{block_id}', 'solidityBlock': f'Num:{BLOCK_NUMBER},ID:{block_id}'}
+
+    def wallet_getnowblock(self, params):
+        return {'blockID': _digest(BLOCK_NUMBER).hex(), 'block_header': {'raw_data': {'number': BLOCK_NUMBER}}}
+
+    def wallet_getchainparameters(self, params):
+        return {'chainParameter': [{'key': 'getTransactionFee', 'value': 1000}, {'key': 'getEnergyFee', 'value': 100},
+                                   {'key': 'getAllowMultiSign'}]}
+
+    def wallet_getsignweight(self, params):
+        # No permission: the account is treated as not yet on chain, any key may sign
+        return {'result': {}, 'transaction': {'transaction': {'txID': _digest(params.get('raw_data')).hex(),
+                                                              'raw_data': params.get('raw_data')}}}
+
+    def wallet_broadcasttransaction(self, params):
+        return {'result': True, 'txid': params.get('txID')}
+
+    def wallet_gettransactioninfobyid(self, params):
+        return {'id': params['value'], 'blockNumber': BLOCK_NUMBER, 'receipt': {'result': 'SUCCESS'}}
+
+
+class SolanaNode(JsonRpcServer):
+    blockhash = base58.b58encode(hashlib.sha256(b'blockhash').digest()).decode()
+
+    @staticmethod
+    def _context(value):
+        return {'context': {'slot': BLOCK_NUMBER, 'apiVersion': '1.18.0'}, 'value': value}
+
+    def rpc_getBalance(self, pubkey, config=None):
+        return self._context(SOLANA_BALANCE)
+
+    def rpc_getMultipleAccounts(self, pubkeys, config=None):
+        return self._context([{'lamports': SOLANA_BALANCE, 'owner': '11111111111111111111111111111111',
+                               'data': ['', 'base64'], 'executable': False, 'rentEpoch': 0, 'space': 0}
+                              for _ in pubkeys])
+
+    def rpc_getTokenAccountsByOwner(self, owner, mint, config=None):
+        decimals = 6
+        return self._context([{
+            'pubkey': base58.b58encode(_digest(owner, mint)).decode(),
+            'account': {'lamports': 2039280, 'owner': 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA',
+                        'executable': False, 'rentEpoch': 0, 'space': 165,
+                        'data': {'program': 'spl-token', 'space': 165, 'parsed': {'type': 'account', 'info': {
+                            'mint': mint['mint'], 'owner': owner, 'state': 'initialized', 'isNative': False,
+                            'tokenAmount': {'amount': str(TOKEN_BALANCE), 'decimals': decimals,
+                                            'uiAmount': TOKEN_BALANCE / 10 ** decimals,
+                                            'uiAmountString': str(TOKEN_BALANCE / 10 ** decimals)}}}}}}])
+
+    def rpc_getLatestBlockhash(self, config=None):
+        return self._context({'blockhash': self.blockhash, 'lastValidBlockHeight': BLOCK_NUMBER + 150})
+
+    def rpc_getBlockHeight(self, config=None):
+        return BLOCK_NUMBER
+
+    def rpc_sendTransaction(self, transaction, config=None):
+        return base58.b58encode(_digest(transaction) + _digest(transaction, 1)).decode()
+
+    def rpc_getSignatureStatuses(self, signatures, config=None):
+        return self._context([{'slot': BLOCK_NUMBER, 'confirmations': None, 'err': None, 'status': {'Ok': None},
+                               'confirmationStatus': 'finalized'} for _ in signatures])
+
+    def rpc_getMinimumBalanceForRentExemption(self, size, config=None):
+        return 890880
@@ -0,0 +1,187 @@
+"""
+Benchmark cases and the runner. Every case is one Wallet call against a mock node
+"""
+import json
+import os
+import statistics
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from wallet import Wallet
+from wallet.adapters.w3 import ERC20_ABI
+from wallet.types import Network, Token
+
+from benchmarks.mocks import EvmNode, MockServer, SolanaNode, TronGrid
+
+EVM_KEY = '0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318'
+EVM_RECEIVER = '0x2c7536E3605D9C16a7a3D7b1898e529396a65c23'
+EVM_TOKEN = Token(address='0x' + 'aa' * 20, symbol='TKN', decimals=6)
+TRON_OWNER = 'THHsfg2eNiv6MSXC4y5d4t5wkvRVADRKiF'
+TRON_RECEIVER = 'TEdea7WvtoCNceWPwaz7JbkBjbb6omTQcL'
+TRON_TOKEN = Token(address='TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t', symbol='USDT', decimals=6)
+SOLANA_KEY = '2vEfyoLjA7FLHzi24jLdDKojgqGC1CY7kqRC6RdY3EhY3j5VgKSxmmPKc6TJWLeSJKX1ofuduTpwwUV8Dwd3zJ4c'
+SOLANA_RECEIVER = '9WzDXwBbmkg8ZTbNMqUxvQRAyrZzDsGYdLVL9zYtAWWM'
+SOLANA_TOKEN = Token(address='EPjFWdd5AufqSSqeM2qJLBy12YP4jvzsDW7xSGFW6SBG', symbol='USDC', decimals=6)
+
+TRANSFER_CALLDATA = ('0xa9059cbb' + '00' * 12 + EVM_RECEIVER[2:].lower() + (10 ** 6).to_bytes(32, 'big').hex())
+TRUE_RESPONSE = '0x' + (1).to_bytes(32, 'big').hex()
+
+DEFAULT_ITERATIONS = 200
+WARMUP = 10
+THRESHOLD = 0.2  # relative slowdown that fails a run
+
+
+class Case(NamedTuple):
+    name: str
+    chain: str  # evm, tron or solana
+    setup: Callable[[Wallet], Callable[[], Any]]
+
+
+class Result(NamedTuple):
+    name: str
+    iterations: int
+    errors: int
+    seconds: float
+    throughput: float  # calls per second
+    p50: float  # seconds
+    p99: float
+
+
+def _evm_contract(wallet: Wallet):
+    contract = wallet.create_contract(EVM_TOKEN.address, ERC20_ABI)
+    return lambda: wallet.decode_call(contract, TRANSFER_CALLDATA)
+
+
+def _evm_decode_response(wallet: Wallet):
+    contract = wallet.create_contract(EVM_TOKEN.address, ERC20_ABI)
+    return lambda: wallet.decode_response(contract, 'transfer', TRUE_RESPONSE)
+
+
+CASES = [
+    Case('evm.get_balance', 'evm', lambda wallet: lambda: wallet.get_balance(EVM_RECEIVER)),
+    Case('evm.get_balance.token', 'evm', lambda wallet: lambda: wallet.get_balance(EVM_RECEIVER, EVM_TOKEN)),
+    Case('evm.send', 'evm', lambda wallet: lambda: wallet.send(EVM_KEY, EVM_RECEIVER, 0.001)),
+    Case('evm.decode_calldata', 'evm', _evm_contract),
+    Case('evm.decode_response', 'evm', _evm_decode_response),
+    Case('tron.get_balance', 'tron', lambda wallet: lambda: wallet.get_balance(TRON_OWNER)),
+    Case('tron.get_balance.token', 'tron', lambda wallet: lambda: wallet.get_balance(TRON_OWNER, TRON_TOKEN)),
+    Case('tron.estimate', 'tron', lambda wallet: lambda: wallet.estimate(
+        TRON_TOKEN, 'transfer', 1, owner_address=TRON_OWNER, address_recipient=TRON_RECEIVER)),
+    Case('solana.get_balance', 'solana', lambda wallet: lambda: wallet.get_balance(SOLANA_RECEIVER)),
+    Case('solana.get_balance.token', 'solana',
+         lambda wallet: lambda: wallet.get_balance(SOLANA_RECEIVER, SOLANA_TOKEN)),
+    Case('solana.send', 'solana', lambda wallet: lambda: wallet.send(SOLANA_KEY, SOLANA_RECEIVER, 0.001)),
+]
+
+MOCKS = {'evm': EvmNode, 'tron': TronGrid, 'solana': SolanaNode}
+
+
+def create_wallet(chain: str, url: str, **kwargs) -> Wallet:
+    if chain == 'evm':
+        network = Network(adapter='w3', rpc=url, chain_id=EvmNode.chain_id, name='EVM mock')
+    elif chain == 'tron':
+        network = Network(adapter='tron', rpc=url, decimals=6, name='TRON mock')
+    else:
+        network = Network(adapter='solana', rpc=url, decimals=9, name='Solana mock')
+    return Wallet(network, **kwargs)
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def run_case(case: Case, wallet: Wallet, iterations: int = DEFAULT_ITERATIONS, warmup: int = WARMUP) -> Result:
+    """
+    Call the case sequentially, failed calls count as errors and are timed too
+    """
+    call = case.setup(wallet)
+    for _ in range(warmup):
+        try:
+            call()
+        except Exception:
+            pass
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    seconds = time.perf_counter() - started
+    return Result(case.name, iterations, errors, seconds, iterations / seconds,
+                  statistics.median(latencies), _percentile(latencies, 0.99))
+
+
+def run(cases: List[Case], iterations: int = DEFAULT_ITERATIONS, warmup: int = WARMUP,
+        mock_options: dict = None, wallet_options: dict = None) -> List[Result]:
+    """
+    Start one mock per chain used by the cases and run the cases against it
+    :param mock_options: latency, jitter, error_rate and max_batch of the mocks
+    """
+    servers: Dict[str, MockServer] = {}
+    wallets: Dict[str, Wallet] = {}
+    results = []
+    try:
+        for case in cases:
+            if case.chain not in servers:
+                servers[case.chain] = MOCKS[case.chain](**(mock_options or {})).start()
+                wallets[case.chain] = create_wallet(case.chain, servers[case.chain].url, **(wallet_options or {}))
+            results.append(run_case(case, wallets[case.chain], iterations, warmup))
+    finally:
+        for server in servers.values():
+            server.stop()
+    return results
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: List[Result], settings: dict):
+    data = {'settings': settings, 'results': {result.name: result._asdict() for result in results}}
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def compare(results: List[Result], baseline: Optional[dict], threshold: float = THRESHOLD,
+            error_rate: float = 0.0) -> List[str]:
+    """
+    :param error_rate: share of mock requests that fail, calls may fail as often
+    :return: a message per case slower than the baseline by more than threshold in throughput or p50,
+        or with more failed calls than both the baseline and error_rate allow
+    """
+    regressions = []
+    for result in results:
+        base = baseline['results'].get(result.name) if baseline else None
+        allowed = error_rate * result.iterations
+        if base is not None:
+            allowed = max(allowed, base['errors'] * result.iterations / base['iterations'])
+        if result.errors > allowed:
+            regressions.append(f"{result.name}: {result.errors} errors in {result.iterations} calls "
+                               f"> {allowed:.1f} allowed")
+        if base is None:
+            continue
+        if result.throughput < base['throughput'] * (1 - threshold):
+            regressions.append(f"{result.name}: throughput {result.throughput:.1f}/s "
+                               f"< baseline {base['throughput']:.1f}/s")
+        if result.p50 > base['p50'] * (1 + threshold):
+            regressions.append(f"{result.name}: p50 {result.p50 * 1000:.3f} ms "
+                               f"> baseline {base['p50'] * 1000:.3f} ms")
+    return regressions
+
+
+def format_results(results: List[Result], baseline: dict = None) -> str:
+    lines = [f"{'case':<28}{'calls/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'vs base':>10}"]
+    for result in results:
+        base = baseline['results'].get(result.name) if baseline else None
+        change = f"{result.throughput / base['throughput'] - 1:+.1%}" if base else ''
+        lines.append(f"{result.name:<28}{result.throughput:>10.1f}{result.p50 * 1000:>10.3f}"
+                     f"{result.p99 * 1000:>10.3f}{result.errors:>8}{change:>10}")
+    return '\n'.join(lines)
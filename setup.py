@@ -21,6 +21,12 @@ setup(
         ],
         'tron': [
             'tronpy',
+        ],
+        'prometheus': [
+            'prometheus_client',
+        ],
+        'opentelemetry': [
+            'opentelemetry-api',
         ]
     },
     author='Roman Medvedev',
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip('web3')
+
+from benchmarks.mocks import EvmNode
+from wallet.adapters.batch import BatchTransport, is_batch_limit
+from wallet.adapters.exceptions import RPCError
+
+
+class KeyRejectingNode(EvmNode):
+    def handle(self, path: str, body: bytes) -> tuple:
+        with self._lock:
+            self.requests += 1
+        return 200, {'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'invalid API key'}}
+
+
+def test_batch_limit_errors():
+    assert is_batch_limit({'code': -32600, 'message': 'batch too large'})
+    assert is_batch_limit({'code': -32000, 'message': 'batch limit 100 exceeded'})
+    assert not is_batch_limit({'code': -32600, 'message': 'invalid API key'})
+    assert not is_batch_limit({'code': -32005, 'message': 'rate limit exceeded'})
+
+
+def test_split_on_batch_limit():
+    with EvmNode(max_batch=10) as node:
+        transport = BatchTransport(node.url, batch_size=40, batch_interval=10)
+        futures = transport.request_many([('eth_blockNumber', [])] * 40)
+        assert all(future.result(timeout=5) for future in futures)
+        assert transport.batch_size <= 10
+
+
+def test_other_errors_fail_without_split():
+    with KeyRejectingNode() as node:
+        transport = BatchTransport(node.url, batch_size=40, batch_interval=10)
+        futures = transport.request_many([('eth_blockNumber', [])] * 40)
+        for future in futures:
+            with pytest.raises(RPCError):
+                future.result(timeout=5)
+        assert node.requests == 1
+        assert transport.batch_size == 40
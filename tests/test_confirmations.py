@@ -0,0 +1,71 @@
+import threading
+import time
+
+from wallet.adapters.confirmations import ConfirmationTracker
+
+BLOCK_TIME = 0.05
+
+
+class Chain:
+    """
+    Confirms a transaction two block times after it is first seen
+    """
+
+    def __init__(self):
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def fetch_statuses(self, tx_ids):
+        now = time.monotonic()
+        with self.lock:
+            return [{'tx_id': tx_id} if now - self.seen.setdefault(tx_id, now) >= 2 * BLOCK_TIME else None
+                    for tx_id in tx_ids]
+
+
+def test_steady_stream_keeps_polling():
+    tracker = ConfirmationTracker(Chain().fetch_statuses, BLOCK_TIME)
+    futures = []
+    deadline = time.monotonic() + 20 * BLOCK_TIME
+    i = 0
+    # A new transaction every fifth of a block never delays the due poll
+    while time.monotonic() < deadline:
+        futures.extend(tracker.track_many([f'tx{i}']))
+        i += 1
+        time.sleep(BLOCK_TIME / 5)
+    tracker.stop()
+    assert tracker.polls >= 10
+    assert futures[0].result(timeout=0) == {'tx_id': 'tx0'}
+    assert sum(future.done() for future in futures) > len(futures) // 2
+
+
+def test_concurrent_polls_resolve_once():
+    calls = []
+    tracker = ConfirmationTracker(lambda tx_ids: [{'tx_id': tx_id} for tx_id in tx_ids], BLOCK_TIME)
+    futures = tracker.track_many([f'tx{i}' for i in range(500)], callback=lambda tx_id, future: calls.append(tx_id))
+    errors = []
+
+    def poll():
+        try:
+            tracker.poll()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=poll) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    tracker.stop()
+    assert not errors
+    assert all(future.done() for future in futures)
+    assert sorted(calls) == sorted(f'tx{i}' for i in range(500))
+    assert tracker.pending() == 0
+
+
+def test_cancelled_futures_are_dropped():
+    tracker = ConfirmationTracker(lambda tx_ids: [None] * len(tx_ids), BLOCK_TIME)
+    future, = tracker.track_many(['tx'])
+    assert future.cancel()
+    assert tracker.poll() == 0
+    tracker.stop()
+    assert tracker.pending() == 0
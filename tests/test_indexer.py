@@ -0,0 +1,124 @@
+import pytest
+
+pytest.importorskip('web3')
+
+from eth_abi import encode
+from eth_utils import keccak
+from hexbytes import HexBytes
+
+from wallet import indexer
+from wallet.indexer import TRANSFER_TOPIC, TransferIndexer
+
+TOKEN = '0x' + 'aa' * 20
+SENDER = '0x' + '11' * 20
+RECEIVER = '0x' + '22' * 20
+
+
+def _topic(address: str) -> HexBytes:
+    return HexBytes('0x' + '0' * 24 + address[2:])
+
+
+class FakeEth:
+    """
+    A chain with a transfer in every fifth block. Reorgs change the hashes of every block from a number on,
+    ranges longer than max_range are refused like geth does
+    """
+
+    def __init__(self, head: int, max_range: int = None):
+        self.block_number = head
+        self.max_range = max_range
+        self.reorgs = []
+        self.requests = []
+
+    def block_hash(self, number: int) -> HexBytes:
+        fork = sum(1 for block in self.reorgs if block <= number)
+        return HexBytes(keccak(text=f'{number}:{fork}'))
+
+    def get_logs(self, params: dict) -> list:
+        from_block, to_block = params['fromBlock'], params['toBlock']
+        self.requests.append((from_block, to_block))
+        if self.max_range and to_block - from_block + 1 > self.max_range:
+            raise ValueError({'code': -32005, 'message': f'query exceeds max block range {self.max_range}'})
+        return [{'address': TOKEN, 'topics': [TRANSFER_TOPIC, _topic(SENDER), _topic(RECEIVER)],
+                 'data': encode(['uint256'], [number]), 'blockNumber': number, 'blockHash': self.block_hash(number),
+                 'transactionHash': HexBytes(keccak(text=f'tx{number}')), 'logIndex': 0}
+                for number in range(from_block, to_block + 1) if number % 5 == 0]
+
+
+class FakeClient:
+    def __init__(self, eth: FakeEth):
+        self.eth = eth
+
+
+class FakeAdapter:
+    _chain_id = 1
+
+    def __init__(self, eth: FakeEth):
+        self._client = FakeClient(eth)
+
+    def _request_batch(self, method: str, params: list) -> list:
+        eth = self._client.eth
+        return [{'hash': eth.block_hash(int(number, 16))} if int(number, 16) <= eth.block_number else None
+                for number, _ in params]
+
+
+def _indexer(eth: FakeEth, path, **kwargs) -> TransferIndexer:
+    return TransferIndexer(FakeAdapter(eth), str(path / 'checkpoint.db'), **kwargs)
+
+
+def test_range_halving(tmp_path):
+    eth = FakeEth(head=1000, max_range=100)
+    scanner = _indexer(eth, tmp_path, initial_range=1000)
+    blocks = [transfer.block_number for transfer in scanner.scan()]
+    assert blocks == list(range(0, 1001, 5))
+    assert scanner.range <= 100
+    assert scanner.checkpoint.block() == 1000
+
+
+def test_refused_range_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(indexer, 'CEILING_RETRY_RANGES', 5)
+    eth = FakeEth(head=100, max_range=8)
+    scanner = _indexer(eth, tmp_path, initial_range=64)
+    list(scanner.scan())
+    assert scanner.range <= 8
+    # The node lifts its limit, the range grows past the refused size again
+    eth.max_range = None
+    eth.block_number = 5000
+    list(scanner.scan())
+    assert scanner.range > 64
+
+
+def test_checkpoint_resume(tmp_path):
+    eth = FakeEth(head=1000)
+    scanner = _indexer(eth, tmp_path, initial_range=100)
+    assert [transfer.block_number for transfer in scanner.scan(to_block=300)][-1] == 300
+    scanner.close()
+    resumed = _indexer(eth, tmp_path, initial_range=100)
+    assert [transfer.block_number for transfer in resumed.scan(to_block=600)] == list(range(305, 601, 5))
+
+
+def test_reorg_rewinds_to_last_valid_block(tmp_path):
+    eth = FakeEth(head=200)
+    reorgs = []
+    scanner = _indexer(eth, tmp_path, initial_range=50, on_reorg=reorgs.append)
+    list(scanner.scan())
+    eth.reorgs.append(181)
+    eth.block_number = 210
+    blocks = [transfer.block_number for transfer in scanner.scan()]
+    assert reorgs == [181]
+    # Transfers from the invalidated block on are delivered again with their new hashes
+    assert blocks == list(range(185, 211, 5))
+    assert scanner.checkpoint.block_hashes()[185] == eth.block_hash(185).to_0x_hex()
+
+
+def test_reorg_deeper_than_window(tmp_path):
+    eth = FakeEth(head=200)
+    reorgs = []
+    scanner = _indexer(eth, tmp_path, initial_range=50, window=16, on_reorg=reorgs.append)
+    list(scanner.scan())
+    oldest = min(scanner.checkpoint.block_hashes())
+    eth.reorgs.append(100)
+    blocks = [transfer.block_number for transfer in scanner.scan()]
+    # Nothing in the window matches, the scan restarts from the oldest stored block
+    assert reorgs == [oldest]
+    assert blocks == list(range(oldest + (-oldest % 5), 201, 5))
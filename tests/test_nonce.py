@@ -0,0 +1,99 @@
+import asyncio
+
+from wallet.adapters.nonce import AsyncNonceManager, NonceManager
+
+SENDER = '0x00000000000000000000000000000000000000aa'
+
+
+class Counts:
+    def __init__(self, pending: int, mined: int = None):
+        self.pending = pending
+        self.mined = pending if mined is None else mined
+        self.reads = 0
+
+    def __call__(self, address: str, block: str) -> int:
+        self.reads += 1
+        return self.pending if block == 'pending' else self.mined
+
+
+def test_allocate_syncs_once():
+    counts = Counts(7)
+    manager = NonceManager(counts)
+    assert [manager.allocate(SENDER) for _ in range(3)] == [7, 8, 9]
+    assert counts.reads == 1
+
+
+def test_release_fills_gaps_first():
+    manager = NonceManager(Counts(0))
+    nonces = [manager.allocate(SENDER) for _ in range(4)]
+    manager.release(SENDER, nonces[1])
+    manager.release(SENDER, nonces[3])
+    # The last nonce rewinds the counter, the one in the middle is reused first
+    assert manager.allocate(SENDER) == 1
+    assert manager.allocate(SENDER) == 3
+    assert manager.allocate(SENDER) == 4
+
+
+def test_sent_and_status():
+    counts = Counts(pending=2, mined=1)
+    manager = NonceManager(counts, stuck_timeout=-1)
+    for _ in range(3):
+        manager.sent(SENDER, manager.allocate(SENDER))
+    # The node knows about 2 and 3 but not about 4
+    counts.pending = 4
+    status = manager.status(SENDER)
+    assert (status.mined, status.pending, status.next) == (1, 4, 5)
+    assert status.gaps == [4]
+    assert status.stuck == [2, 3]
+
+
+def test_rejected_not_accepted_releases():
+    manager = NonceManager(Counts(5))
+    nonce = manager.allocate(SENDER)
+    manager.rejected(SENDER, nonce, ValueError({'code': -32000, 'message': 'insufficient funds for gas * price + value'}))
+    assert manager.allocate(SENDER) == nonce
+
+
+def test_rejected_known_is_sent():
+    manager = NonceManager(Counts(5))
+    nonce = manager.allocate(SENDER)
+    manager.rejected(SENDER, nonce, ValueError('already known'))
+    assert manager.allocate(SENDER) == nonce + 1
+    assert manager.status(SENDER).gaps == [nonce]
+
+
+def test_rejected_used_or_unknown_resyncs():
+    for message in ('nonce too low', 'replacement transaction underpriced', 'something unexpected'):
+        counts = Counts(5)
+        manager = NonceManager(counts)
+        nonce = manager.allocate(SENDER)
+        manager.allocate(SENDER)
+        counts.pending = 9
+        manager.rejected(SENDER, nonce, ValueError(message))
+        assert manager.allocate(SENDER) == 9, message
+        assert counts.reads == 2
+
+
+def test_resync_forgets_released():
+    counts = Counts(3)
+    manager = NonceManager(counts)
+    manager.release(SENDER, manager.allocate(SENDER))
+    manager.allocate(SENDER)
+    manager.resync(SENDER)
+    counts.pending = 6
+    assert manager.allocate(SENDER) == 6
+
+
+def test_async_allocate_is_contiguous():
+    reads = []
+
+    async def get_transaction_count(address: str, block: str) -> int:
+        reads.append(block)
+        await asyncio.sleep(0.01)
+        return 10
+
+    async def allocate_many():
+        manager = AsyncNonceManager(get_transaction_count)
+        return await asyncio.gather(*(manager.allocate(SENDER) for _ in range(20)))
+
+    assert sorted(asyncio.run(allocate_many())) == list(range(10, 30))
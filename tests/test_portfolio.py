@@ -0,0 +1,60 @@
+import threading
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip('solana')
+pytest.importorskip('tronpy')
+
+from benchmarks.mocks import SOLANA_BALANCE, SolanaNode, TronGrid
+from benchmarks.suite import SOLANA_RECEIVER, SOLANA_TOKEN, TRON_OWNER, TRON_RECEIVER, create_wallet
+from wallet.adapters import solana
+from wallet.portfolio import PortfolioScanner
+
+
+class CountingSolanaNode(SolanaNode):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.methods = []
+
+    def rpc_getMultipleAccounts(self, pubkeys, config=None):
+        self.methods.append(('getMultipleAccounts', len(pubkeys)))
+        return super().rpc_getMultipleAccounts(pubkeys, config)
+
+
+class ConcurrencyTronGrid(TronGrid):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._counter = threading.Lock()
+
+    def handle(self, path: str, body: bytes) -> tuple:
+        with self._counter:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return super().handle(path, body)
+        finally:
+            with self._counter:
+                self.in_flight -= 1
+
+
+def test_solana_native_balances_in_one_request_per_chunk(monkeypatch):
+    monkeypatch.setattr(solana, 'MAX_MULTIPLE_ACCOUNTS', 2)
+    with CountingSolanaNode() as node:
+        wallet = create_wallet('solana', node.url)
+        table = wallet.get_balances([SOLANA_RECEIVER] * 3, [None, SOLANA_TOKEN])
+    assert node.methods == [('getMultipleAccounts', 2), ('getMultipleAccounts', 1)]
+    assert not table.errors
+    assert [row[0] for row in table.balances] == [Decimal(SOLANA_BALANCE).scaleb(-9)] * 3
+    assert all(row[1] > 0 for row in table.balances)
+
+
+def test_scanner_bounds_tron_requests():
+    with ConcurrencyTronGrid(latency=0.02) as node:
+        wallet = create_wallet('tron', node.url)
+        with PortfolioScanner([wallet], concurrency=2, chunk_size=4) as scanner:
+            results = scanner.scan_all([TRON_OWNER, TRON_RECEIVER] * 8, [(wallet.get_network(), None)])
+    assert not results['TRON mock'].table.errors
+    assert node.max_in_flight <= 2
@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip('solders')
+pytest.importorskip('eth_account')
+
+from solders.keypair import Keypair
+
+from wallet import hd
+from wallet.adapters.solana import SolanaAdapter
+
+MNEMONIC = 'test test test test test test test test test test test junk'
+MESSAGE = b'snakewallet'
+
+
+def _assert_signs(account):
+    keypair = SolanaAdapter._get_keypair(account)
+    assert str(keypair.pubkey()) == account.address
+    assert keypair.sign_message(MESSAGE).verify(keypair.pubkey(), MESSAGE)
+
+
+def _assert_parses(account):
+    # The base58 form of a keypair is 87 or 88 characters long, both must be read as a private key
+    for text in (str(SolanaAdapter._get_keypair(account)), account.private_key):
+        parsed = SolanaAdapter._parse_account(text)
+        assert parsed.address == account.address
+        _assert_signs(parsed)
+
+
+def test_generated_accounts_sign():
+    for _ in range(200):
+        account = SolanaAdapter.generate_account()
+        _assert_signs(account)
+        _assert_parses(account)
+
+
+def test_generate_accounts_sign():
+    for account in SolanaAdapter.generate_accounts(200, workers=1):
+        _assert_signs(account)
+        _assert_parses(account)
+
+
+def test_derived_accounts_sign():
+    accounts = SolanaAdapter.derive_accounts(hd.mnemonic_to_seed(MNEMONIC), 0, 200, workers=1)
+    assert len({account.address for account in accounts}) == 200
+    for account in accounts:
+        _assert_signs(account)
+        _assert_parses(account)
+
+
+def test_short_base58_keys_sign():
+    lengths = set()
+    for _ in range(400):
+        keypair = Keypair()
+        lengths.add(len(str(keypair)))
+        _assert_signs(SolanaAdapter._parse_account(str(keypair)))
+    assert 87 in lengths
+
@@ -0,0 +1,101 @@
+import os
+import random
+
+import pytest
+
+pytest.importorskip('base58')
+
+from wallet import watch
+from wallet.watch import TRANSFER_TOPIC, TRON_RECORD_SIZE, EvmBlockStreamer, TronBlockStreamer, WatchSet
+
+
+def _addresses(count: int, seed: int = 1) -> list:
+    generator = random.Random(seed)
+    return ['0x' + generator.randbytes(20).hex() for _ in range(count)]
+
+
+def _in_bloom(watch_set: WatchSet, record: bytes) -> bool:
+    return all(watch_set._map[watch_set._bloom_offset + (position >> 3)] & (1 << (position & 7))
+               for position in watch._bloom_positions(record, watch_set._hashes, watch_set._bits))
+
+
+def test_build_and_contains(tmp_path):
+    addresses = _addresses(1000)
+    watch_set = WatchSet.build(str(tmp_path / 'evm.wset'), addresses + addresses[:10])
+    assert len(watch_set) == 1000
+    assert all(address in watch_set for address in addresses)
+    assert addresses[0].upper().replace('0X', '0x') in watch_set
+    assert not any(address in watch_set for address in _addresses(1000, seed=2))
+    assert 'not an address' not in watch_set
+    watch_set.close()
+
+
+def test_bloom_false_positive_is_rejected(tmp_path):
+    # A filter this loose lets many absent addresses through, the sorted records must reject them
+    watch_set = WatchSet.build(str(tmp_path / 'loose.wset'), _addresses(50), error_rate=0.5)
+    false_positives = [bytes.fromhex(address[2:]) for address in _addresses(2000, seed=3)
+                       if _in_bloom(watch_set, bytes.fromhex(address[2:]))]
+    assert false_positives
+    assert not any(watch_set.contains(record) for record in false_positives)
+    watch_set.close()
+
+
+def test_duplicates_merged_across_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch, 'SORT_RUN_SIZE', 7)
+    addresses = _addresses(40)
+    # Every address shows up in several runs
+    watch_set = WatchSet.build(str(tmp_path / 'runs.wset'), addresses * 3)
+    assert len(watch_set) == 40
+    records = [watch_set._map[watch_set._records_offset + i * 20:watch_set._records_offset + (i + 1) * 20]
+               for i in range(len(watch_set))]
+    assert records == sorted(bytes.fromhex(address[2:]) for address in addresses)
+    assert all(address in watch_set for address in addresses)
+    assert not os.path.exists(str(tmp_path / 'runs.wset.tmp'))
+    watch_set.close()
+
+
+def _topic(address_hex: str) -> str:
+    return '0x' + '0' * 24 + address_hex
+
+
+def test_evm_deposits_from_logs(tmp_path):
+    watched, other, token, router = _addresses(4, seed=4)
+    watch_set = WatchSet.build(str(tmp_path / 'evm.wset'), [watched])
+    streamer = EvmBlockStreamer(None, watch_set)
+    block = {'number': '0x10', 'transactions': [
+        {'to': watched, 'value': '0x5', 'from': other, 'hash': '0x01', 'input': '0x'},
+        # A router call, the token transfer to the watched address is only visible in the logs
+        {'to': router, 'value': '0x0', 'from': other, 'hash': '0x02', 'input': '0x12345678'},
+    ]}
+    logs = [
+        {'address': token, 'topics': ['0x' + TRANSFER_TOPIC, _topic(router[2:]), _topic(watched[2:])],
+         'data': '0x' + (7).to_bytes(32, 'big').hex(), 'transactionHash': '0x02', 'blockNumber': '0x10'},
+        {'address': token, 'topics': ['0x' + TRANSFER_TOPIC, _topic(router[2:]), _topic(other[2:])],
+         'data': '0x' + (9).to_bytes(32, 'big').hex(), 'transactionHash': '0x02', 'blockNumber': '0x10'},
+    ]
+    deposits = list(streamer.deposits(block, logs))
+    assert [(d.token, d.amount, d.sender, d.tx_hash) for d in deposits] == [(None, 5, other, '0x01'),
+                                                                            (token, 7, router, '0x02')]
+    watch_set.close()
+
+
+def test_tron_deposits_from_logs(tmp_path):
+    watched, other, token = (address[2:] for address in _addresses(3, seed=5))
+    watch_set = WatchSet.build(str(tmp_path / 'tron.wset'), ['41' + watched], record_size=TRON_RECORD_SIZE)
+    streamer = TronBlockStreamer(None, watch_set)
+    block = {'block_header': {'raw_data': {'number': 7}}, 'transactions': [
+        {'txID': 'aa', 'ret': [{'contractRet': 'SUCCESS'}], 'raw_data': {'contract': [
+            {'type': 'TransferContract',
+             'parameter': {'value': {'to_address': '41' + watched, 'owner_address': '41' + other, 'amount': 3}}}]}},
+    ]}
+    infos = [
+        {'id': 'bb', 'log': [{'address': token, 'topics': [TRANSFER_TOPIC, '0' * 24 + other, '0' * 24 + watched],
+                              'data': (11).to_bytes(32, 'big').hex()}]},
+        {'id': 'cc', 'result': 'FAILED', 'log': [{'address': token, 'data': (12).to_bytes(32, 'big').hex(),
+                                                  'topics': [TRANSFER_TOPIC, '0' * 24 + other, '0' * 24 + watched]}]},
+    ]
+    deposits = list(streamer.deposits(block, infos))
+    assert [(d.amount, d.tx_hash) for d in deposits] == [(3, 'aa'), (11, 'bb')]
+    assert deposits[1].token == streamer._base58('41' + token)
+    assert deposits[1].address == streamer._base58('41' + watched)
+    watch_set.close()
@@ -1,3 +1,3 @@
-from .main import Wallet
+from .main import Wallet, AsyncWallet
 
-__all__ = ["Wallet"]
+__all__ = ["Wallet", "AsyncWallet"]
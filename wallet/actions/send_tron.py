@@ -1,20 +1,39 @@
 import datetime
 import os
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from itrx import Client as ItrxClient
-import qrcode
-from tronscan import Client as TronscanClient
-
-from wallet.adapters.exceptions import AddressNotFound
 from wallet.main import Wallet
 from wallet.networks import Networks
-from wallet.types import Token
+from wallet.types import PreflightReport, RecipientCheck, Token
 
 TRONGRID_KEY = os.getenv('TRONGRID_KEY')
+PREFLIGHT_WORKERS = 8  # concurrent requests of preflight
+
+
+def _result(future: Optional[Future], name: str, errors: Dict[str, str]):
+    # A failed check is reported, the other checks still count
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        errors[name] = f'{e.__class__.__name__}: {e}'
+        return None
 
 
 class SendTronAction:
+    def __init__(self, wallet: Wallet = None, workers: int = PREFLIGHT_WORKERS):
+        self._wallet = wallet
+        self.workers = workers
+
+    @property
+    def wallet(self) -> Wallet:
+        if self._wallet is None:
+            self._wallet = Wallet(Networks.Tron, provider_options={'api_key': TRONGRID_KEY})
+        return self._wallet
+
     def generate_qr_code(self, address, amount, token=None, memo=''):
         if token is None:
             token = Networks.Tron
@@ -27,6 +46,8 @@ class SendTronAction:
         # data = f'tron:{rent_address}?amount={rent_amount}'
 
         data = f'https://link.trustwallet.com/send?asset={asset}&address={address}&amount={amount}&memo={memo}'
+        import qrcode
+
         qr = qrcode.QRCode()
         qr.add_data(data)
         qr.make()
@@ -37,15 +58,85 @@ class SendTronAction:
         return filename
 
     def get_energy_price(self, energy_amount):
+        from itrx import Client as ItrxClient
+
         client = ItrxClient()
         return client.get_price(energy_amount)
 
     def rent_energy(self, address, energy_amount):
+        from itrx import Client as ItrxClient
+
         client = ItrxClient()
         order_id = client.create_order(address, energy_amount)
         return order_id
 
 
+    @staticmethod
+    def _history(tronscan, address_sender: str, token: Token, address_recipient: str) -> Tuple[List[dict], bool]:
+        """
+        :return: earlier transfers of token from the sender to the recipient and whether Tronscan marks it as risky
+        """
+        transactions = tronscan.get_trc20_and_trc721_transfers(from_address=address_sender,
+                                                               contract_address=token.address,
+                                                               to_address=address_recipient)
+        history = [{'tx_id': t['transaction_id'], 'timestamp': t['block_ts'],
+                    'amount': int(t['quant']) / 10 ** token.decimals}
+                   for t in transactions['token_transfers'] if t['to_address'] == address_recipient]
+        info = transactions['normalAddressInfo'].get(address_recipient)
+        return history, bool(info and info['risk'])
+
+    def preflight(self, address_sender: str, payments: Iterable[Tuple[str, float]],
+                  token: Token = None) -> PreflightReport:
+        """
+        Check the sender and every (recipient, amount) payment before sending. The checks do not depend on each
+        other and run concurrently: the sender balance, the TRX and token balances of all recipients in one bulk
+        read, the Tronscan history of every recipient and the estimates of all transfers, which read the
+        resources of the sender once
+        :param token: None for TRX, which has no history or estimate
+        """
+        started = time.monotonic()
+        payments = list(payments)
+        recipients = [recipient for recipient, _ in payments]
+        wallet = self.wallet
+        errors = {}
+        with ThreadPoolExecutor(self.workers) as executor:
+            sender_balance = executor.submit(wallet.get_balance, address_sender, token)
+            balances = executor.submit(wallet.get_balances, recipients, [None, token] if token else [None])
+            estimates = histories = None
+            if token is not None:
+                estimates = executor.submit(wallet.estimate_many, token, 'transfer', payments,
+                                            owner_address=address_sender)
+                try:
+                    from tronscan import Client as TronscanClient
+                    tronscan = TronscanClient()
+                    histories = [executor.submit(self._history, tronscan, address_sender, token, recipient)
+                                 for recipient in recipients]
+                except Exception as e:
+                    errors['history'] = f'{e.__class__.__name__}: {e}'
+
+            sender_balance = _result(sender_balance, 'sender_balance', errors)
+            table = _result(balances, 'balances', errors)
+            estimates = _result(estimates, 'estimate', errors)
+
+        checks = []
+        for i, (recipient, amount) in enumerate(payments):
+            recipient_errors = {}
+            balance_native = balance_token = None
+            if table is not None:
+                balance_native = table.balances[i][0]
+                balance_token = table.balances[i][1] if token else None
+                for (row, column), error in table.errors.items():
+                    if row == i:
+                        recipient_errors['balance_token' if column else 'balance_native'] = error
+            history = risky = None
+            if histories is not None:
+                history, risky = _result(histories[i], 'history', recipient_errors) or (None, None)
+            checks.append(RecipientCheck(address=recipient, amount=amount, balance_native=balance_native,
+                                         balance_token=balance_token, history=history, risky=risky,
+                                         estimate=estimates[i] if estimates else None, errors=recipient_errors))
+        return PreflightReport(sender=address_sender, token=token, sender_balance=sender_balance, recipients=checks,
+                               errors=errors, seconds=time.monotonic() - started)
+
     def send(self, address_sender, address_recipient, amount, token: Token = None, dry_run=False):
         # Future templates:
         # send to {} ...
@@ -70,42 +161,19 @@ class SendTronAction:
         """
         print(f"Planning to send {amount} USDT from {address_sender} to {address_recipient}...")
 
-        wallet = Wallet(Networks.Tron, provider_options={'api_key': TRONGRID_KEY})
+        wallet = self.wallet
+        report = self.preflight(address_sender, [(address_recipient, amount)], token)
+        recipient = report.recipients[0]
 
         print()
-        # print("Checking sending address...")
-        balance = wallet.get_balance(address_sender, token)
-        if balance > amount:
+        if report.sufficient:
             print(f"OK Sender has enough {token.symbol if token else 'native token'} to send")
         else:
-            print(f"ERR Sender has not enough {token.symbol} to send")
+            print(f"ERR Sender has not enough {token.symbol if token else 'native token'} to send")
             return
 
-        # print("Checking recipient address...")
-
-        try:
-            balance_trx = wallet.get_balance(address_recipient)
-        except AddressNotFound:
-            balance_trx = None
-        balance = wallet.get_balance(address_recipient, token)
-
-        tronscan = TronscanClient()
-        transactions = tronscan.get_trc20_and_trc721_transfers(from_address=address_sender,
-                                                               contract_address=token.address,
-                                                               to_address=address_recipient)
-        history = []
-        tronscan_risky = None
-        for t in transactions['token_transfers']:
-            if t['to_address'] == address_recipient:
-                history.append(
-                    f"{(datetime.datetime.utcnow() - datetime.datetime.fromtimestamp(t['block_ts'] / 1000)).days} days ago({datetime.datetime.fromtimestamp(t['block_ts'] / 1000)}) sent {int(t['quant']) / 10 ** token.decimals} {token.symbol} https://tronscan.io/#/transaction/{t['transaction_id']}")
-
-        if address_recipient in transactions['normalAddressInfo'] and \
-                transactions['normalAddressInfo'][address_recipient][
-                    'risk']:
-            # print("!!! Tronscan marked this address as risky !!!")
-            tronscan_risky = True
-
+        balance = recipient.balance_token or 0
+        balance_trx = recipient.balance_native
         if balance_trx is None and balance:
             balance_trx = 0.0
         if balance or balance_trx:
@@ -114,29 +182,28 @@ class SendTronAction:
             print(
                 f"WARN Recipient balance: {int(balance)} {token.symbol}, {int(balance_trx) if balance_trx else balance_trx} TRX")
 
-        # print(f"Recipient info:\n\tBalance: {int(balance)} {token.symbol}, {int(balance_trx)} TRX")
-        if tronscan_risky:
+        if recipient.risky:
             print(f"WARN Tronscan marked recipient as risky: YES")
-        # else:
-        #     print(f"OK Tronscan marked as risky: NO")
 
         print(f"\tAML check: NOT IMPLEMENTED")
-        if history:
+        if recipient.history:
             print(f"OK Found transaction history:")
-            for r in history[:3]:
-                print(f"\t\t{r}")
+            for t in recipient.history[:3]:
+                sent_at = datetime.datetime.fromtimestamp(t['timestamp'] / 1000)
+                print(f"\t\t{(datetime.datetime.utcnow() - sent_at).days} days ago({sent_at}) sent {t['amount']} "
+                      f"{token.symbol} https://tronscan.io/#/transaction/{t['tx_id']}")
         else:
             print(f"WARN No transactions found")
+        for name, error in {**report.errors, **recipient.errors}.items():
+            print(f"WARN {name} check failed: {error}")
 
         print()
         print("Calculating resources required to send token...")
 
-        # contract = wallet.create_contract(TronTokens.USDT.address)
-        estimate_resources = wallet.estimate(token, 'transfer',
-                                             amount=amount,
-                                             owner_address=address_sender,
-                                             address_recipient=address_recipient,
-                                             )
+        estimate_resources = recipient.estimate
+        if estimate_resources is None:
+            print("ERR Could not estimate the transfer")
+            return
 
         print(
             f"Energy required: {estimate_resources['energy_required']}. Available: {estimate_resources['energy_available']}")
@@ -145,10 +212,6 @@ class SendTronAction:
         if estimate_resources['bandwidth_required'] > estimate_resources['bandwidth_available']:
             print(f"WARN Not enough bandwidth to send token")
 
-        # print(f"Energy used: {estimate_resources['energy_used']} ")
-        # print(f"Energy limit: {estimate_resources['energy_limit']} ")
-        # print(f"Energy available: {estimate_resources['energy_available']} ")
-        # print(f"Energy lack: {estimate_resources['energy_lack']} ")
         print(f"Energy fee: {estimate_resources['energy_fee'] / 10 ** Networks.Tron.decimals} ")
         print(f"Bandwidth fee: {estimate_resources['bandwidth_fee']} ")
         print(f"Total fee: {estimate_resources['total_fee'] / 10 ** Networks.Tron.decimals} ")
@@ -1,7 +1,240 @@
-from wallet.models import Contract
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Union
+
+from wallet.models import CompactAccount, CompactContract
+from wallet.adapters import confirmations
+from wallet.adapters.confirmations import ConfirmationTracker
+from wallet.registry import LRUCache
+from wallet.types import Token, BalanceTable
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_CACHE_SIZE = 65536
+
+
+class AccountCache:
+    """
+    Parsed accounts keyed by a digest of the input text, so neither private keys nor mnemonics are kept as keys.
+    The cache holds private keys in bytearrays that are wiped when the entry is evicted, expires or the cache
+    is cleared. Callers get bytes copies, those are theirs to drop
+    """
+
+    def __init__(self, maxsize: int = ACCOUNT_CACHE_SIZE, ttl: float = None):
+        self._cache = LRUCache(maxsize, ttl, on_evict=self._wipe)
+
+    @staticmethod
+    def _key(text: Union[str, bytes]) -> bytes:
+        if isinstance(text, str):
+            text = text.encode()
+        return hashlib.blake2b(text, digest_size=20).digest()
+
+    @staticmethod
+    def _wipe(entry):
+        if isinstance(entry, tuple) and entry[1] is not None:
+            entry[1][:] = bytes(len(entry[1]))
+
+    def get(self, text: Union[str, bytes], parse: Callable[[Union[str, bytes]], Union[CompactAccount, str]]):
+        """
+        :param parse: builds the account of the adapter, a CompactAccount or an address
+        """
+        key = self._key(text)
+        # Evictions wipe under the cache lock, so the key is copied out under it too
+        with self._cache.lock:
+            entry = self._cache.get(key)
+            if isinstance(entry, tuple):
+                address, private_key = entry
+                return CompactAccount(address, bytes(private_key) if private_key else None)
+            if entry is not None:
+                return entry
+        account = parse(text)
+        if isinstance(account, CompactAccount):
+            # The cache keeps its own copy, the account returned here is never wiped
+            self._cache.set(key, (account.address, bytearray(account.private_key) if account.private_key else None))
+        else:
+            self._cache.set(key, account)
+        return account
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
 
 
 class AdapterBase:
+    _accounts: AccountCache
+    _block_time: float
+    _confirmation_options: dict
+    _confirmations: ConfirmationTracker = None
+
     @staticmethod
     def create_contract(contract: str, abi: list = None):
-        return Contract(address=contract, abi=abi)
+        return CompactContract(address=contract, abi=abi)
+
+    def create_account(self, text: Union[str, bytes]):
+        """
+        Parse an address, private key or mnemonic once, later calls with the same text hit the account cache
+        """
+        return self._accounts.get(text, self._parse_account)
+
+    def account_cache_stats(self) -> dict:
+        return self._accounts.stats()
+
+    def clear_account_cache(self):
+        self._accounts.clear()
+
+    def _fetch_statuses(self, tx_ids: List[str]) -> List[Optional[dict]]:
+        """
+        Final status of every transaction in one batched lookup, None while it is pending
+        """
+        raise NotImplementedError()
+
+    @property
+    def confirmations(self) -> ConfirmationTracker:
+        if self._confirmations is None:
+            self._confirmations = ConfirmationTracker(self._fetch_statuses, self._block_time,
+                                                      **self._confirmation_options)
+        return self._confirmations
+
+    def track_transactions(self, tx_ids: List[str], callback: Callable[[str, Future], None] = None,
+                           timeout: float = None) -> List[Future]:
+        return self.confirmations.track_many(tx_ids, callback, timeout)
+
+    def get_balances(self, accounts: list, tokens: List[Token] = None) -> BalanceTable:
+        """
+        Generic bulk balance read, one get_balance call per cell. Adapters override it with a batched path
+        """
+        tokens = list(tokens or [None])
+        balances = []
+        errors = {}
+        for i, account in enumerate(accounts):
+            row = []
+            for j, token in enumerate(tokens):
+                try:
+                    row.append(self.get_balance(account, token=token))
+                except Exception as e:
+                    errors[(i, j)] = f'{e.__class__.__name__}: {e}'
+                    row.append(None)
+            balances.append(row)
+        return BalanceTable(addresses=list(accounts), tokens=tokens, balances=balances, errors=errors)
+
+
+MAX_CONCURRENCY = 32
+
+
+class AsyncAdapterBase:
+    """
+    Mixin for asyncio adapters: requests of one adapter share its connection pool
+    and at most max_concurrency of them are in flight
+    """
+
+    def __init__(self, max_concurrency: int = None, block_time: float = None, confirmation_options: dict = None):
+        """
+        :param confirmation_options: batch_size, timeout, backoff_factor and max_backoff of the confirmation
+            polls, like the ConfirmationTracker of sync adapters
+        """
+        self._max_concurrency = max_concurrency or MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._block_time = block_time
+        self._confirmation_options = dict(confirmation_options or {})
+        self._polls = set()
+
+    async def _limit(self, awaitable):
+        async with self._semaphore:
+            return await awaitable
+
+    async def _fetch_statuses(self, tx_ids: List[str]) -> List[Optional[dict]]:
+        """
+        Final status of every transaction in one batched lookup, None while it is pending
+        """
+        raise NotImplementedError()
+
+    def track_transactions(self, tx_ids: List[str], callback: Callable[[str, asyncio.Future], None] = None,
+                           timeout: float = None) -> List[asyncio.Future]:
+        """
+        Poll the transactions in one task of the running loop, in batches like the ConfirmationTracker
+        :return: asyncio futures of the final statuses in input order
+        """
+        loop = asyncio.get_running_loop()
+        futures = {tx_id: loop.create_future() for tx_id in tx_ids}
+        task = loop.create_task(self._poll_statuses(dict(futures), callback, timeout))
+        # The loop keeps weak references to tasks only
+        self._polls.add(task)
+        task.add_done_callback(self._polls.discard)
+        return [futures[tx_id] for tx_id in tx_ids]
+
+    async def _poll_statuses(self, pending: Dict[str, asyncio.Future], callback, timeout: float = None):
+        options = self._confirmation_options
+        batch_size = options.get('batch_size', confirmations.BATCH_SIZE)
+        backoff_factor = options.get('backoff_factor', confirmations.BACKOFF_FACTOR)
+        max_interval = self._block_time * options.get('max_backoff', confirmations.MAX_BACKOFF)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or options.get('timeout', confirmations.CONFIRMATION_TIMEOUT))
+        interval = self._block_time
+        while pending:
+            await asyncio.sleep(max(0.0, min(interval, deadline - loop.time())))
+            # Futures cancelled by the caller are not polled any more
+            for tx_id in [tx_id for tx_id, future in pending.items() if future.done()]:
+                del pending[tx_id]
+            tx_ids = list(pending)
+            resolved = 0
+            for i in range(0, len(tx_ids), batch_size):
+                chunk = tx_ids[i:i + batch_size]
+                try:
+                    statuses = await self._fetch_statuses(chunk)
+                except Exception as e:
+                    # Keep the chunk pending, the next poll retries it
+                    logger.warning("Confirmation poll failed: %s", e)
+                    continue
+                for tx_id, status in zip(chunk, statuses):
+                    if status is not None:
+                        self._settle(tx_id, pending.pop(tx_id), callback, result=status)
+                        resolved += 1
+            if loop.time() >= deadline:
+                for tx_id, future in pending.items():
+                    self._settle(tx_id, future, callback,
+                                 exception=TimeoutError(f"Transaction {tx_id} is not confirmed"))
+                return
+            interval = self._block_time if resolved else min(interval * backoff_factor, max_interval)
+
+    @staticmethod
+    def _settle(tx_id: str, future: asyncio.Future, callback, result=None, exception: Exception = None):
+        if future.done():
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+        if callback is not None:
+            try:
+                callback(tx_id, future)
+            except Exception:
+                logger.exception("Confirmation callback of %s failed", tx_id)
+
+    async def wait_for_transactions(self, tx_ids: List[str], timeout: float = None) -> list:
+        return list(await asyncio.gather(*self.track_transactions(tx_ids, timeout=timeout)))
+
+    async def get_balances(self, accounts: list, tokens: List[Token] = None) -> BalanceTable:
+        tokens = list(tokens or [None])
+        cells = await asyncio.gather(*(self.get_balance(account, token=token)
+                                       for account in accounts for token in tokens),
+                                     return_exceptions=True)
+        balances = []
+        errors = {}
+        columns = len(tokens)
+        for i in range(len(accounts)):
+            row = []
+            for j in range(columns):
+                cell = cells[i * columns + j]
+                if isinstance(cell, Exception):
+                    errors[(i, j)] = f'{cell.__class__.__name__}: {cell}'
+                    cell = None
+                row.append(cell)
+            balances.append(row)
+        return BalanceTable(addresses=list(accounts), tokens=tokens, balances=balances, errors=errors)
+
+    async def close(self):
+        pass
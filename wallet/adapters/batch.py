@@ -0,0 +1,184 @@
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Any, List, Tuple
+
+import requests
+
+from wallet import metrics
+from wallet.adapters.cache import MISS, ChainCache
+from wallet.adapters.cassette import ChainCassette
+from wallet.adapters.exceptions import RPCError
+from wallet.adapters.pool import EndpointPool
+
+BATCH_SIZE = 100  # requests per JSON-RPC array
+BATCH_INTERVAL = 0.01  # seconds a queued request may wait for more requests
+BATCH_TIMEOUT = 30
+
+HTTP_PAYLOAD_TOO_LARGE = 413
+HTTP_TOO_MANY_REQUESTS = 429
+
+# Words of batch limit errors next to 'batch', e.g. geth 'batch too large', erigon 'batch limit 100 exceeded'
+BATCH_LIMIT_WORDS = ('too large', 'too many', 'size', 'limit', 'exceed', 'maximum')
+
+
+def _batch_label(payload: list) -> str:
+    # Batches of one method are labelled with it, e.g. batch:eth_getTransactionReceipt
+    methods = {request['method'] for request in payload}
+    return f'batch:{methods.pop()}' if len(methods) == 1 else 'batch'
+
+
+def _by_position(payload: list, responses: list) -> list:
+    # Request ids differ between runs, cassettes store the responses with the position of their request as id
+    positions = {request['id']: i for i, request in enumerate(payload)}
+    return [{**response, 'id': positions[response.get('id')]} for response in responses
+            if response.get('id') in positions]
+
+
+def is_batch_limit(error) -> bool:
+    """
+    Whether a single JSON-RPC error answering a whole batch rejects its size. Other errors, e.g. an invalid
+    API key or a rate limit, fail the batch as it is
+    """
+    message = str(error.get('message', '') if isinstance(error, dict) else error or '').lower()
+    return 'batch' in message and any(word in message for word in BATCH_LIMIT_WORDS)
+
+
+class BatchTooLarge(Exception):
+    pass
+
+
+class BatchTransport:
+    """
+    Collects JSON-RPC requests and sends them as a single JSON array.
+    The queue is flushed when batch_size requests are waiting or batch_interval seconds after the first one.
+    When the node rejects a batch as too large it is split in halves and the smaller size is kept for next batches
+    """
+
+    def __init__(self, endpoint_uri: str, batch_size: int = None, batch_interval: float = None,
+                 request_kwargs: dict = None, session: requests.Session = None, pool: EndpointPool = None,
+                 cache: ChainCache = None, network: str = None, cassette: ChainCassette = None):
+        """
+        :param cache: final responses are answered from it without a request
+        :param cassette: records the batches or replays them without a request
+        :param network: label of the requests reported to the metrics hooks
+        """
+        self.endpoint_uri = endpoint_uri
+        self.network = network
+        self._pool = pool
+        self._cache = cache
+        self._cassette = cassette
+        self.batch_size = batch_size or BATCH_SIZE
+        self.batch_interval = BATCH_INTERVAL if batch_interval is None else batch_interval
+        self._request_kwargs = {'timeout': BATCH_TIMEOUT, **(request_kwargs or {})}
+        self._session = session or requests.Session()
+        self._ids = itertools.count(1)
+        self._queue: List[Tuple[dict, Future]] = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def queue(self, method: str, params: Any) -> Future:
+        future = Future()
+        if self._cache is not None:
+            result = self._cache.get(method, params)
+            if result is not MISS:
+                future.set_result(result)
+                return future
+        request = {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': next(self._ids)}
+        with self._lock:
+            self._queue.append((request, future))
+            size = len(self._queue)
+            if size == 1 and self.batch_interval:
+                self._timer = threading.Timer(self.batch_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if size >= self.batch_size or not self.batch_interval:
+            self.flush()
+        return future
+
+    def flush(self):
+        with self._lock:
+            queued, self._queue = self._queue, []
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        for i in range(0, len(queued), self.batch_size):
+            self._send(queued[i:i + self.batch_size])
+
+    def request_many(self, calls: List[Tuple[str, Any]]) -> List[Future]:
+        futures = [self.queue(method, params) for method, params in calls]
+        self.flush()
+        return futures
+
+    def _post(self, payload: list) -> list:
+        if self._cassette is None:
+            return self._post_json(payload)
+        responses = self._cassette.call('batch', [[request['method'], request['params']] for request in payload],
+                                        lambda: _by_position(payload, self._post_json(payload)))
+        return [{**response, 'id': payload[response['id']]['id']} for response in responses]
+
+    def _post_json(self, payload: list) -> list:
+        method = _batch_label(payload) if metrics.enabled() else 'batch'
+        response = metrics.measure(self.network, 'rpc', method, lambda: self._post_http(payload, method),
+                                   response_size=lambda response: len(response.content))
+        if response.status_code == HTTP_PAYLOAD_TOO_LARGE:
+            raise BatchTooLarge(response.text)
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, dict):
+            # The node answered the whole batch with a single error, only a size limit is worth a split
+            if is_batch_limit(data.get('error')):
+                raise BatchTooLarge(data.get('error'))
+            raise RPCError(data.get('error'))
+        return data
+
+    def _post_http(self, payload: list, method: str) -> requests.Response:
+        if self._pool:
+            return self._pool.call(lambda uri: self._post_endpoint(uri, payload), method=method)
+        return self._session.post(self.endpoint_uri, json=payload, **self._request_kwargs)
+
+    def _post_endpoint(self, uri: str, payload: list) -> requests.Response:
+        response = self._session.post(uri, json=payload, **self._request_kwargs)
+        # Rate limited and failing endpoints are failed over like transport errors
+        if response.status_code == HTTP_TOO_MANY_REQUESTS or response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+    def _send(self, batch: List[Tuple[dict, Future]]):
+        try:
+            responses = self._post([request for request, _ in batch])
+        except BatchTooLarge as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(RPCError(e.args[0]))
+                return
+            half = len(batch) // 2
+            self.batch_size = min(self.batch_size, half)
+            self._send(batch[:half])
+            self._send(batch[half:])
+            return
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        by_id = {response.get('id'): response for response in responses}
+        missing = []
+        for request, future in batch:
+            response = by_id.get(request['id'])
+            if response is None:
+                missing.append((request, future))
+            elif 'error' in response:
+                future.set_exception(RPCError(response['error']))
+            else:
+                future.set_result(response.get('result'))
+                if self._cache is not None:
+                    self._cache.put(request['method'], request['params'], response.get('result'))
+        if missing:
+            # Some nodes silently drop requests beyond their batch limit
+            if len(missing) == len(batch):
+                for _, future in missing:
+                    future.set_exception(RPCError('No response for request'))
+                return
+            self.batch_size = min(self.batch_size, len(batch) - len(missing))
+            for i in range(0, len(missing), self.batch_size):
+                self._send(missing[i:i + self.batch_size])
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from wallet.registry import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CACHE_SIZE = 65536  # responses kept in memory, the disk tier is unbounded
+HEAD_TTL = 10  # seconds a known head block is trusted for finality checks
+EVM_FINALITY = 64  # blocks below the head that are not reorganized anymore
+TRON_FINALITY = 19  # solidified after 2/3 of the 27 super representatives confirm
+
+EVM_BLOCK_TAG = {  # position of the block tag in params
+    'eth_call': 1,
+    'eth_getBalance': 1,
+    'eth_getCode': 1,
+    'eth_getTransactionCount': 1,
+    'eth_getStorageAt': 2,
+    'eth_getBlockByNumber': 0,
+    'eth_getBlockTransactionCountByNumber': 0,
+}
+EVM_MINED = ('eth_getTransactionReceipt', 'eth_getTransactionByHash', 'eth_getBlockByHash')
+TRON_SOLIDIFIED = ('walletsolidity/gettransactioninfobyid', 'walletsolidity/gettransactionbyid')
+SOLANA_FINALIZED = ('getTransaction', 'getBlock')
+
+MISS = object()
+
+
+def _block_number(value) -> Optional[int]:
+    """
+    Number of a hex or int block tag, None for latest, pending, safe and other moving tags
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.startswith('0x'):
+        return int(value, 16)
+    return None
+
+
+class ResponseCache:
+    """
+    Responses of deterministic requests in a memory LRU tier over an optional SQLite tier.
+    Entries never expire, only responses that can not change anymore must be stored.
+    Returned responses are shared, do not modify them
+    """
+
+    def __init__(self, path: str = None, maxsize: int = MEMORY_CACHE_SIZE):
+        """
+        :param path: SQLite file of the disk tier, None keeps responses in memory only
+        """
+        self.path = path
+        self._memory = LRUCache(maxsize)
+        self._connection = None
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        if path:
+            import sqlite3
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            with self._connection:
+                self._connection.execute('PRAGMA journal_mode=WAL')
+                self._connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value BLOB)')
+
+    @staticmethod
+    def key(chain: Hashable, method: str, params: Any) -> str:
+        # The block tag is a part of params, moving tags are never stored
+        data = json.dumps([chain, method, params], sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.blake2b(data.encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str):
+        """
+        :return: the stored response or MISS
+        """
+        value = self._memory.get(key)
+        if value is not None or self._connection is None:
+            return MISS if value is None else value
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return MISS
+        value = json.loads(zlib.decompress(row[0]))
+        self.disk_hits += 1
+        self._memory.set(key, value)
+        return value
+
+    def set(self, key: str, value):
+        self._memory.set(key, value)
+        if self._connection is not None:
+            data = zlib.compress(json.dumps(value, separators=(',', ':')).encode())
+            with self._lock, self._connection:
+                self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?)', (key, data))
+
+    def stats(self) -> dict:
+        return {**self._memory.stats(), 'disk_hits': self.disk_hits}
+
+    def clear(self):
+        self._memory.clear()
+        self.disk_hits = 0
+        if self._connection is not None:
+            with self._lock, self._connection:
+                self._connection.execute('DELETE FROM responses')
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+_caches: Dict[Optional[str], ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(path: str = None, maxsize: int = MEMORY_CACHE_SIZE) -> ResponseCache:
+    """
+    Process wide cache per file, adapters of several chains can share it
+    """
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = ResponseCache(path, maxsize)
+        return cache
+
+
+class CachePolicy:
+    """
+    Decides which responses of a chain are final. The head is fetched at most every head_ttl seconds,
+    a stale head only makes the finality check more conservative
+    """
+
+    def __init__(self, fetch_head: Callable[[], int] = None, finality: int = 0, head_ttl: float = HEAD_TTL):
+        self._fetch_head = fetch_head
+        self.finality = finality
+        self.head_ttl = head_ttl
+        self._head = -1
+        self._head_time = 0.0
+
+    def is_final(self, number: Optional[int]) -> bool:
+        if number is None:
+            return False
+        if number > self._head - self.finality and self._fetch_head is not None \
+                and time.monotonic() - self._head_time >= self.head_ttl:
+            self._head_time = time.monotonic()
+            try:
+                self._head = max(self._head, self._fetch_head())
+            except Exception as e:
+                # Not caching is always safe
+                logger.warning("Head block request failed: %s", e)
+        return number <= self._head - self.finality
+
+    def cacheable(self, method: str, params: Any, result: Any) -> bool:
+        raise NotImplementedError()
+
+
+class EvmCachePolicy(CachePolicy):
+    def __init__(self, fetch_head: Callable[[], int], finality: int = EVM_FINALITY, head_ttl: float = HEAD_TTL):
+        super().__init__(fetch_head, finality, head_ttl)
+
+    def cacheable(self, method: str, params: Any, result: Any) -> bool:
+        if result is None:
+            return False
+        if method == 'eth_chainId':
+            return True
+        if method in EVM_MINED:
+            return self.is_final(_block_number(result.get('blockNumber') or result.get('number')))
+        if method == 'eth_getLogs':
+            filter_params = params[0]
+            return 'blockHash' not in filter_params and _block_number(filter_params.get('fromBlock')) is not None \
+                and self.is_final(_block_number(filter_params.get('toBlock')))
+        position = EVM_BLOCK_TAG.get(method)
+        if position is None or len(params) <= position:
+            return False
+        return self.is_final(_block_number(params[position]))
+
+
+class TronCachePolicy(CachePolicy):
+    def __init__(self, fetch_head: Callable[[], int], finality: int = TRON_FINALITY, head_ttl: float = HEAD_TTL):
+        super().__init__(fetch_head, finality, head_ttl)
+
+    def cacheable(self, method: str, params: Any, result: Any) -> bool:
+        if not result or 'Error' in result or 'code' in result:
+            return False
+        if method in TRON_SOLIDIFIED:
+            return True
+        if method == 'wallet/gettransactioninfobyid':
+            return self.is_final(result.get('blockNumber'))
+        if method in ('wallet/getblockbynum', 'wallet/getblockbyid'):
+            return self.is_final(result.get('block_header', {}).get('raw_data', {}).get('number'))
+        if method == 'wallet/getblockbylimitnext':
+            # endNum is exclusive
+            return self.is_final(params['endNum'] - 1)
+        if method == 'wallet/gettransactioninfobyblocknum':
+            return self.is_final(params['num'])
+        return False
+
+
+class SolanaCachePolicy(CachePolicy):
+    def cacheable(self, method: str, params: Any, result: Any) -> bool:
+        """
+        :param result: the whole JSON-RPC response, solana-py parses it into typed objects
+        """
+        if method not in SOLANA_FINALIZED or 'error' in result or result.get('result') is None:
+            return False
+        config = params[1] if len(params) > 1 and isinstance(params[1], dict) else {}
+        # Both methods default to finalized
+        return config.get('commitment', 'finalized') == 'finalized'
+
+
+class ChainCache:
+    """
+    View of a ResponseCache for one chain, stores only what its policy accepts
+    """
+
+    def __init__(self, cache: ResponseCache, chain: Hashable, policy: CachePolicy):
+        self.cache = cache
+        self.chain = chain
+        self.policy = policy
+
+    def get(self, method: str, params: Any):
+        """
+        :return: the stored response or MISS
+        """
+        return self.cache.get(self.cache.key(self.chain, method, params))
+
+    def put(self, method: str, params: Any, result: Any):
+        if self.policy.cacheable(method, params, result):
+            self.cache.set(self.cache.key(self.chain, method, params), result)
+
+
+def chain_cache(chain: Hashable, policy: CachePolicy, cache_options: dict = None) -> Optional[ChainCache]:
+    """
+    :param cache_options: path and maxsize of the process wide cache, None disables caching
+    """
+    if cache_options is None:
+        return None
+    return ChainCache(get_response_cache(**cache_options), chain, policy)
@@ -0,0 +1,229 @@
+import gzip
+import importlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from wallet.adapters.exceptions import CassetteMiss, RPCError
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+COMPRESS_LEVEL = 6
+RECORD = 'record'
+REPLAY = 'replay'
+# Only exceptions of these packages are rebuilt from a cassette, others become RPCError
+ERROR_MODULES = ('requests', 'web3', 'tronpy', 'solana', 'wallet')
+
+
+def _params_key(params: Any) -> str:
+    return json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def _error_class(name: str):
+    module, _, qualname = name.rpartition('.')
+    if module.split('.')[0] not in ERROR_MODULES:
+        return None
+    try:
+        value = importlib.import_module(module)
+        for attribute in qualname.split('.'):
+            value = getattr(value, attribute)
+        return value if isinstance(value, type) and issubclass(value, Exception) else None
+    except (ImportError, AttributeError, ValueError):
+        return None
+
+
+def _recorded_error(error: list) -> Exception:
+    # Recorded as class path and message, exceptions that need more arguments become RPCError
+    name, message = error
+    cls = _error_class(name)
+    if cls is not None:
+        try:
+            return cls(message)
+        except Exception:
+            pass
+    return RPCError(f'{name}: {message}')
+
+
+def read_cassette(path: str) -> Iterator[list]:
+    """
+    Recorded interactions [chain, method, params, start, duration, response, error] in recording order.
+    A cassette of a killed process ends with a truncated stream, the complete lines before it are read
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline())
+            if header.get('version') != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version {header.get('version')} in {path}")
+            for line in f:
+                yield json.loads(line)
+        except (EOFError, json.JSONDecodeError) as e:
+            logger.warning("Cassette %s is truncated: %s", path, e)
+
+
+class Cassette:
+    """
+    Provider requests and responses in a gzip compressed JSON lines file.
+    Recording calls through and appends every response or error with its start offset and duration.
+    Replaying serves the responses of each (chain, method, params) in recorded order without a request.
+    With speed, a request starts no earlier than its recorded start offset divided by speed, counted from the
+    first replayed request, and is answered after its recorded duration divided by speed. Without speed every
+    response comes at once.
+    A request repeated more often than recorded, e.g. polling, gets the last response again.
+    A request that was not recorded, e.g. a transaction signed with a new timestamp, gets the next unused
+    response of the same method unless strict
+    """
+
+    def __init__(self, path: str, mode: str = RECORD, speed: float = None, strict: bool = False):
+        """
+        :param mode: 'record' overwrites path, 'replay' reads it
+        :param speed: replay time factor, 1 keeps the original latency
+        :param strict: raise CassetteMiss for requests that were not recorded
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.strict = strict
+        self.interactions = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._replay_started = None
+        # Entries [start, duration, response, error, used] are shared by both indexes
+        self._requests: Dict[Tuple[Hashable, str, str], List[list]] = {}
+        self._methods: Dict[Tuple[Hashable, str], List[list]] = {}
+        self._positions: Dict[tuple, int] = {}
+        if mode == RECORD:
+            self._started = time.time()
+            self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=COMPRESS_LEVEL)
+            self._write({'version': CASSETTE_VERSION, 'started': self._started})
+        else:
+            for chain, method, params, start, duration, response, error in read_cassette(path):
+                entry = [start, duration, response, error, False]
+                self._requests.setdefault((chain, method, _params_key(params)), []).append(entry)
+                self._methods.setdefault((chain, method), []).append(entry)
+                self.interactions += 1
+
+    def _write(self, line):
+        self._file.write(json.dumps(line, separators=(',', ':'), default=str) + '\n')
+
+    def call(self, chain: Hashable, method: str, params: Any, call: Callable[[], Any]):
+        """
+        :param call: sends the request when recording, must return JSON serializable data
+        """
+        if self.mode == REPLAY:
+            return self._replay(chain, method, params)
+        start = time.time()
+        try:
+            response = call()
+        except Exception as e:
+            self._record(chain, method, params, start, None, [f'{type(e).__module__}.{type(e).__qualname__}', str(e)])
+            raise
+        self._record(chain, method, params, start, response, None)
+        return response
+
+    def _record(self, chain, method, params, start, response, error):
+        duration = time.time() - start
+        with self._lock:
+            if self._file is None:
+                return
+            self._write([chain, method, params, round(start - self._started, 6), round(duration, 6), response, error])
+            self.interactions += 1
+
+    def _next(self, index: dict, key: tuple) -> Optional[list]:
+        entries = index.get(key)
+        if not entries:
+            return None
+        position = self._positions.get(key, 0)
+        while position < len(entries) and entries[position][4]:
+            position += 1
+        self._positions[key] = position + 1
+        if position >= len(entries):
+            return entries[-1]
+        entries[position][4] = True
+        return entries[position]
+
+    def _replay(self, chain, method, params):
+        now = time.monotonic()
+        with self._lock:
+            if self._replay_started is None:
+                self._replay_started = now
+            entry = self._next(self._requests, (chain, method, _params_key(params)))
+            if entry is None and not self.strict:
+                entry = self._next(self._methods, (chain, method))
+        if entry is None:
+            raise CassetteMiss(f"{method} {_params_key(params)} of {chain} is not in {self.path}")
+        start, duration, response, error, _ = entry
+        if self.speed:
+            # A client faster than the recording waits for the recorded offset, a slower one only for the latency
+            begin = max(now, self._replay_started + start / self.speed)
+            delay = begin + duration / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if error is not None:
+            raise _recorded_error(error)
+        return response
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path: str, mode: str = RECORD, speed: float = None, strict: bool = False) -> Cassette:
+    """
+    Process wide cassette per file, so the adapters of all chains of a workload share one file
+    """
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = _cassettes[path] = Cassette(path, mode, speed, strict)
+        elif cassette.mode != mode:
+            raise ValueError(f"Cassette {path} is already open for {cassette.mode}")
+        return cassette
+
+
+def close_cassettes():
+    """
+    Close the process wide cassettes, a recording is complete only after it is closed
+    """
+    with _cassettes_lock:
+        for cassette in _cassettes.values():
+            cassette.close()
+        _cassettes.clear()
+
+
+class ChainCassette:
+    """
+    View of a Cassette for one chain
+    """
+
+    def __init__(self, cassette: Cassette, chain: Hashable):
+        self.cassette = cassette
+        self.chain = chain
+
+    def call(self, method: str, params: Any, call: Callable[[], Any]):
+        return self.cassette.call(self.chain, method, params, call)
+
+
+def chain_cassette(chain: Hashable, cassette_options: dict = None) -> Optional[ChainCassette]:
+    """
+    :param cassette_options: path, mode, speed and strict of the process wide cassette, None disables it
+    """
+    if cassette_options is None:
+        return None
+    return ChainCassette(get_cassette(**cassette_options), chain)
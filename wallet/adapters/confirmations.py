@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 256  # transactions per status request
+BACKOFF_FACTOR = 1.5  # poll interval growth while nothing gets confirmed
+MAX_BACKOFF = 8  # the interval never exceeds this many block times
+CONFIRMATION_TIMEOUT = 600  # seconds until a transaction is given up
+
+# (tx ids) -> status per tx id, None while the transaction is pending
+FetchStatuses = Callable[[List[str]], List[Optional[Any]]]
+
+
+class PendingTransaction:
+    __slots__ = ('tx_id', 'future', 'callback', 'deadline')
+
+    def __init__(self, tx_id: str, future: Future, callback: Optional[Callable[[str, Future], None]],
+                 deadline: float):
+        self.tx_id = tx_id
+        self.future = future
+        self.callback = callback
+        self.deadline = deadline
+
+
+class ConfirmationTracker:
+    """
+    Waits for many transactions of one network with one background poller.
+    Pending transactions are checked in batches of batch_size per request. Polling starts one block time after
+    a transaction is tracked and backs off while nothing gets confirmed
+    """
+
+    def __init__(self, fetch_statuses: FetchStatuses, block_time: float, batch_size: int = BATCH_SIZE,
+                 timeout: float = CONFIRMATION_TIMEOUT, backoff_factor: float = BACKOFF_FACTOR,
+                 max_backoff: float = MAX_BACKOFF):
+        """
+        :param fetch_statuses: returns the final status (receipt) of every tx id, or None while it is pending
+        :param block_time: seconds between blocks of the network
+        """
+        self._fetch_statuses = fetch_statuses
+        self.block_time = block_time
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.backoff_factor = backoff_factor
+        self.max_interval = block_time * max_backoff
+        self.interval = block_time
+        self.polls = 0
+        self.requests = 0
+        self._pending: Dict[str, PendingTransaction] = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._next_poll = 0.0
+
+    def track(self, tx_id: str, callback: Callable[[str, Future], None] = None, timeout: float = None) -> Future:
+        """
+        :param callback: called with (tx_id, future) once the transaction is confirmed, failed or timed out
+        :return: future of the final status, TimeoutError if it is not confirmed in time
+        """
+        return self.track_many([tx_id], callback, timeout)[0]
+
+    def track_many(self, tx_ids: List[str], callback: Callable[[str, Future], None] = None,
+                   timeout: float = None) -> List[Future]:
+        now = time.monotonic()
+        deadline = now + (timeout or self.timeout)
+        futures = []
+        with self._condition:
+            idle = not self._pending
+            for tx_id in tx_ids:
+                pending = self._pending.get(tx_id)
+                if pending is None:
+                    pending = self._pending[tx_id] = PendingTransaction(tx_id, Future(), callback, deadline)
+                futures.append(pending.future)
+            # Fresh transactions need at least a block, restart the backoff. A poll that is already scheduled
+            # is never pushed back, a steady stream of tracked transactions would starve it
+            self.interval = self.block_time
+            self._next_poll = now + self.block_time if idle else min(self._next_poll, now + self.block_time)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='confirmations', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return futures
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def poll(self) -> int:
+        """
+        Check every pending transaction once
+        :return: number of resolved transactions
+        """
+        with self._condition:
+            # Futures cancelled by the caller are not polled any more
+            for item in [item for item in self._pending.values() if item.future.cancelled()]:
+                del self._pending[item.tx_id]
+            pending = list(self._pending.values())
+        self.polls += 1
+        resolved = 0
+        for i in range(0, len(pending), self.batch_size):
+            chunk = pending[i:i + self.batch_size]
+            self.requests += 1
+            try:
+                statuses = self._fetch_statuses([item.tx_id for item in chunk])
+            except Exception as e:
+                # Keep the chunk pending, the next poll retries it
+                logger.warning("Confirmation poll failed: %s", e)
+                continue
+            for item, status in zip(chunk, statuses):
+                if status is not None and self._resolve(item, result=status):
+                    resolved += 1
+        now = time.monotonic()
+        for item in pending:
+            if item.deadline <= now and self._resolve(
+                    item, exception=TimeoutError(f"Transaction {item.tx_id} is not confirmed")):
+                resolved += 1
+        return resolved
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def _resolve(self, item: PendingTransaction, result=None, exception: Exception = None) -> bool:
+        """
+        :return: whether this call settled the future
+        """
+        # poll() of a caller may race the background thread, only the first one to take the item settles it
+        with self._condition:
+            if self._pending.get(item.tx_id) is not item:
+                return False
+            del self._pending[item.tx_id]
+            # set_running_or_notify_cancel is False for a future the caller cancelled, setting it would raise
+            if item.future.done() or not item.future.set_running_or_notify_cancel():
+                return False
+            if exception is not None:
+                item.future.set_exception(exception)
+            else:
+                item.future.set_result(result)
+        if item.callback is not None:
+            try:
+                item.callback(item.tx_id, item.future)
+            except Exception:
+                logger.exception("Confirmation callback of %s failed", item.tx_id)
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if not self._pending:
+                        self._condition.wait()
+                        continue
+                    remaining = self._next_poll - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._stopped:
+                    self._thread = None
+                    return
+            try:
+                resolved = self.poll()
+            except Exception:
+                # The poller serves every tracked transaction, it must not die with one bad poll
+                logger.exception("Confirmation poll failed")
+                resolved = 0
+            if resolved:
+                self.interval = self.block_time
+            else:
+                self.interval = min(self.interval * self.backoff_factor, self.max_interval)
+            with self._condition:
+                self._next_poll = max(self._next_poll, time.monotonic() + self.interval)
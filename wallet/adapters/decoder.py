@@ -0,0 +1,217 @@
+from typing import Dict, Optional, Tuple
+
+from eth_abi import decode, encode
+from eth_utils import (
+    event_abi_to_log_topic,
+    function_abi_to_4byte_selector,
+    get_abi_input_types,
+    get_abi_output_types,
+    to_checksum_address,
+)
+
+from wallet import registry
+
+# Shape plan node kinds
+ADDRESS = 0
+TUPLE = 1
+ARRAY = 2
+
+
+def compile_shape(param: dict) -> Optional[tuple]:
+    """
+    Compile an ABI parameter into a conversion plan, None means the decoded value is used as is.
+    Tuples become dicts keyed by component names (lists if components are unnamed), arrays become lists
+    and addresses are checksummed like web3 does
+    """
+    type_ = param['type']
+    if type_.endswith(']'):
+        element = dict(param, type=type_[:type_.rindex('[')])
+        return ARRAY, compile_shape(element)
+    if type_ == 'tuple':
+        components = param.get('components', [])
+        names = [component.get('name') for component in components]
+        return TUPLE, names if all(names) else None, [compile_shape(component) for component in components]
+    if type_ == 'address':
+        return (ADDRESS,)
+    return None
+
+
+def apply_shape(shape: Optional[tuple], value):
+    """
+    Convert a decoded value with a compiled plan without recursion
+    """
+    if shape is None:
+        return value
+    result = [None]
+    stack = [(shape, value, result, 0)]
+    while stack:
+        shape, value, target, key = stack.pop()
+        kind = shape[0]
+        if kind == ADDRESS:
+            target[key] = to_checksum_address(value)
+        elif kind == TUPLE:
+            names, children = shape[1], shape[2]
+            converted = list(value) if names is None else dict(zip(names, value))
+            target[key] = converted
+            for i, child in enumerate(children):
+                if child is not None:
+                    stack.append((child, value[i], converted, i if names is None else names[i]))
+        else:
+            child = shape[1]
+            converted = list(value)
+            target[key] = converted
+            if child is not None:
+                for i, item in enumerate(value):
+                    stack.append((child, item, converted, i))
+    return result[0]
+
+
+class FunctionPlan:
+    """
+    Everything needed to encode a call to a function and decode its calldata and return data
+    """
+
+    def __init__(self, abi: dict):
+        self.abi = abi
+        self.name = abi['name']
+        self.selector = function_abi_to_4byte_selector(abi)
+        self.input_types = get_abi_input_types(abi)
+        self.output_types = get_abi_output_types(abi)
+        self.signature = f"{self.name}({','.join(self.input_types)})"
+        inputs = abi.get('inputs', [])
+        outputs = abi.get('outputs', [])
+        self._input_names = [param['name'] for param in inputs]
+        self._input_shapes = [compile_shape(param) for param in inputs]
+        self._output_names = [param.get('name') for param in outputs]
+        self._output_shapes = [compile_shape(param) for param in outputs]
+        self._output_named = len(outputs) > 1 and all(self._output_names)
+        # Keys of the dict form of several outputs, unnamed outputs are keyed by position
+        self._output_keys = [name or i for i, name in enumerate(self._output_names)]
+
+    @property
+    def fn_name(self) -> str:
+        return self.name
+
+    def __str__(self):
+        return f"<Function {self.signature}>"
+
+    __repr__ = __str__
+
+    def encode_input(self, *args) -> bytes:
+        return self.selector + encode(self.input_types, args)
+
+    def decode_input(self, data: bytes) -> dict:
+        values = decode(self.input_types, data[4:])
+        return {name: apply_shape(shape, value)
+                for name, shape, value in zip(self._input_names, self._input_shapes, values)}
+
+    def decode_output(self, return_data: bytes, keyed: bool = False):
+        """
+        :param keyed: several outputs always become a dict, unnamed ones keyed by position
+        :return: the value for a single output, a dict for named outputs or a list otherwise
+        """
+        values = decode(self.output_types, return_data)
+        if len(values) == 1:
+            return apply_shape(self._output_shapes[0], values[0])
+        mapped = [apply_shape(shape, value) for shape, value in zip(self._output_shapes, values)]
+        if self._output_named:
+            return dict(zip(self._output_names, mapped))
+        return dict(zip(self._output_keys, mapped)) if keyed else mapped
+
+
+class EventPlan:
+    """
+    Everything needed to decode a log of an event: indexed arguments come from topics, the rest from data
+    """
+
+    def __init__(self, abi: dict):
+        self.abi = abi
+        self.name = abi['name']
+        self.topic = event_abi_to_log_topic(abi)
+        inputs = abi.get('inputs', [])
+        self._names = [param['name'] for param in inputs]
+        self._indexed = [(param['name'], param['type'], compile_shape(param))
+                         for param in inputs if param.get('indexed')]
+        data = [param for param in inputs if not param.get('indexed')]
+        self._data_names = [param['name'] for param in data]
+        self._data_types = [param['type'] for param in data]
+        self._data_shapes = [compile_shape(param) for param in data]
+
+    def __str__(self):
+        return f"<Event {self.name}>"
+
+    __repr__ = __str__
+
+    def decode_log(self, topics: list, data: bytes) -> dict:
+        """
+        :param topics: topics of the log including the event topic
+        :return: arguments in ABI order. Indexed dynamic types stay as their 32 byte hash
+        """
+        args = {}
+        for (name, type_, shape), topic in zip(self._indexed, topics[1:]):
+            if type_ in ('string', 'bytes') or type_.endswith(']') or type_ == 'tuple':
+                args[name] = bytes(topic)
+            else:
+                args[name] = apply_shape(shape, decode([type_], bytes(topic))[0])
+        values = decode(self._data_types, bytes(data))
+        for name, shape, value in zip(self._data_names, self._data_shapes, values):
+            args[name] = apply_shape(shape, value)
+        return {name: args[name] for name in self._names}
+
+
+class AbiDecoder:
+    """
+    Functions of an ABI indexed by 4-byte selector and by name, events indexed by topic
+    """
+
+    def __init__(self, abi: list):
+        self.by_selector: Dict[bytes, FunctionPlan] = {}
+        self.by_name: Dict[str, FunctionPlan] = {}
+        self.by_topic: Dict[bytes, EventPlan] = {}
+        for item in abi:
+            if item.get('type', 'function') == 'event' and not item.get('anonymous'):
+                plan = EventPlan(item)
+                self.by_topic[plan.topic] = plan
+                continue
+            if item.get('type', 'function') != 'function':
+                continue
+            plan = FunctionPlan(item)
+            self.by_selector[plan.selector] = plan
+            # The first overload wins like web3 find_functions_by_name()[0]
+            self.by_name.setdefault(plan.name, plan)
+
+    def event(self, topic: bytes) -> Optional[EventPlan]:
+        return self.by_topic.get(bytes(topic))
+
+    def decode_log(self, topics: list, data: bytes) -> Tuple[Optional[EventPlan], Optional[dict]]:
+        """
+        :return: (None, None) for logs of events that are not in the ABI
+        """
+        plan = self.event(topics[0]) if topics else None
+        if plan is None:
+            return None, None
+        return plan, plan.decode_log(topics, data)
+
+    def plan(self, function) -> FunctionPlan:
+        """
+        :param function: a name, a plan or a library function object with an abi attribute, e.g. web3's
+        """
+        if isinstance(function, FunctionPlan):
+            return function
+        if isinstance(function, str):
+            return self.by_name[function]
+        return self.by_selector[function_abi_to_4byte_selector(function.abi)]
+
+    def function(self, data: bytes) -> FunctionPlan:
+        try:
+            return self.by_selector[bytes(data[:4])]
+        except KeyError:
+            raise ValueError(f"Could not find any function with matching selector {bytes(data[:4]).hex()}")
+
+    def decode_input(self, data: bytes) -> Tuple[FunctionPlan, dict]:
+        plan = self.function(data)
+        return plan, plan.decode_input(data)
+
+
+def get_decoder(abi: list) -> AbiDecoder:
+    return registry.get_compiled(abi, AbiDecoder)
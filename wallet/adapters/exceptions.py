@@ -4,3 +4,29 @@ class AlreadyKnownTransaction(Exception):
 
 class AddressNotFound(Exception):
     pass
+
+
+class ContractNotFound(Exception):
+    pass
+
+
+class RPCError(Exception):
+    pass
+
+
+class RetryableRPCError(RPCError):
+    """
+    Error response an endpoint pool fails over on, the response is passed on when no endpoint answers
+    """
+
+    def __init__(self, response):
+        super().__init__(response['error'] if isinstance(response, dict) else response)
+        self.response = response
+
+
+class NoEndpointAvailable(Exception):
+    pass
+
+
+class CassetteMiss(Exception):
+    pass
@@ -0,0 +1,247 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional
+
+from hexbytes import HexBytes
+
+from wallet.registry import LRUCache
+
+FEE_TTL = 3  # seconds fees are shared by all transactions of a chain, about a block
+FEE_HISTORY_BLOCKS = 5
+PRIORITY_FEE_PERCENTILE = 50
+BASE_FEE_MULTIPLIER = 2  # maxFeePerGas survives this many full blocks in a row
+GAS_MARGIN = 1.2  # gas limit over a cached estimate, the same function may take another code path
+GAS_CACHE_SIZE = 1024
+TRANSFER_GAS = 21000
+FRESH_SLOT_GAS = 20000  # SSTORE of a zero slot, e.g. the balance of a new token holder
+# ERC-20 transfer and transferFrom, their cached estimate may have been taken for a receiver with a balance
+FRESH_SLOT_SELECTORS = {bytes.fromhex('a9059cbb'), bytes.fromhex('23b872dd')}
+
+
+class ChainFees:
+    """
+    Chain id, fees and gas estimates of one chain, shared by the fee oracles of all adapters of that chain
+    """
+
+    def __init__(self, chain_id: int = None, eip1559: bool = None):
+        self.chain_id = chain_id
+        self.eip1559 = eip1559
+        self.fees: Optional[dict] = None
+        self.fees_at = 0.0
+        self.gas = LRUCache(GAS_CACHE_SIZE)
+        self.lock = threading.Lock()
+
+
+class FeeOracle:
+    """
+    Transaction fees of one chain. The chain id is read once, fees are read with a single eth_feeHistory
+    (or eth_gasPrice on legacy chains) call and shared for ttl seconds, and gas estimates are remembered
+    per template, see template
+    """
+
+    def __init__(self, eth, chain_id: int = None, ttl: float = FEE_TTL, history_blocks: int = FEE_HISTORY_BLOCKS,
+                 percentile: float = PRIORITY_FEE_PERCENTILE, base_fee_multiplier: float = BASE_FEE_MULTIPLIER,
+                 gas_margin: float = GAS_MARGIN, eip1559: bool = None, state: ChainFees = None):
+        """
+        :param eth: web3 eth module, every read goes through it
+        :param eip1559: None detects dynamic fee support from the base fee of the latest blocks
+        :param state: fees shared with other oracles of the chain, see get_fee_oracle
+        """
+        self._eth = eth
+        self.ttl = ttl
+        self.history_blocks = history_blocks
+        self.percentile = percentile
+        self.base_fee_multiplier = base_fee_multiplier
+        self.gas_margin = gas_margin
+        self._state = state or ChainFees()
+        if self._state.chain_id is None:
+            self._state.chain_id = chain_id
+        if self._state.eip1559 is None:
+            self._state.eip1559 = eip1559
+
+    @property
+    def chain_id(self) -> int:
+        if self._state.chain_id is None:
+            self._state.chain_id = self._eth.chain_id
+        return self._state.chain_id
+
+    @property
+    def eip1559(self) -> Optional[bool]:
+        return self._state.eip1559
+
+    def fees(self) -> dict:
+        """
+        :return: {'maxFeePerGas', 'maxPriorityFeePerGas'} or {'gasPrice'} for legacy chains
+        """
+        state = self._state
+        with state.lock:
+            if state.fees is None or time.monotonic() - state.fees_at >= self.ttl:
+                state.fees = self._read_fees()
+                state.fees_at = time.monotonic()
+            return dict(state.fees)
+
+    def gas_price(self) -> int:
+        fees = self.fees()
+        return fees.get('gasPrice') or fees['maxFeePerGas']
+
+    def _read_fees(self) -> dict:
+        if self.eip1559 is False:
+            return {'gasPrice': self._eth.gas_price}
+        base_fee, priority_fee = self._parse_history(
+            self._eth.fee_history(self.history_blocks, 'latest', [self.percentile]))
+        if not base_fee:
+            return {'gasPrice': self._eth.gas_price}
+        if priority_fee is None:
+            priority_fee = self._eth.max_priority_fee
+        return self._dynamic_fees(base_fee, priority_fee)
+
+    def _parse_history(self, history: dict) -> tuple:
+        """
+        :return: (base fee of the next block, median priority fee or None without rewards)
+        """
+        # The last base fee is the one of the next block
+        base_fee = history['baseFeePerGas'][-1] if history.get('baseFeePerGas') else 0
+        if not base_fee:
+            self._state.eip1559 = False
+        rewards = sorted(reward[0] for reward in history.get('reward') or [] if reward)
+        return base_fee, rewards[len(rewards) // 2] if rewards else None
+
+    def _dynamic_fees(self, base_fee: int, priority_fee: int) -> dict:
+        return {'maxFeePerGas': int(base_fee * self.base_fee_multiplier) + priority_fee,
+                'maxPriorityFeePerGas': priority_fee}
+
+    @staticmethod
+    def template(transaction: dict) -> Hashable:
+        """
+        Key of the gas estimate: receiver, function selector and whether value is sent
+        """
+        to = transaction.get('to')
+        to = to.lower() if isinstance(to, str) else to
+        return to, bytes(HexBytes(transaction.get('data') or b''))[:4], bool(transaction.get('value'))
+
+    def estimate_gas(self, transaction: dict) -> int:
+        """
+        Gas limit of a transaction, estimated once per template. Plain transfers to an address cost 21000
+        """
+        key = self.template(transaction)
+        gas = self._state.gas.get(key)
+        if gas is None:
+            gas = self._with_margin(key, self._eth.estimate_gas(transaction))
+            self._state.gas.set(key, gas)
+        return gas
+
+    def _with_margin(self, key: tuple, gas: int) -> int:
+        if gas == TRANSFER_GAS:
+            return gas
+        # The estimate is shared by every receiver of a token transfer, some of them hold no balance yet
+        return int(gas * self.gas_margin) + (FRESH_SLOT_GAS if key[1] in FRESH_SLOT_SELECTORS else 0)
+
+    def forget_gas(self, transaction: dict):
+        """
+        Drop the cached estimate of a template, e.g. after a transaction ran out of gas
+        """
+        self._state.gas.pop(self.template(transaction))
+
+    def fill(self, transaction: dict) -> dict:
+        """
+        Set chainId, fees and gas of a transaction where missing
+        """
+        transaction.setdefault('chainId', self.chain_id)
+        if not any(key in transaction for key in ('gasPrice', 'maxFeePerGas')):
+            transaction.update(self.fees())
+        if 'gas' not in transaction:
+            transaction['gas'] = self.estimate_gas(transaction)
+        return transaction
+
+
+class AsyncFeeOracle(FeeOracle):
+    """
+    FeeOracle on an AsyncWeb3 eth module, reads are coroutines. Concurrent fee refreshes of one oracle
+    are merged into a single request
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refresh = None  # asyncio.Lock, created in the running loop
+
+    @property
+    def chain_id(self) -> Optional[int]:
+        # None until read_chain_id, fill reads it
+        return self._state.chain_id
+
+    async def read_chain_id(self) -> int:
+        if self._state.chain_id is None:
+            self._state.chain_id = await self._eth.chain_id
+        return self._state.chain_id
+
+    def _fresh_fees(self) -> Optional[dict]:
+        state = self._state
+        with state.lock:
+            if state.fees is None or time.monotonic() - state.fees_at >= self.ttl:
+                return None
+            return dict(state.fees)
+
+    async def fees(self) -> dict:
+        fees = self._fresh_fees()
+        if fees is not None:
+            return fees
+        if self._refresh is None:
+            self._refresh = asyncio.Lock()
+        async with self._refresh:
+            fees = self._fresh_fees()
+            if fees is None:
+                fees = await self._read_fees()
+                with self._state.lock:
+                    self._state.fees = fees
+                    self._state.fees_at = time.monotonic()
+            return dict(fees)
+
+    async def gas_price(self) -> int:
+        fees = await self.fees()
+        return fees.get('gasPrice') or fees['maxFeePerGas']
+
+    async def _read_fees(self) -> dict:
+        if self.eip1559 is False:
+            return {'gasPrice': await self._eth.gas_price}
+        base_fee, priority_fee = self._parse_history(
+            await self._eth.fee_history(self.history_blocks, 'latest', [self.percentile]))
+        if not base_fee:
+            return {'gasPrice': await self._eth.gas_price}
+        if priority_fee is None:
+            priority_fee = await self._eth.max_priority_fee
+        return self._dynamic_fees(base_fee, priority_fee)
+
+    async def estimate_gas(self, transaction: dict) -> int:
+        key = self.template(transaction)
+        gas = self._state.gas.get(key)
+        if gas is None:
+            gas = self._with_margin(key, await self._eth.estimate_gas(transaction))
+            self._state.gas.set(key, gas)
+        return gas
+
+    async def fill(self, transaction: dict) -> dict:
+        if transaction.get('chainId') is None:
+            transaction['chainId'] = await self.read_chain_id()
+        if not any(key in transaction for key in ('gasPrice', 'maxFeePerGas')):
+            transaction.update(await self.fees())
+        if 'gas' not in transaction:
+            transaction['gas'] = await self.estimate_gas(transaction)
+        return transaction
+
+
+_chains: Dict[Hashable, ChainFees] = {}
+_chains_lock = threading.Lock()
+
+
+def get_fee_oracle(chain: Hashable, factory: Callable[[ChainFees], FeeOracle]) -> FeeOracle:
+    """
+    Fee oracle of an adapter. Its fees and gas estimates are shared by all adapters of the chain,
+    its requests go through the client of the adapter
+    :param factory: builds the oracle from the shared state of the chain
+    """
+    with _chains_lock:
+        state = _chains.get(chain)
+        if state is None:
+            state = _chains[chain] = ChainFees()
+    return factory(state)
@@ -0,0 +1,148 @@
+import asyncio
+import contextlib
+from concurrent.futures import Executor
+from typing import List, NamedTuple, Optional, Tuple
+
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+
+# https://github.com/mds1/multicall, deployed at the same address on most EVM chains
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+MULTICALL3_AGGREGATE3 = function_signature_to_4byte_selector('aggregate3((address,bool,bytes)[])')
+MULTICALL3_GET_ETH_BALANCE = function_signature_to_4byte_selector('getEthBalance(address)')
+ERC20_BALANCE_OF = function_signature_to_4byte_selector('balanceOf(address)')
+
+MULTICALL_CALLDATA_LIMIT = 128 * 1024  # bytes of aggregate3 calldata per eth_call
+MULTICALL_GAS_LIMIT = 30_000_000  # gas passed to every eth_call
+MULTICALL_CALL_GAS = 12_000  # budgeted gas of a single balance read
+
+
+class Call(NamedTuple):
+    target: str
+    data: bytes
+    allow_failure: bool = True
+
+
+class CallResult(NamedTuple):
+    success: bool
+    data: bytes
+
+
+def balance_of_call(token_address: str, owner: str) -> Call:
+    return Call(token_address, ERC20_BALANCE_OF + encode(['address'], [owner]))
+
+
+def eth_balance_call(multicall_address: str, owner: str) -> Call:
+    return Call(multicall_address, MULTICALL3_GET_ETH_BALANCE + encode(['address'], [owner]))
+
+
+def call_size(call: Call) -> int:
+    """
+    Size of a call encoded as an element of the (address,bool,bytes)[] array:
+    offset, address, allowFailure, data offset, data length and padded data
+    """
+    return 32 * 5 + (len(call.data) + 31) // 32 * 32
+
+
+def encode_aggregate3(calls: List[Call]) -> bytes:
+    return MULTICALL3_AGGREGATE3 + encode(['(address,bool,bytes)[]'],
+                                          [[(call.target, call.allow_failure, call.data) for call in calls]])
+
+
+def decode_aggregate3(data: bytes) -> List[CallResult]:
+    return [CallResult(*result) for result in decode(['(bool,bytes)[]'], data)[0]]
+
+
+def decode_uint(result: CallResult) -> Optional[int]:
+    if not result.success or len(result.data) < 32:
+        return None
+    return int.from_bytes(result.data[:32], 'big')
+
+
+def chunk_calls(calls: List[Call],
+                calldata_limit: int = MULTICALL_CALLDATA_LIMIT,
+                gas_limit: int = MULTICALL_GAS_LIMIT,
+                call_gas: int = MULTICALL_CALL_GAS) -> List[Tuple[int, List[Call]]]:
+    """
+    Split calls into aggregate3 batches that fit both the calldata and the gas budget
+    :return: list of (index of the first call, calls)
+    """
+    max_calls = max(gas_limit // call_gas, 1)
+    chunks = []
+    start = 0
+    size = 0
+    for i, call in enumerate(calls):
+        size_call = call_size(call)
+        if i > start and (size + size_call > calldata_limit or i - start >= max_calls):
+            chunks.append((start, calls[start:i]))
+            start = i
+            size = 0
+        size += size_call
+    if start < len(calls):
+        chunks.append((start, calls[start:]))
+    return chunks
+
+
+class Multicall:
+    def __init__(self, client, address: str = None,
+                 calldata_limit: int = None, gas_limit: int = None, call_gas: int = None):
+        self._client = client
+        self.address = address or MULTICALL3_ADDRESS
+        self.calldata_limit = calldata_limit or MULTICALL_CALLDATA_LIMIT
+        self.gas_limit = gas_limit or MULTICALL_GAS_LIMIT
+        self.call_gas = call_gas or MULTICALL_CALL_GAS
+
+    def aggregate(self, calls: List[Call], block_identifier='latest',
+                  executor: Executor = None) -> List[Tuple[Optional[CallResult], Optional[str]]]:
+        """
+        Execute calls in as few eth_call requests as the budget allows.
+        A failed request fails only the calls of its chunk
+        :param executor: sends the chunks concurrently, default is one after another
+        :return: (result, error) for every call in input order
+        """
+        def request(chunk):
+            try:
+                return self._chunk_results(self._call(chunk, block_identifier))
+            except Exception as e:
+                return self._chunk_error(chunk, e)
+
+        results = []
+        for chunk_results in (executor.map if executor else map)(request, [chunk for _, chunk in self._chunks(calls)]):
+            results.extend(chunk_results)
+        return results
+
+    def _call(self, chunk: List[Call], block_identifier) -> bytes:
+        return self._client.eth.call(self._transaction(chunk), block_identifier)
+
+    async def aggregate_async(self, calls: List[Call], block_identifier='latest',
+                              semaphore: asyncio.Semaphore = None) -> List[Tuple[Optional[CallResult], Optional[str]]]:
+        """
+        aggregate() for an AsyncWeb3 client, chunks are requested concurrently
+        """
+        async def request(chunk):
+            try:
+                async with semaphore or contextlib.nullcontext():
+                    response = await self._client.eth.call(self._transaction(chunk), block_identifier)
+                return self._chunk_results(response)
+            except Exception as e:
+                return self._chunk_error(chunk, e)
+
+        chunks = self._chunks(calls)
+        results = []
+        for chunk_results in await asyncio.gather(*(request(chunk) for _, chunk in chunks)):
+            results.extend(chunk_results)
+        return results
+
+    def _chunks(self, calls: List[Call]) -> List[Tuple[int, List[Call]]]:
+        return chunk_calls(calls, self.calldata_limit, self.gas_limit, self.call_gas)
+
+    def _transaction(self, chunk: List[Call]) -> dict:
+        return {'to': self.address, 'data': encode_aggregate3(chunk), 'gas': self.gas_limit}
+
+    @staticmethod
+    def _chunk_results(response: bytes) -> list:
+        return [(result, None if result.success else 'call reverted') for result in decode_aggregate3(response)]
+
+    @staticmethod
+    def _chunk_error(chunk: List[Call], e: Exception) -> list:
+        return [(None, f'{e.__class__.__name__}: {e}')] * len(chunk)
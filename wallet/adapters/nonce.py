@@ -0,0 +1,187 @@
+import asyncio
+import heapq
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Type
+
+STUCK_TIMEOUT = 120  # seconds a sent transaction may stay unmined before it is reported as stuck
+
+# Broadcast errors meaning the nonce is already used on chain or by another sender process
+NONCE_USED_ERRORS = ('nonce too low', 'nonce is too low', 'invalid nonce', 'nonce has already been used',
+                     'underpriced', 'replacement')
+# Broadcast errors proving the transaction was not accepted, its nonce is free for the next one
+NOT_ACCEPTED_ERRORS = ('insufficient funds', 'intrinsic gas too low', 'gas too low', 'exceeds block gas limit',
+                       'invalid sender', 'invalid signature', 'invalid chain id', 'chain id mismatch')
+# Broadcast errors meaning this very transaction is already in the mempool
+KNOWN_TRANSACTION_ERRORS = ('already known', 'known transaction', 'already imported')
+
+
+class NonceStatus(NamedTuple):
+    mined: int  # transaction count at the latest block
+    pending: int  # transaction count including the node mempool
+    next: Optional[int]  # next nonce the manager would hand out
+    gaps: List[int]  # sent nonces the node does not know about and released ones, they block every later nonce
+    stuck: List[int]  # sent nonces in the mempool but unmined for longer than stuck_timeout
+
+
+class SenderNonces:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next = None
+        self.released = []  # heap of allocated nonces that never made it to the node
+        self.sent: Dict[int, float] = {}  # nonce -> time it was accepted by the node
+
+
+class ChainNonces:
+    """
+    Nonce state of the senders of one chain, shared by the nonce managers of all adapters of that chain
+    """
+
+    def __init__(self):
+        self.senders: Dict[str, SenderNonces] = {}
+        self.lock = threading.Lock()
+
+
+class NonceManager:
+    """
+    Hands out nonces of one chain locally. Every sender is synced once from its pending transaction count,
+    then nonces are allocated under a per sender lock without a round trip.
+    Nonces of broadcasts that were certainly not accepted are reused first, any other rejection resyncs the sender
+    """
+
+    def __init__(self, get_transaction_count: Callable[[str, str], int], stuck_timeout: float = STUCK_TIMEOUT,
+                 state: ChainNonces = None):
+        """
+        :param get_transaction_count: (address, block_identifier) -> transaction count
+        :param state: senders shared with other managers of the chain, see get_nonce_manager
+        """
+        self._get_transaction_count = get_transaction_count
+        self.stuck_timeout = stuck_timeout
+        self._state = state or ChainNonces()
+
+    def _sender(self, address: str) -> SenderNonces:
+        address = address.lower()
+        with self._state.lock:
+            sender = self._state.senders.get(address)
+            if sender is None:
+                sender = self._state.senders[address] = SenderNonces()
+            return sender
+
+    def allocate(self, address: str) -> int:
+        sender = self._sender(address)
+        with sender.lock:
+            if sender.next is None and not sender.released:
+                sender.next = self._get_transaction_count(address, 'pending')
+            return self._take(sender)
+
+    @staticmethod
+    def _take(sender: SenderNonces) -> int:
+        if sender.released:
+            return heapq.heappop(sender.released)
+        nonce = sender.next
+        sender.next += 1
+        return nonce
+
+    def sent(self, address: str, nonce: int):
+        sender = self._sender(address)
+        with sender.lock:
+            sender.sent[nonce] = time.monotonic()
+
+    def rejected(self, address: str, nonce: int, error: Exception):
+        """
+        Account for a failed broadcast of a transaction with an allocated nonce. The nonce is reused only when the
+        error proves the node did not take the transaction, a used nonce or an unknown error resyncs the sender
+        """
+        message = str(error).lower()
+        if any(text in message for text in KNOWN_TRANSACTION_ERRORS):
+            self.sent(address, nonce)
+        elif any(text in message for text in NONCE_USED_ERRORS):
+            self.resync(address)
+        elif any(text in message for text in NOT_ACCEPTED_ERRORS):
+            self.release(address, nonce)
+        else:
+            self.resync(address)
+
+    def release(self, address: str, nonce: int):
+        """
+        Return an allocated nonce that was not sent so the next transaction fills the gap
+        """
+        sender = self._sender(address)
+        with sender.lock:
+            sender.sent.pop(nonce, None)
+            if sender.next is not None and nonce == sender.next - 1:
+                sender.next = nonce
+            elif nonce not in sender.released:
+                heapq.heappush(sender.released, nonce)
+
+    def resync(self, address: str):
+        """
+        Forget local state, the next allocation reads the pending transaction count again
+        """
+        sender = self._sender(address)
+        with sender.lock:
+            sender.next = None
+            sender.released = []
+            sender.sent.clear()
+
+    def status(self, address: str) -> NonceStatus:
+        """
+        Compare local state with the node: find gaps (sent but unknown to the node) and stuck transactions.
+        Mined nonces are forgotten
+        """
+        mined = self._get_transaction_count(address, 'latest')
+        pending = self._get_transaction_count(address, 'pending')
+        return self._status(address, mined, pending)
+
+    def _status(self, address: str, mined: int, pending: int) -> NonceStatus:
+        sender = self._sender(address)
+        now = time.monotonic()
+        with sender.lock:
+            for nonce in [nonce for nonce in sender.sent if nonce < mined]:
+                del sender.sent[nonce]
+            gaps = sorted({nonce for nonce in sender.sent if nonce >= pending} | set(sender.released))
+            stuck = sorted(nonce for nonce, sent_at in sender.sent.items()
+                           if nonce < pending and now - sent_at > self.stuck_timeout)
+            return NonceStatus(mined=mined, pending=pending, next=sender.next, gaps=gaps, stuck=stuck)
+
+
+class AsyncNonceManager(NonceManager):
+    """
+    NonceManager of asyncio adapters, get_transaction_count is a coroutine function.
+    The sender lock is not held while the count is read, the first count read wins
+    """
+
+    async def allocate(self, address: str) -> int:
+        sender = self._sender(address)
+        while True:
+            with sender.lock:
+                if sender.next is not None or sender.released:
+                    return self._take(sender)
+            count = await self._get_transaction_count(address, 'pending')
+            with sender.lock:
+                if sender.next is None:
+                    sender.next = count
+
+    async def status(self, address: str) -> NonceStatus:
+        mined, pending = await asyncio.gather(self._get_transaction_count(address, 'latest'),
+                                              self._get_transaction_count(address, 'pending'))
+        return self._status(address, mined, pending)
+
+
+_chains: Dict[Hashable, ChainNonces] = {}
+_chains_lock = threading.Lock()
+
+
+def get_nonce_manager(chain: Hashable, get_transaction_count: Callable[[str, str], int],
+                      stuck_timeout: float = STUCK_TIMEOUT,
+                      manager_class: Type[NonceManager] = NonceManager) -> NonceManager:
+    """
+    Nonce manager of an adapter. Its sender state is shared by all adapters of the chain,
+    transaction counts are read with get_transaction_count of the adapter
+    :param manager_class: AsyncNonceManager for asyncio adapters
+    """
+    with _chains_lock:
+        state = _chains.get(chain)
+        if state is None:
+            state = _chains[chain] = ChainNonces()
+    return manager_class(get_transaction_count, stuck_timeout, state)
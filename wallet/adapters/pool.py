@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Union
+
+from wallet import metrics
+from wallet.adapters.exceptions import NoEndpointAvailable
+from wallet.types import RequestEvent
+
+LATENCY_SAMPLES = 100  # latencies kept per endpoint for the p95
+HEDGE_MIN_SAMPLES = 20  # do not hedge until the p95 of the endpoint is meaningful
+EWMA_ALPHA = 0.2
+ERROR_PENALTY = 10  # how much a 100% error rate multiplies the latency score
+FAILURE_THRESHOLD = 3  # consecutive failures that open the circuit
+RESET_TIMEOUT = 30  # seconds before an open circuit lets a trial request through
+HEDGE_WORKERS = 8
+
+# JSON-RPC errors of the endpoint rather than of the request: another endpoint may well answer
+RETRYABLE_ERROR_CODES = {-32005, -32002, 429}  # limit exceeded, resource unavailable
+# Only timeouts of a proxy waiting for its upstream node, execution timeouts of eth_call would fail anywhere
+RETRYABLE_ERROR_MESSAGES = ('rate limit', 'too many requests', 'limit exceeded', 'capacity',
+                            'upstream request timeout', 'upstream timed out', 'gateway timeout',
+                            'header not found', 'unavailable', 'busy')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class Endpoint:
+    """
+    Observed latency, error rate and circuit breaker state of one RPC URI
+    """
+
+    def __init__(self, uri: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT):
+        self.uri = uri
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.latency = None  # EWMA, seconds
+        self.error_rate = 0.0  # EWMA
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def record(self, latency: float, error: bool):
+        with self._lock:
+            self.requests += 1
+            self.error_rate += EWMA_ALPHA * ((1.0 if error else 0.0) - self.error_rate)
+            if error:
+                self.failures += 1
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= self.failure_threshold or self.opened_at is not None:
+                    # A failed trial request in half-open state reopens the circuit
+                    self.opened_at = time.monotonic()
+                return
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._latencies.append(latency)
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[int(len(latencies) * 0.95) - 1]
+
+    def score(self) -> float:
+        # Endpoints without samples go first so every URI gets measured
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1 + ERROR_PENALTY * self.error_rate)
+
+    def stats(self) -> dict:
+        return {'uri': self.uri, 'state': self.state, 'latency': self.latency, 'p95': self.p95(),
+                'error_rate': self.error_rate, 'requests': self.requests, 'failures': self.failures}
+
+
+class EndpointPool:
+    """
+    Routes requests to the URI with the best observed latency and error rate.
+    A failing URI is skipped while its circuit is open, requests fail over to the next URI,
+    and reads can be hedged: when the first URI is slower than its p95 the same request is sent to the second one
+    and the first response wins
+    """
+
+    def __init__(self, uris: List[str], hedge: bool = False, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT, health_check: Callable[[str], object] = None,
+                 health_check_interval: float = None, network: str = None):
+        """
+        :param health_check_interval: seconds between health checks of every URI in a background thread,
+            None runs no checks and open circuits are only retried by requests
+        :param network: label of failover events reported to the metrics hooks
+        """
+        self.network = network
+        self.endpoints = [Endpoint(uri, failure_threshold, reset_timeout) for uri in uris]
+        self.hedge = hedge
+        self._health_check = health_check
+        self._executor = ThreadPoolExecutor(HEDGE_WORKERS, thread_name_prefix='rpc-hedge') if hedge else None
+        if health_check and health_check_interval:
+            thread = threading.Thread(target=self._health_check_loop, args=(health_check_interval,), daemon=True)
+            thread.start()
+
+    def ranked(self) -> List[Endpoint]:
+        available = [endpoint for endpoint in self.endpoints if endpoint.state != OPEN]
+        if not available:
+            # Everything is open, try the circuit that opened first
+            available = [min(self.endpoints, key=lambda endpoint: endpoint.opened_at)]
+        return sorted(available, key=Endpoint.score)
+
+    def call(self, request: Callable[[str], object], hedge: bool = False, method: str = None):
+        """
+        :param request: performs the request against the given URI
+        :param hedge: the request is a read that may be duplicated
+        :param method: label of failover events
+        """
+        endpoints = self.ranked()
+        last_error = None
+        for i, endpoint in enumerate(endpoints):
+            start = time.perf_counter()
+            try:
+                if hedge and self.hedge and i + 1 < len(endpoints) and endpoint.p95() is not None:
+                    return self._call_hedged(request, endpoint, endpoints[i + 1])
+                return self._call(request, endpoint)
+            except Exception as e:
+                last_error = e
+                if metrics.enabled() and i + 1 < len(endpoints):
+                    metrics.emit(RequestEvent(self.network, 'retry', method or 'request', time.perf_counter() - start,
+                                              error=type(e).__name__))
+        raise NoEndpointAvailable(f'All endpoints failed: {last_error}') from last_error
+
+    def check(self):
+        """
+        Run the health check against every URI and record the outcome
+        """
+        for endpoint in self.endpoints:
+            try:
+                self._call(self._health_check, endpoint)
+            except Exception:
+                pass
+
+    def stats(self) -> List[dict]:
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+    @staticmethod
+    def _call(request: Callable[[str], object], endpoint: Endpoint):
+        start = time.monotonic()
+        try:
+            result = request(endpoint.uri)
+        except Exception:
+            endpoint.record(time.monotonic() - start, True)
+            raise
+        endpoint.record(time.monotonic() - start, False)
+        return result
+
+    def _call_hedged(self, request: Callable[[str], object], primary: Endpoint, secondary: Endpoint):
+        futures = [self._executor.submit(self._call, request, primary)]
+        done, _ = wait(futures, timeout=primary.p95())
+        if not done:
+            futures.append(self._executor.submit(self._call, request, secondary))
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _health_check_loop(self, interval: float):
+        while True:
+            self.check()
+            time.sleep(interval)
+
+
+def is_retryable(error) -> bool:
+    """
+    Whether a JSON-RPC error object is worth sending to the next endpoint
+    """
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get('message', '')).lower()
+    return error.get('code') in RETRYABLE_ERROR_CODES or any(text in message for text in RETRYABLE_ERROR_MESSAGES)
+
+
+def endpoint_uris(endpoint_uri: Union[str, List[str]]) -> List[str]:
+    return endpoint_uri if isinstance(endpoint_uri, list) else [endpoint_uri]
+
+
+def is_pooled(endpoint_uri: Union[str, List[str]], pool_options: dict = None) -> bool:
+    """
+    A pool is used for several URIs or when pool options are given explicitly
+    """
+    return len(endpoint_uris(endpoint_uri)) > 1 or bool(pool_options)
@@ -1,47 +1,210 @@
+import asyncio
+import functools
+import json
 from decimal import Decimal
-from typing import Union, Optional, Dict
+from typing import Union, Optional, Dict, List
 
+import httpx
 import solana
 from solana.rpc import types, core
+from solana.exceptions import SolanaRpcException, handle_exceptions
 from solana.rpc.async_api import AsyncClient
+from solana.rpc.providers.async_http import AsyncHTTPProvider
+from solana.rpc.providers.core import _parse_raw
+from solana.rpc.providers.http import HTTPProvider
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
-from solders.system_program import TransferParams, transfer
+from solders.signature import Signature
+from solders.system_program import (ID as SYSTEM_PROGRAM_ID, CreateAccountParams, TransferParams, create_account,
+                                    transfer)
+from solders.transaction_status import TransactionConfirmationStatus
 from solana.transaction import Transaction
 
-from wallet.models import Account
+from wallet import hd, keygen, metrics
+from wallet.adapters.base import AccountCache, AdapterBase, AsyncAdapterBase
+from wallet.adapters.cache import MISS, SOLANA_FINALIZED, ChainCache, SolanaCachePolicy, chain_cache
+from wallet.adapters.cassette import ChainCassette, chain_cassette
+from wallet.models import CompactAccount
 from solana.rpc.api import Client
 
-from wallet.types import Token
+from wallet.types import BalanceTable, Token
 
+DERIVATION_PATH = "m/44'/501'/{index}'/0'"
+BLOCK_TIME = 0.4
+MAX_SIGNATURE_STATUSES = 256  # getSignatureStatuses limit
+MAX_MULTIPLE_ACCOUNTS = 100  # getMultipleAccounts limit
+NO_DATA = types.DataSliceOpts(offset=0, length=0)  # balances need only the lamports of an account
+MAX_ADDRESS_LENGTH = 44  # base58 public key, longer text is a base58 keypair
+CONFIRMED_STATUSES = (TransactionConfirmationStatus.Confirmed, TransactionConfirmationStatus.Finalized)
 
-class SolanaAdapter:
-    def __init__(self, endpoint_uri, decimals=None, extra_headers: Optional[Dict[str, str]] = None):
-        self._client = AsyncClient(endpoint_uri, extra_headers=extra_headers)
+
+def account_from_key(private_key: bytes) -> CompactAccount:
+    return _keypair_account(Keypair.from_seed(private_key))
+
+
+def _keypair_account(keypair: Keypair) -> CompactAccount:
+    # The raw 64 byte keypair, its base58 form is 87 or 88 characters long
+    return CompactAccount(address=str(keypair.pubkey()), private_key=bytes(keypair))
+
+
+class MeteredSolanaProvider(HTTPProvider):
+    """
+    solana-py HTTPProvider reporting every HTTP request to the metrics hooks
+    """
+
+    def __init__(self, endpoint_uri: str, network: str = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.network = network
+
+    def make_request_unparsed(self, body) -> str:
+        if not metrics.enabled():
+            return super().make_request_unparsed(body)
+        request = body.to_json()
+        return metrics.measure(self.network, 'rpc', json.loads(request)['method'],
+                               functools.partial(super().make_request_unparsed, body), lambda: len(request), len)
+
+    def make_batch_request_unparsed(self, reqs) -> str:
+        return metrics.measure(self.network, 'rpc', 'batch',
+                               functools.partial(super().make_batch_request_unparsed, reqs), response_size=len)
+
+
+class MeteredAsyncSolanaProvider(AsyncHTTPProvider):
+    """
+    solana-py AsyncHTTPProvider reporting every HTTP request to the metrics hooks
+    """
+
+    def __init__(self, endpoint_uri: str, network: str = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.network = network
+
+    async def make_request_unparsed(self, body) -> str:
+        if not metrics.enabled():
+            return await super().make_request_unparsed(body)
+        request = body.to_json()
+        return await metrics.measure_async(self.network, 'rpc', json.loads(request)['method'],
+                                           functools.partial(super().make_request_unparsed, body),
+                                           lambda: len(request), len)
+
+    async def make_batch_request_unparsed(self, reqs) -> str:
+        return await metrics.measure_async(self.network, 'rpc', 'batch',
+                                           functools.partial(super().make_batch_request_unparsed, reqs),
+                                           response_size=len)
+
+
+class CassetteSolanaProvider(HTTPProvider):
+    """
+    solana-py HTTPProvider recording the requests of the wrapped provider to a cassette or replaying them from it
+    """
+
+    def __init__(self, provider: HTTPProvider, cassette: ChainCassette):
+        super().__init__(provider.endpoint_uri)
+        self.provider = provider
+        self.cassette = cassette
+
+    def make_request_unparsed(self, body) -> str:
+        request = json.loads(body.to_json())
+        response = self.cassette.call(request['method'], request.get('params', []),
+                                      lambda: json.loads(self.provider.make_request_unparsed(body)))
+        return json.dumps(response)
+
+    def make_batch_request_unparsed(self, reqs) -> str:
+        params = [json.loads(body.to_json()) for body in reqs]
+        params = [[request['method'], request.get('params', [])] for request in params]
+        response = self.cassette.call('batch', params,
+                                      lambda: json.loads(self.provider.make_batch_request_unparsed(reqs)))
+        return json.dumps(response)
+
+
+class CachedSolanaProvider(HTTPProvider):
+    """
+    solana-py HTTPProvider answering finalized transactions and blocks from a response cache
+    """
+
+    def __init__(self, provider: HTTPProvider, cache: ChainCache):
+        super().__init__(provider.endpoint_uri)
+        self.provider = provider
+        self.cache = cache
+
+    @handle_exceptions(SolanaRpcException, httpx.HTTPError)
+    def make_request(self, body, parser):
+        request = json.loads(body.to_json())
+        method, params = request['method'], request.get('params', [])
+        if method not in SOLANA_FINALIZED:
+            return super().make_request(body, parser)
+        response = self.cache.get(method, params)
+        if response is MISS:
+            response = json.loads(self.make_request_unparsed(body))
+            self.cache.put(method, params, response)
+        return _parse_raw(json.dumps(response), parser=parser)
+
+    def make_request_unparsed(self, body) -> str:
+        return self.provider.make_request_unparsed(body)
+
+    def make_batch_request_unparsed(self, reqs) -> str:
+        return self.provider.make_batch_request_unparsed(reqs)
+
+
+class SolanaAdapter(AdapterBase):
+    def __init__(self, endpoint_uri, decimals=None, extra_headers: Optional[Dict[str, str]] = None,
+                 account_cache_options: dict = None, block_time: float = None, confirmation_options: dict = None,
+                 cache_options: dict = None, network_name: str = None, cassette_options: dict = None):
+        self._client = Client(endpoint_uri, extra_headers=extra_headers)
+        provider = MeteredSolanaProvider(endpoint_uri, network_name, extra_headers=extra_headers)
+        self._cassette = chain_cassette(network_name or endpoint_uri, cassette_options)
+        if self._cassette is not None:
+            provider = CassetteSolanaProvider(provider, self._cassette)
+        self._cache = chain_cache(endpoint_uri, SolanaCachePolicy(), cache_options)
+        if self._cache is not None:
+            provider = CachedSolanaProvider(provider, self._cache)
+        self._client._provider = provider
+        self._accounts = AccountCache(**(account_cache_options or {}))
+        self._block_time = block_time or BLOCK_TIME
+        self._confirmation_options = {'batch_size': MAX_SIGNATURE_STATUSES, **(confirmation_options or {})}
         self._decimals = decimals or 9
 
-    def create_account(self, address: Union[str, bytes]) -> Account:
-        if len(address) == 88:
-            keypair = Keypair.from_base58_string(address)
-            return Account(address=str(keypair.pubkey()), private_key=address)
-        return Account.create(address=address)
+    @staticmethod
+    def _parse_account(address: Union[str, bytes]) -> CompactAccount:
+        if isinstance(address, bytes) and len(address) == 64:
+            return _keypair_account(Keypair.from_bytes(address))
+        if isinstance(address, str) and len(address.strip()) > MAX_ADDRESS_LENGTH:
+            return _keypair_account(Keypair.from_base58_string(address.strip()))
+        return CompactAccount.create(address=address)
+
+    @staticmethod
+    def generate_account() -> CompactAccount:
+        return _keypair_account(Keypair())
+
+    @staticmethod
+    def generate_accounts(n: int, **kwargs) -> Optional[List[CompactAccount]]:
+        return keygen.generate_accounts(account_from_key, n, **kwargs)
+
+    @staticmethod
+    def derive_accounts(seed: bytes, start: int, count: int, path_template: str = None,
+                        **kwargs) -> List[CompactAccount]:
+        return hd.derive_accounts(seed, hd.ED25519, path_template or DERIVATION_PATH, start, count, account_from_key,
+                                  **kwargs)
 
     @classmethod
-    def _get_keypair(cls, account: Account) -> Keypair:
-        if len(account.private_key) == 32:
-            return Keypair.from_bytes(account.private_key)
-        if len(account.private_key) == 64:
-            return Keypair.from_seed(bytes.fromhex(account.private_key))
-        if len(account.private_key) == 88:
-            return Keypair.from_base58_string(account.private_key.decode())
+    def _get_keypair(cls, account: CompactAccount) -> Keypair:
+        private_key = account.private_key
+        if len(private_key) == 32:
+            return Keypair.from_seed(private_key)
+        if len(private_key) == 64:
+            try:
+                # A hex encoded seed
+                return Keypair.from_seed(bytes.fromhex(private_key.decode()))
+            except ValueError:
+                return Keypair.from_bytes(private_key)
+        if len(private_key) > MAX_ADDRESS_LENGTH:
+            return Keypair.from_base58_string(private_key.decode())
         # mnemo = Mnemonic("english")
         # seed = mnemo.to_seed("enact denial cave suspect number general august deer outdoor fatal mistake local")
         # payer = Keypair.from_bytes(seed)
         raise NotImplementedError()
 
     @classmethod
-    def _get_pubkey(cls, account: Union[str, Account]) -> Pubkey:
-        if isinstance(account, Account):
+    def _get_pubkey(cls, account: Union[str, CompactAccount]) -> Pubkey:
+        if not isinstance(account, str):
             if not account.address:
                 return cls._get_keypair(account).pubkey()
             address = account.address
@@ -49,24 +212,80 @@ class SolanaAdapter:
             address = account
         return Pubkey.from_string(address)
 
-    def get_balance(self, account: Account, token: Token = None):
+    def get_balance(self, account: CompactAccount, token: Token = None):
         if token:
             balance = self._client.get_token_accounts_by_owner_json_parsed(
                 self._get_pubkey(account),
                 opts=solana.rpc.types.TokenAccountOpts(mint=self._get_pubkey(token.address)))
-            return Decimal(balance.value[0].account.data.parsed['info']['tokenAmount']['uiAmount'])
+            return self._token_balance(balance)
         else:
             balance = self._client.get_balance(self._get_pubkey(account))
             return Decimal(balance.value / 10 ** self._decimals)
 
-    def build_transaction(self, sender: Account, account: Account, amount: Decimal):
+    @staticmethod
+    def _token_balance(response) -> Decimal:
+        return Decimal(response.value[0].account.data.parsed['info']['tokenAmount']['uiAmount'])
+
+    def _native_cells(self, response) -> list:
+        # Accounts that do not exist yet are None, their balance is 0
+        return [(Decimal(account.lamports if account else 0).scaleb(-self._decimals), None)
+                for account in response.value]
+
+    @staticmethod
+    def _balance_table(accounts: list, tokens: List[Token], natives: list, token_cells: list) -> BalanceTable:
+        """
+        :param natives: (value, error) per account, empty without a native column
+        :param token_cells: (value, error) of the token cells row by row
+        """
+        token_cells = iter(token_cells)
+        balances = []
+        errors = {}
+        for i in range(len(accounts)):
+            row = []
+            for j, token in enumerate(tokens):
+                value, error = natives[i] if token is None else next(token_cells)
+                if error is not None:
+                    errors[(i, j)] = error
+                row.append(value)
+            balances.append(row)
+        return BalanceTable(addresses=accounts, tokens=tokens, balances=balances, errors=errors)
+
+    def get_balances(self, accounts: List[CompactAccount], tokens: List[Token] = None) -> BalanceTable:
+        """
+        Native balances (token None) with getMultipleAccounts, MAX_MULTIPLE_ACCOUNTS accounts per request.
+        SPL token balances are read with a request per cell
+        :return: table with a row per account and a column per token in input order
+        """
+        tokens = list(tokens or [None])
+        accounts = list(accounts)
+        natives = []
+        if None in tokens:
+            pubkeys = [self._get_pubkey(account) for account in accounts]
+            for i in range(0, len(pubkeys), MAX_MULTIPLE_ACCOUNTS):
+                chunk = pubkeys[i:i + MAX_MULTIPLE_ACCOUNTS]
+                try:
+                    natives.extend(self._native_cells(self._client.get_multiple_accounts(chunk, data_slice=NO_DATA)))
+                except Exception as e:
+                    natives.extend([(None, f'{e.__class__.__name__}: {e}')] * len(chunk))
+        token_cells = []
+        for account in accounts:
+            for token in tokens:
+                if token is None:
+                    continue
+                try:
+                    token_cells.append((self.get_balance(account, token=token), None))
+                except Exception as e:
+                    token_cells.append((None, f'{e.__class__.__name__}: {e}'))
+        return self._balance_table(accounts, tokens, natives, token_cells)
+
+    def build_transaction(self, sender: CompactAccount, account: CompactAccount, amount: Decimal):
         return Transaction().add(transfer(TransferParams(
             from_pubkey=self._get_pubkey(sender),
             to_pubkey=self._get_pubkey(account),
             lamports=int(amount * 10 ** self._decimals))
         ))
 
-    def send(self, sender: Account, account: Account, amount, skip_confirmation=False) -> str:
+    def send(self, sender: CompactAccount, account: CompactAccount, amount, skip_confirmation=False) -> str:
         transaction = self.build_transaction(sender, account, amount)
 
         try:
@@ -79,37 +298,127 @@ class SolanaAdapter:
 
         return str(response.value)
 
-    def deploy_account(self, address_key: str, payer_key: str):
-        address = self.get_keypair(address_key)
+    def _fetch_statuses(self, signatures: List[str]) -> list:
+        response = self._client.get_signature_statuses([Signature.from_string(signature) for signature in signatures])
+        return [status if status and status.confirmation_status in CONFIRMED_STATUSES else None
+                for status in response.value]
 
-        payer = self.get_keypair(payer_key)
+    @staticmethod
+    def _create_account_transaction(address: Keypair, payer: Keypair, lamports: int) -> Transaction:
+        return Transaction().add(create_account(CreateAccountParams(
+            from_pubkey=payer.pubkey(),
+            to_pubkey=address.pubkey(),
+            lamports=lamports,
+            space=0, owner=SYSTEM_PROGRAM_ID)))
 
-        # new_account = Account()
-        # request_airdrop = self._client.request_airdrop(address_pubkey, 1000000000)
-        # a = self._client.get_balance(address_pubkey)
+    def deploy_account(self, address_key: str, payer_key: str):
+        """
+        Create the system account of address_key, payer_key pays its rent exemption
+        """
+        address = self._get_keypair(self.create_account(address_key))
+        payer = self._get_keypair(self.create_account(payer_key))
         fee = self._client.get_minimum_balance_for_rent_exemption(0)
+        try:
+            self._client.send_transaction(self._create_account_transaction(address, payer, fee.value), payer, address)
+        except solana.rpc.core.RPCException as e:
+            print(e)
 
-        params = CreateAccountParams(
-            from_pubkey=payer.pubkey(),
-            to_pubkey=address.pubkey(),
-            lamports=fee.value,
-            space=0, owner=SYSTEM_PROGRAM_ID)
-
-        create_tx = create_account(params)
-        txn = Transaction()
-        txn.add(
-            create_tx
-        )
-        # opts = TxOpts(skip_confirmation=False)
-        # print ("Please wait for confirmation ...")
-        # poor_account = Keypair()
-        # payer spends lamports for creation
+        return True
+
+
+class AsyncSolanaAdapter(AsyncAdapterBase, SolanaAdapter):
+    """
+    SolanaAdapter on a correctly awaited AsyncClient
+    """
+
+    def __init__(self, endpoint_uri, decimals=None, extra_headers: Optional[Dict[str, str]] = None,
+                 max_concurrency: int = None, account_cache_options: dict = None, block_time: float = None,
+                 confirmation_options: dict = None, network_name: str = None):
+        """
+        :param network_name: label of the requests reported to the metrics hooks
+        """
+        AsyncAdapterBase.__init__(self, max_concurrency, block_time or BLOCK_TIME,
+                                  {'batch_size': MAX_SIGNATURE_STATUSES, **(confirmation_options or {})})
+        self._client = AsyncClient(endpoint_uri, extra_headers=extra_headers)
+        self._client._provider = MeteredAsyncSolanaProvider(endpoint_uri, network_name, extra_headers=extra_headers)
+        self._accounts = AccountCache(**(account_cache_options or {}))
+        self._decimals = decimals or 9
+
+    async def get_balance(self, account: CompactAccount, token: Token = None):
+        if token:
+            balance = await self._limit(self._client.get_token_accounts_by_owner_json_parsed(
+                self._get_pubkey(account),
+                opts=solana.rpc.types.TokenAccountOpts(mint=self._get_pubkey(token.address))))
+            return self._token_balance(balance)
+        balance = await self._limit(self._client.get_balance(self._get_pubkey(account)))
+        return Decimal(balance.value / 10 ** self._decimals)
+
+    async def _native_chunk(self, pubkeys: List[Pubkey]) -> list:
         try:
-            self._client.send_transaction(txn, payer, address)
+            return self._native_cells(await self._limit(self._client.get_multiple_accounts(pubkeys,
+                                                                                            data_slice=NO_DATA)))
+        except Exception as e:
+            return [(None, f'{e.__class__.__name__}: {e}')] * len(pubkeys)
+
+    async def get_balances(self, accounts: List[CompactAccount], tokens: List[Token] = None) -> BalanceTable:
+        tokens = list(tokens or [None])
+        accounts = list(accounts)
+        natives = []
+        if None in tokens:
+            pubkeys = [self._get_pubkey(account) for account in accounts]
+            chunks = await asyncio.gather(*(self._native_chunk(pubkeys[i:i + MAX_MULTIPLE_ACCOUNTS])
+                                            for i in range(0, len(pubkeys), MAX_MULTIPLE_ACCOUNTS)))
+            natives = [cell for chunk in chunks for cell in chunk]
+        values = await asyncio.gather(*(self.get_balance(account, token=token)
+                                        for account in accounts for token in tokens if token is not None),
+                                      return_exceptions=True)
+        token_cells = [(None, f'{value.__class__.__name__}: {value}') if isinstance(value, Exception) else (value, None)
+                       for value in values]
+        return self._balance_table(accounts, tokens, natives, token_cells)
+
+    async def send(self, sender: CompactAccount, account: CompactAccount, amount, skip_confirmation=False) -> str:
+        transaction = self.build_transaction(sender, account, amount)
+
+        try:
+            response = await self._limit(self._client.send_transaction(
+                transaction,
+                self._get_keypair(sender),
+                opts=types.TxOpts(skip_confirmation=skip_confirmation)))
+        except solana.rpc.core.RPCException as e:
+            print(e)
+            raise e
+
+        return str(response.value)
+
+    async def _fetch_statuses(self, signatures: List[str]) -> list:
+        response = await self._limit(self._client.get_signature_statuses(
+            [Signature.from_string(signature) for signature in signatures]))
+        return [status if status and status.confirmation_status in CONFIRMED_STATUSES else None
+                for status in response.value]
+
+    async def deploy_account(self, address_key: str, payer_key: str):
+        address = self._get_keypair(self.create_account(address_key))
+        payer = self._get_keypair(self.create_account(payer_key))
+        fee = await self._limit(self._client.get_minimum_balance_for_rent_exemption(0))
+        try:
+            await self._limit(self._client.send_transaction(
+                self._create_account_transaction(address, payer, fee.value), payer, address))
         except solana.rpc.core.RPCException as e:
             print(e)
 
         return True
 
+    async def close(self):
+        await self._client.close()
+
+
 def create_adapter(network, rpc: str = None, chain: int = None, decimals: int = None, **kwargs):
+    kwargs.setdefault('block_time', network.block_time)
+    kwargs.setdefault('network_name', network.name)
     return SolanaAdapter(rpc or network.rpc, decimals, **kwargs)
+
+
+def create_async_adapter(network, rpc: str = None, chain: int = None, decimals: int = None, **kwargs):
+    kwargs.setdefault('block_time', network.block_time)
+    kwargs.setdefault('network_name', network.name)
+    return AsyncSolanaAdapter(rpc or network.rpc, decimals, **kwargs)
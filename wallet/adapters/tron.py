@@ -1,43 +1,334 @@
-from typing import Union
+import asyncio
+import functools
+import json
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from decimal import Decimal
+from typing import Union, List, Any, Tuple, Optional, Callable, Dict, Hashable
 
+import coincurve
+import httpx
 import math
 import tronpy
 import trontxsize as trontxsize
-from tronpy import Tron, Contract as TronContract
+from tronpy import Tron, AsyncTron, Contract as TronContract, AsyncContract, keys
+from tronpy.async_tron import AsyncTransaction
 from tronpy.abi import trx_abi
 from tronpy.keys import PrivateKey
-from tronpy.providers import HTTPProvider
+from tronpy.providers import HTTPProvider, AsyncHTTPProvider
 from tronpy.tron import TAddress, Transaction
 
-from wallet.adapters.base import AdapterBase
-from wallet.adapters.exceptions import AddressNotFound
-from wallet.models import Contract
-from wallet.types import Token
+from wallet import hd, keygen, metrics, registry, signing
+from wallet.adapters.base import AccountCache, AdapterBase, AsyncAdapterBase
+from wallet.adapters.cache import MISS, ChainCache, TronCachePolicy, chain_cache
+from wallet.adapters.cassette import ChainCassette, chain_cassette
+from wallet.adapters.exceptions import AddressNotFound, ContractNotFound
+from wallet.adapters.multicall import (Call, Multicall, balance_of_call, decode_uint, encode_aggregate3,
+                                      eth_balance_call)
+from wallet.adapters.pool import EndpointPool, endpoint_uris, is_pooled
+from wallet.models import CompactAccount, CompactContract
+from wallet.types import BalanceTable, Token
 
-TRC20_ENERGY_UNIT_PRICE = 420
+TRC20_ENERGY_UNIT_PRICE = 420  # sun per energy when the chain parameters have no getEnergyFee
+TRX_BANDWIDTH_UNIT_PRICE = 1000  # sun per byte when the chain parameters have no getTransactionFee
 TRC20_FEE_LIMIT_FACTOR = 1.1
 RECEIPT_RETRY_INTERVAL = 5
 RECEIPT_RETRY_ATTEMPTS = 3
 TRX_NET_FEE = 3_000_000
 TRC20_FEE_LIMIT = 30_000_000
+ASYNC_TIMEOUT = 10.0
+DERIVATION_PATH = "m/44'/195'/0'/0/{index}"
+BLOCK_TIME = 3
+STATUS_WORKERS = 8  # concurrent gettransactioninfobyid requests, TRON has no batch lookup
+BALANCE_WORKERS = 8  # concurrent balance requests of get_balances
+MULTICALL_ENERGY_LIMIT = 6_000_000  # energy budget of one aggregate3 constant call, about 500 balance reads
+AGGREGATE3_SIGNATURE = 'aggregate3((address,bool,bytes)[])'
+CHAIN_PARAMETERS_TTL = 600  # seconds, prices change only by committee proposals
+ESTIMATE_WORKERS = 8  # concurrent energy simulations of estimate_many
+
+# Shape of a signed TriggerSmartContract transaction for trigger_transaction_size
+TRIGGER_SMART_CONTRACT = 31  # Transaction.Contract.ContractType
+TRIGGER_SMART_CONTRACT_URL = 'type.googleapis.com/protocol.TriggerSmartContract'
+TRANSACTION_EXPIRATION = 60_000  # ms after the timestamp, as built by tronpy
+ADDRESS_SIZE = 21
+SIGNATURE_SIZE = 65
+MAX_RESULT_SIZE_IN_TX = 64  # bytes of bandwidth charged on top of the transaction itself
+
+
+@functools.lru_cache(maxsize=signing.KEY_CACHE_SIZE)
+def _tron_key(private_key: bytes) -> coincurve.PrivateKey:
+    # PrivateKey.sign_msg_hash parses the key again on every signature
+    return coincurve.PrivateKey(private_key)
+
+
+def sign_transaction_ids(items: List[Tuple[bytes, str]]) -> List[bytes]:
+    """
+    Sign (private key, txID) pairs, runs in signing worker processes
+    """
+    return [_tron_key(private_key).sign_recoverable(bytes.fromhex(txid), hasher=None) for private_key, txid in items]
+
+
+def account_from_key(private_key: bytes) -> CompactAccount:
+    return CompactAccount(address=PrivateKey(private_key).public_key.to_base58check_address(), private_key=private_key)
+
+
+class MeteredTronProvider(HTTPProvider):
+    """
+    tronpy HTTPProvider reporting every request to the metrics hooks. Payload sizes are of the re-encoded JSON
+    """
+
+    def __init__(self, endpoint_uri: str, network: str = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.network = network
+
+    def make_request(self, method: str, params: Any = None) -> dict:
+        return metrics.measure(self.network, 'rpc', method, functools.partial(super().make_request, method, params),
+                               lambda: len(json.dumps(params or {})), lambda result: len(json.dumps(result)))
+
+
+class MeteredAsyncTronProvider(AsyncHTTPProvider):
+    """
+    tronpy AsyncHTTPProvider reporting every request to the metrics hooks
+    """
+
+    def __init__(self, endpoint_uri: str, network: str = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.network = network
+
+    async def make_request(self, method: str, params: Any = None) -> dict:
+        return await metrics.measure_async(self.network, 'rpc', method,
+                                           functools.partial(super().make_request, method, params),
+                                           lambda: len(json.dumps(params or {})),
+                                           lambda result: len(json.dumps(result)))
+
+
+class PooledTronProvider(HTTPProvider):
+    """
+    tronpy HTTPProvider over several URIs routed by an EndpointPool. Broadcasts are never duplicated
+    """
+
+    def __init__(self, endpoint_uris: List[str], pool_options: dict = None, provider_options: dict = None,
+                 network: str = None):
+        super().__init__(endpoint_uris[0], **(provider_options or {}))
+        self._providers = {uri: MeteredTronProvider(uri, network, **(provider_options or {})) for uri in endpoint_uris}
+        self.pool = EndpointPool(endpoint_uris, health_check=self._health_check,
+                                 **{'network': network, **(pool_options or {})})
+
+    def _health_check(self, uri: str):
+        self._providers[uri].make_request('wallet/getnowblock')
+
+    def make_request(self, method: str, params: Any = None) -> dict:
+        return self.pool.call(lambda uri: self._providers[uri].make_request(method, params),
+                              hedge=not method.endswith('broadcasttransaction'), method=method)
+
+
+class CachedTronProvider(HTTPProvider):
+    """
+    tronpy HTTPProvider answering final requests from a response cache
+    """
+
+    def __init__(self, provider: HTTPProvider, cache: ChainCache):
+        # tronpy only accepts HTTPProvider instances, the session of the base class is not used
+        super().__init__(provider.endpoint_uri)
+        self.provider = provider
+        self.cache = cache
+
+    def make_request(self, method: str, params: Any = None) -> dict:
+        result = self.cache.get(method, params)
+        if result is MISS:
+            result = self.provider.make_request(method, params)
+            self.cache.put(method, params, result)
+        return result
+
+
+class CassetteTronProvider(HTTPProvider):
+    """
+    tronpy HTTPProvider recording the requests of the wrapped provider to a cassette or replaying them from it
+    """
+
+    def __init__(self, provider: HTTPProvider, cassette: ChainCassette):
+        super().__init__(provider.endpoint_uri)
+        self.provider = provider
+        self.cassette = cassette
+
+    def make_request(self, method: str, params: Any = None) -> dict:
+        return self.cassette.call(method, params, lambda: self.provider.make_request(method, params))
+
+
+def _evm_address(address: TAddress) -> str:
+    # ABI encoded TRON addresses are the 20 bytes after the 0x41 prefix
+    return '0x' + keys.to_hex_address(address)[2:]
+
+
+class TronMulticall(Multicall):
+    """
+    Multicall3 deployed on a TRON network, chunks are run by triggerconstantcontract on the latest block.
+    Addresses in the calls are in the 0x form of _evm_address
+    """
+
+    def __init__(self, client: Tron, address: str, **kwargs):
+        super().__init__(client, address, **{'gas_limit': MULTICALL_ENERGY_LIMIT, **kwargs})
+        self.evm_address = _evm_address(address)
+
+    def _call(self, chunk: List[Call], block_identifier) -> bytes:
+        response = self._client.trigger_constant_contract(self.address, self.address, AGGREGATE3_SIGNATURE,
+                                                          encode_aggregate3(chunk)[4:].hex())
+        return bytes.fromhex(response['constant_result'][0])
+
+
+def _varint_size(value: int) -> int:
+    size = 1
+    while value >= 0x80:
+        value >>= 7
+        size += 1
+    return size
+
+
+def _bytes_field_size(number: int, length: int) -> int:
+    return _varint_size(number << 3) + _varint_size(length) + length
+
+
+def _varint_field_size(number: int, value: int) -> int:
+    return _varint_size(number << 3) + _varint_size(value)
+
+
+def trigger_transaction_size(data_size: int, fee_limit: int = TRC20_FEE_LIMIT, call_value: int = 0,
+                             signatures: int = 1) -> int:
+    """
+    Bandwidth of a signed TriggerSmartContract transaction, the protobuf size computed from the call shape
+    without building or signing it. Equal to trontxsize.get_tx_size of the built transaction
+    :param data_size: bytes of the call data, selector and encoded arguments
+    """
+    now = int(time.time() * 1000)
+    call = (2 * _bytes_field_size(1, ADDRESS_SIZE)  # owner_address, contract_address
+            + (_varint_field_size(3, call_value) if call_value else 0) + _bytes_field_size(4, data_size))
+    parameter = _bytes_field_size(1, len(TRIGGER_SMART_CONTRACT_URL)) + _bytes_field_size(2, call)
+    contract = _varint_field_size(1, TRIGGER_SMART_CONTRACT) + _bytes_field_size(2, parameter)
+    raw = (_bytes_field_size(1, 2) + _bytes_field_size(4, 8)  # ref_block_bytes, ref_block_hash
+           + _varint_field_size(8, now + TRANSACTION_EXPIRATION) + _bytes_field_size(11, contract)
+           + _varint_field_size(14, now) + _varint_field_size(18, fee_limit))
+    return _bytes_field_size(1, raw) + signatures * _bytes_field_size(2, SIGNATURE_SIZE) + MAX_RESULT_SIZE_IN_TX
+
+
+class ChainParameters:
+    """
+    getchainparameters of a TRON network, read at most once per ttl
+    """
+
+    def __init__(self, ttl: float = CHAIN_PARAMETERS_TTL):
+        self.ttl = ttl
+        self._values: Dict[str, int] = {}
+        self._fetched_at = None
+        self._lock = threading.Lock()
+
+    def expired(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at >= self.ttl
+
+    def update(self, parameters: List[dict]):
+        # Parameters with the value 0 come without one
+        self._values = {parameter['key']: parameter.get('value', 0) for parameter in parameters}
+        self._fetched_at = time.monotonic()
+
+    def refresh(self, fetch: Callable[[], List[dict]]) -> 'ChainParameters':
+        with self._lock:
+            if self.expired():
+                self.update(fetch())
+        return self
+
+    def get(self, key: str, default: int = None) -> Optional[int]:
+        return self._values.get(key, default)
+
+    @property
+    def energy_price(self) -> int:
+        return self.get('getEnergyFee', TRC20_ENERGY_UNIT_PRICE)
+
+    @property
+    def bandwidth_price(self) -> int:
+        return self.get('getTransactionFee', TRX_BANDWIDTH_UNIT_PRICE)
+
+
+_chain_parameters: Dict[Hashable, ChainParameters] = {}
+_chain_parameters_lock = threading.Lock()
+
+
+def get_chain_parameters(chain: Hashable) -> ChainParameters:
+    """
+    Process wide chain parameters of a network, shared by all adapters of that network
+    """
+    with _chain_parameters_lock:
+        parameters = _chain_parameters.get(chain)
+        if parameters is None:
+            parameters = _chain_parameters[chain] = ChainParameters()
+        return parameters
+
+
+def _head_block(provider: HTTPProvider) -> int:
+    return provider.make_request('wallet/getnowblock')['block_header']['raw_data']['number']
 
 
 class TronAdapter(AdapterBase):
     _decimals = 6
 
-    def __init__(self, endpoint_uri, chain_id, decimals=None, provider_options: dict = None):
-        if isinstance(endpoint_uri, list):
-            endpoint_uri = endpoint_uri[0]
-        self._client = Tron(HTTPProvider(endpoint_uri, **provider_options))
+    def __init__(self, endpoint_uri, chain_id, decimals=None, provider_options: dict = None,
+                 pool_options: dict = None, account_cache_options: dict = None, block_time: float = None,
+                 confirmation_options: dict = None, cache_options: dict = None, network_name: str = None,
+                 cassette_options: dict = None, multicall: str = None, multicall_options: dict = None):
+        """
+        :param pool_options: options of the EndpointPool of several URIs, e.g. hedge. The background health check
+            is opt-in, set health_check_interval in seconds to run it
+        :param multicall: address of a Multicall3 contract, get_balances packs its reads into it.
+            Without one every balance is a request
+        """
+        if is_pooled(endpoint_uri, pool_options):
+            provider = PooledTronProvider(endpoint_uris(endpoint_uri), pool_options, provider_options, network_name)
+            self._pool = provider.pool
+        else:
+            provider = MeteredTronProvider(endpoint_uris(endpoint_uri)[0], network_name, **(provider_options or {}))
+            self._pool = None
+        self._chain = chain_id or provider.endpoint_uri
+        self._cassette = chain_cassette(network_name or self._chain, cassette_options)
+        if self._cassette is not None:
+            provider = CassetteTronProvider(provider, self._cassette)
+        self._cache = chain_cache(self._chain, TronCachePolicy(functools.partial(_head_block, provider)),
+                                  cache_options)
+        if self._cache is not None:
+            provider = CachedTronProvider(provider, self._cache)
+        self._client = Tron(provider)
+        self._multicall = TronMulticall(self._client, multicall, **(multicall_options or {})) if multicall else None
+        self._chain_parameters = get_chain_parameters(self._chain)
+        self._accounts = AccountCache(**(account_cache_options or {}))
+        self._block_time = block_time or BLOCK_TIME
+        self._confirmation_options = confirmation_options or {}
 
         # self._chain_id = chain_id
         # self._decimals = decimals or 18
 
-    def create_account(self, text: Union[str, bytes]) -> TAddress:
+    def _get_contract(self, contract_address: str, abi: list) -> registry.ContractEntry:
+        return registry.get_contract(
+            self._chain, self._client, contract_address, abi,
+            lambda: TronContract(contract_address, abi=abi, client=self._client),
+            lambda contract, name: contract.functions[name])
+
+    def _parse_account(self, text: Union[str, bytes]) -> TAddress:
         if isinstance(text, str):
             text = text.strip()
         return self._client.to_hex_address(text)
 
+    @staticmethod
+    def generate_account() -> CompactAccount:
+        return account_from_key(PrivateKey.random().to_bytes())
+
+    @staticmethod
+    def generate_accounts(n: int, **kwargs) -> Optional[List[CompactAccount]]:
+        return keygen.generate_accounts(account_from_key, n, **kwargs)
+
+    @staticmethod
+    def derive_accounts(seed: bytes, start: int, count: int, path_template: str = None,
+                        **kwargs) -> List[CompactAccount]:
+        return hd.derive_accounts(seed, hd.SECP256K1, path_template or DERIVATION_PATH, start, count, account_from_key,
+                                  **kwargs)
+
     def get_balance(self, address: TAddress, token: Token = None) -> int:
         if not token:
             try:
@@ -45,43 +336,145 @@ class TronAdapter(AdapterBase):
             except tronpy.exceptions.AddressNotFound:
                 raise AddressNotFound
             return account['balance'] / 10 ** self._decimals
-        contract = TronContract(token.address, abi=token.get_abi(), client=self._client)
-        return contract.functions.balanceOf(address) / 10 ** token.decimals
+        return self._balance_of(address, token.address) / 10 ** token.decimals
+
+    def _balance_of(self, address: TAddress, token_address: str) -> int:
+        # balanceOf has a fixed signature, no ABI or contract object is needed
+        parameter = _evm_address(address)[2:].rjust(64, '0')
+        response = self._client.trigger_constant_contract(address, token_address, 'balanceOf(address)', parameter)
+        result = response.get('constant_result') or ['']
+        if not result[0]:
+            # An address without code answers with an empty result
+            raise ContractNotFound(f'balanceOf of {token_address} returned no data, is it a TRC-20 contract?')
+        return int(result[0], 16)
+
+    def _native_balance(self, address: TAddress) -> int:
+        try:
+            return self._client.get_account(address).get('balance', 0)
+        except tronpy.exceptions.AddressNotFound:
+            return 0
+
+    def _cell(self, cell: Tuple[TAddress, Optional[Token]]) -> Tuple[Optional[int], Optional[str]]:
+        address, token = cell
+        try:
+            return self._native_balance(address) if token is None else self._balance_of(address, token.address), None
+        except Exception as e:
+            return None, f'{e.__class__.__name__}: {e}'
+
+    def _balance_calls(self, addresses: List[TAddress], tokens: List[Token]) -> List[Call]:
+        token_addresses = [None if token is None else _evm_address(token.address) for token in tokens]
+        calls = []
+        for address in addresses:
+            owner = _evm_address(address)
+            for token_address in token_addresses:
+                if token_address is None:
+                    calls.append(eth_balance_call(self._multicall.evm_address, owner))
+                else:
+                    calls.append(balance_of_call(token_address, owner))
+        return calls
+
+    def _balance_values(self, accounts: List[TAddress], tokens: List[Token], cells: list,
+                        executor: Executor) -> List[Tuple[Optional[int], Optional[str]]]:
+        if self._multicall is not None:
+            results = self._multicall.aggregate(self._balance_calls(accounts, tokens), executor=executor)
+            return [(decode_uint(result) if result else None, error or 'invalid return data')
+                    for result, error in results]
+        return list(executor.map(self._cell, cells))
+
+    def get_balances(self, accounts: List[TAddress], tokens: List[Token] = None, workers: int = None,
+                     executor: Executor = None) -> BalanceTable:
+        """
+        Native (token None) and TRC-20 balances of all accounts. With a multicall contract the reads are packed
+        into aggregate3 calls, otherwise every cell is a request, workers of them at a time.
+        Accounts that are not activated have a balance of 0
+        :param workers: concurrent requests, default is BALANCE_WORKERS
+        :param executor: sends the requests instead of a pool of workers, callers running several get_balances
+            at once share one to bound the requests of all of them
+        :return: table with a row per account and a column per token in input order
+        """
+        tokens = list(tokens or [None])
+        accounts = list(accounts)
+        cells = [(account, token) for account in accounts for token in tokens]
+        if executor is None:
+            with ThreadPoolExecutor(max(1, min(workers or BALANCE_WORKERS, len(cells)))) as executor:
+                values = self._balance_values(accounts, tokens, cells, executor)
+        else:
+            values = self._balance_values(accounts, tokens, cells, executor)
+        balances = []
+        errors = {}
+        columns = len(tokens)
+        for i in range(len(accounts)):
+            row = []
+            for j, token in enumerate(tokens):
+                value, error = values[i * columns + j]
+                if value is None:
+                    errors[(i, j)] = error
+                    row.append(None)
+                else:
+                    row.append(Decimal(value).scaleb(-(token.decimals if token else self._decimals)))
+            balances.append(row)
+        return BalanceTable(addresses=accounts, tokens=tokens, balances=balances, errors=errors)
 
     def get_energy(self, address: TAddress) -> int:
         account = self._client.get_account_resource(address)
         return account.get('EnergyLimit', 0)
 
-    def estimate(self, contract: Contract, method: str, amount: int,
-                 owner_address: TAddress, address_recipient: TAddress) -> dict:
-        contract_tron = TronContract(contract.address, abi=contract.get_abi())
-        parameter = contract_tron.functions[method]._prepare_parameter(address_recipient, amount)
+    def chain_parameters(self) -> ChainParameters:
+        """
+        Energy and bandwidth prices of the network, cached for CHAIN_PARAMETERS_TTL
+        """
+        return self._chain_parameters.refresh(self._client.get_chain_parameters)
+
+    def _account_resource(self, address: TAddress) -> dict:
+        try:
+            return self._client.get_account_resource(address)
+        except tronpy.exceptions.AddressNotFound:
+            return {}
+
+    def _energy_required(self, contract_address: str, function_signature: str, owner_address: TAddress,
+                         parameter: str) -> int:
         try:
             energy_data = self._client.trigger_constant_contract(self._client.to_hex_address(owner_address),
-                                                              contract.address,
-                                                              contract_tron.functions[method].function_signature,
-                                                              parameter)
-            energy_required = energy_data['energy_used']
+                                                              contract_address, function_signature, parameter)
+            return energy_data['energy_used']
         except tronpy.exceptions.TvmError as e:
-            if e.args[0] == 'REVERT opcode executed':
-                # Looks like address_recipient has no TRX
-                energy_required = 31895
-            else:
-                raise e
-        try:
-            account_info = self._client.get_account_resource(owner_address)
-        except tronpy.exceptions.AddressNotFound:
-            account_info = {}
+            return self._reverted_energy(e)
 
+    def estimate(self, contract: CompactContract, method: str, amount: int,
+                 owner_address: TAddress, address_recipient: TAddress) -> dict:
+        return self.estimate_many(contract, method, [(address_recipient, amount)], owner_address)[0]
+
+    def estimate_many(self, contract: CompactContract, method: str, payments: List[Tuple[TAddress, int]],
+                      owner_address: TAddress, workers: int = None) -> List[dict]:
+        """
+        Estimates of many (recipient, amount) calls from one sender. The resources of the sender are read once
+        and every estimate is made against them, as if its transaction were the only one
+        :param workers: concurrent energy simulations, default is ESTIMATE_WORKERS
+        :return: estimates in input order
+        """
+        function = self._get_contract(contract.address, contract.get_abi()).function(method)
+        parameters = [function._prepare_parameter(recipient, amount) for recipient, amount in payments]
+        simulate = functools.partial(self._energy_required, contract.address, function.function_signature,
+                                     owner_address)
+        prices = self.chain_parameters()
+        account_info = self._account_resource(owner_address)
+        if len(parameters) > 1:
+            with ThreadPoolExecutor(min(workers or ESTIMATE_WORKERS, len(parameters))) as executor:
+                energies = list(executor.map(simulate, parameters))
+        else:
+            energies = [simulate(parameter) for parameter in parameters]
+        return [self._estimate_result(energy_required, account_info, trigger_transaction_size(4 + len(parameter) // 2),
+                                      prices)
+                for energy_required, parameter in zip(energies, parameters)]
+
+    def _estimate_result(self, energy_required: int, account_info: dict, bandwidth_required: int,
+                         prices: ChainParameters) -> dict:
         energy_limit = account_info.get('EnergyLimit', 0)
         energy_used = account_info.get('EnergyUsed', 0)
 
-        energy_fee = self.get_energy_fee(energy_required, energy_limit, energy_used)
-
-        tx = self.build_tx(PrivateKey.random(), address_recipient, amount)
+        energy_fee = self.get_energy_fee(energy_required, energy_limit, energy_used, prices.energy_price)
 
-        bandwidth_required = self.get_bandwidth_required(tx)
-        bandwidth_fee = self.get_bandwidth_fee(tx, account_info, bandwidth_required)
+        bandwidth_fee = self.get_bandwidth_fee(account_info, bandwidth_required, prices.bandwidth_price)
 
         return {
             'energy_required': energy_required,
@@ -96,15 +489,24 @@ class TronAdapter(AdapterBase):
             'total_fee': math.ceil((bandwidth_fee + energy_fee) * TRC20_FEE_LIMIT_FACTOR)
         }
 
-    def get_energy_fee(self, energy_needed: float, energy_limit: float, energy_used: float) -> int:
+    @staticmethod
+    def _reverted_energy(e: tronpy.exceptions.TvmError) -> int:
+        if e.args[0] == 'REVERT opcode executed':
+            # Looks like address_recipient has no TRX
+            return 31895
+        raise e
+
+    def get_energy_fee(self, energy_needed: float, energy_limit: float, energy_used: float,
+                       energy_price: int = TRC20_ENERGY_UNIT_PRICE) -> int:
         current_account_energy = energy_limit - energy_used
-        energy_fee = max(energy_needed - current_account_energy, 0) * TRC20_ENERGY_UNIT_PRICE
+        energy_fee = max(energy_needed - current_account_energy, 0) * energy_price
         return math.ceil(energy_fee)
 
     def get_bandwidth_required(self, tx: Transaction) -> int:
         return trontxsize.get_tx_size({'signature': tx._signature, 'raw_data': tx._raw_data})
 
-    def get_bandwidth_fee(self, tx: Transaction, account_info: dict, bandwidth_required) -> int:
+    def get_bandwidth_fee(self, account_info: dict, bandwidth_required: int,
+                          bandwidth_price: int = TRX_BANDWIDTH_UNIT_PRICE) -> int:
         try:
             # account_info = self._client.get_account_resource(address)
             free_net_limit = account_info.get('freeNetLimit', 0)
@@ -117,7 +519,7 @@ class TronAdapter(AdapterBase):
 
             # how_many_bandwidth_need = trontxsize.get_tx_size({'signature': tx._signature, 'raw_data': tx._raw_data})
             if current_account_bandwidth < bandwidth_required:
-                bandwidth_fee = (bandwidth_required + 3) * 1000
+                bandwidth_fee = (bandwidth_required + 3) * bandwidth_price
             else:
                 bandwidth_fee = 0
             # bandwidth_fee = max((how_many_bandwidth_need - current_account_bandwidth) * 1000, 0)
@@ -147,26 +549,175 @@ class TronAdapter(AdapterBase):
             energy_limit = account_info.get('EnergyLimit', 0)
             energy_used = account_info.get('EnergyUsed', 0)
 
-            energy_fee = self.get_energy_fee(required_energy, energy_limit, energy_used)
-            bandwidth_fee = self.get_bandwidth_fee(tx, owner_address)
+            prices = self.chain_parameters()
+            energy_fee = self.get_energy_fee(required_energy, energy_limit, energy_used, prices.energy_price)
+            bandwidth_fee = self.get_bandwidth_fee(account_info, trigger_transaction_size(4 + len(parameter) // 2),
+                                                   prices.bandwidth_price)
 
             return math.ceil((bandwidth_fee + energy_fee) * TRC20_FEE_LIMIT_FACTOR)
         except Exception:
             return TRC20_FEE_LIMIT
 
     def build_tx(self, sender_key: Union[bytes, PrivateKey, str], address_recipient, amount, **kwargs) -> Transaction:
-        if isinstance(sender_key, bytes):
-            sender_key = PrivateKey(sender_key)
-        elif isinstance(sender_key, str):
-            sender_key = PrivateKey(bytes.fromhex(sender_key))
+        sender_key = self._private_key(sender_key)
         from_address = sender_key.public_key.to_base58check_address()
         return self._client.trx.transfer(from_address, address_recipient, amount).memo("").build().sign(sender_key)
 
+    def sign_many(self, sender_keys: List[Union[bytes, PrivateKey, str]], transactions: List[Transaction],
+                  workers: int = None, chunk_size: int = None, executor=None) -> List[bytes]:
+        """
+        Sign many built transactions across a process pool. Signatures are appended to the transactions,
+        which can be broadcast afterwards
+        :return: signatures in input order
+        """
+        items = [(self._private_key(sender_key).to_bytes(), tx.txid) for sender_key, tx in zip(sender_keys, transactions)]
+        signatures = signing.sign_many(sign_transaction_ids, items, workers, chunk_size, executor)
+        for tx, signature in zip(transactions, signatures):
+            tx.set_signature(tx._signature + [signature.hex()])
+        return signatures
+
+    @staticmethod
+    def _private_key(sender_key: Union[bytes, PrivateKey, str]) -> PrivateKey:
+        if isinstance(sender_key, bytes):
+            return PrivateKey(sender_key)
+        elif isinstance(sender_key, str):
+            return PrivateKey(bytes.fromhex(sender_key))
+        return sender_key
+
+    def _transaction_info(self, txid: str) -> Optional[dict]:
+        try:
+            info = self._client.get_transaction_info(txid)
+        except tronpy.exceptions.TransactionNotFound:
+            return None
+        return info or None
+
+    def _fetch_statuses(self, txids: List[str]) -> List[Optional[dict]]:
+        with ThreadPoolExecutor(min(STATUS_WORKERS, len(txids))) as executor:
+            return list(executor.map(self._transaction_info, txids))
+
     def get_transactions(self, address, address_to):
         address_to = self._client.to_hex_address(address_to)
         info = self._client.provider.make_request(f"v1/accounts/{address}/transactions")
         print(info)
 
 
+class AsyncTronAdapter(AsyncAdapterBase, TronAdapter):
+    """
+    TronAdapter on AsyncTron. Methods that make requests are coroutines, the rest are shared with TronAdapter
+    """
+
+    def __init__(self, endpoint_uri, chain_id, decimals=None, provider_options: dict = None,
+                 max_concurrency: int = None, account_cache_options: dict = None, block_time: float = None,
+                 confirmation_options: dict = None, network_name: str = None):
+        """
+        :param network_name: label of the requests reported to the metrics hooks
+        """
+        AsyncAdapterBase.__init__(self, max_concurrency, block_time or BLOCK_TIME, confirmation_options)
+        if isinstance(endpoint_uri, list):
+            endpoint_uri = endpoint_uri[0]
+        provider_options = dict(provider_options or {})
+        timeout = provider_options.pop('timeout', ASYNC_TIMEOUT)
+        client = httpx.AsyncClient(timeout=httpx.Timeout(timeout),
+                                   limits=httpx.Limits(max_connections=self._max_concurrency,
+                                                       max_keepalive_connections=self._max_concurrency))
+        self._client = AsyncTron(MeteredAsyncTronProvider(endpoint_uri, network_name, timeout=timeout, client=client,
+                                                          **provider_options))
+        self._accounts = AccountCache(**(account_cache_options or {}))
+        self._chain = ('async', chain_id or endpoint_uri)
+        self._chain_parameters = get_chain_parameters(chain_id or endpoint_uri)
+
+    def _get_contract(self, contract_address: str, abi: list) -> registry.ContractEntry:
+        return registry.get_contract(
+            self._chain, self._client, contract_address, abi,
+            lambda: AsyncContract(contract_address, abi=abi, client=self._client),
+            lambda contract, name: contract.functions[name])
+
+    async def get_balance(self, address: TAddress, token: Token = None) -> int:
+        if not token:
+            try:
+                account = await self._limit(self._client.get_account(address))
+            except tronpy.exceptions.AddressNotFound:
+                raise AddressNotFound
+            return account['balance'] / 10 ** self._decimals
+        balance_of = self._get_contract(token.address, token.get_abi()).function('balanceOf')
+        return await self._limit(balance_of(address)) / 10 ** token.decimals
+
+    async def get_energy(self, address: TAddress) -> int:
+        account = await self._limit(self._client.get_account_resource(address))
+        return account.get('EnergyLimit', 0)
+
+    async def _get_account_resource(self, address: TAddress) -> dict:
+        try:
+            return await self._limit(self._client.get_account_resource(address))
+        except tronpy.exceptions.AddressNotFound:
+            return {}
+
+    async def chain_parameters(self) -> ChainParameters:
+        if self._chain_parameters.expired():
+            self._chain_parameters.update(await self._limit(self._client.get_chain_parameters()))
+        return self._chain_parameters
+
+    async def _get_energy_required(self, contract_address: str, function_signature: str, owner_address: TAddress,
+                                   parameter: str) -> int:
+        try:
+            energy_data = await self._limit(self._client.trigger_constant_contract(
+                self._client.to_hex_address(owner_address),
+                contract_address,
+                function_signature,
+                parameter))
+            return energy_data['energy_used']
+        except tronpy.exceptions.TvmError as e:
+            return self._reverted_energy(e)
+
+    async def estimate(self, contract: CompactContract, method: str, amount: int,
+                       owner_address: TAddress, address_recipient: TAddress) -> dict:
+        return (await self.estimate_many(contract, method, [(address_recipient, amount)], owner_address))[0]
+
+    async def estimate_many(self, contract: CompactContract, method: str, payments: List[Tuple[TAddress, int]],
+                            owner_address: TAddress) -> List[dict]:
+        function = self._get_contract(contract.address, contract.get_abi()).function(method)
+        parameters = [function._prepare_parameter(recipient, amount) for recipient, amount in payments]
+        prices, account_info, *energies = await asyncio.gather(
+            self.chain_parameters(),
+            self._get_account_resource(owner_address),
+            *(self._get_energy_required(contract.address, function.function_signature, owner_address, parameter)
+              for parameter in parameters))
+        return [self._estimate_result(energy_required, account_info, trigger_transaction_size(4 + len(parameter) // 2),
+                                      prices)
+                for energy_required, parameter in zip(energies, parameters)]
+
+    async def build_tx(self, sender_key: Union[bytes, PrivateKey, str], address_recipient, amount,
+                       **kwargs) -> AsyncTransaction:
+        sender_key = self._private_key(sender_key)
+        from_address = sender_key.public_key.to_base58check_address()
+        builder = self._client.trx.transfer(from_address, address_recipient, amount).memo("")
+        return (await self._limit(builder.build())).sign(sender_key)
+
+    async def _transaction_info(self, txid: str) -> Optional[dict]:
+        try:
+            info = await self._limit(self._client.get_transaction_info(txid))
+        except tronpy.exceptions.TransactionNotFound:
+            return None
+        return info or None
+
+    async def _fetch_statuses(self, txids: List[str]) -> List[Optional[dict]]:
+        return list(await asyncio.gather(*(self._transaction_info(txid) for txid in txids)))
+
+    async def get_transactions(self, address, address_to):
+        return await self._limit(self._client.provider.make_request(f"v1/accounts/{address}/transactions"))
+
+    async def close(self):
+        await self._client.close()
+
+
 def create_adapter(network, rpc: str = None, chain_id: int = None, **kwargs):
+    kwargs.setdefault('multicall', network.multicall)
+    kwargs.setdefault('block_time', network.block_time)
+    kwargs.setdefault('network_name', network.name)
     return TronAdapter(rpc or network.rpc, chain_id=chain_id or network.chain_id, **kwargs)
+
+
+def create_async_adapter(network, rpc: str = None, chain_id: int = None, **kwargs):
+    kwargs.setdefault('block_time', network.block_time)
+    kwargs.setdefault('network_name', network.name)
+    return AsyncTronAdapter(rpc or network.rpc, chain_id=chain_id or network.chain_id, **kwargs)
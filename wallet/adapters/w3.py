@@ -1,53 +1,281 @@
+import asyncio
 import decimal
-import itertools
-import json
+import functools
 from decimal import Decimal
-from functools import partial
-from typing import Union, Dict
+from typing import Union, List, Tuple, Iterable, Iterator, Optional, AsyncIterator, Any, Callable
 
 import requests
 import web3
 from eth_abi.exceptions import DecodingError
 from eth_account.messages import defunct_hash_message
-from eth_typing import Decodable, HexStr, ABIFunction
-from eth_utils import get_abi_output_types
+from eth_typing import Decodable, HexStr
 from hexbytes import HexBytes
-from web3 import Web3
+from web3 import Web3, AsyncWeb3, AsyncHTTPProvider, HTTPProvider
+from web3.providers import JSONBaseProvider
 from eth_account import Account as EthAccount
-from web3._utils.normalizers import (
-    BASE_RETURN_NORMALIZERS,
-    normalize_abi,
-    normalize_address,
-    normalize_bytecode,
-)
-from web3._utils.abi import map_abi_data
+from web3.contract.contract import ContractFunction
 from web3.contract.utils import ACCEPTABLE_EMPTY_STRINGS
-# from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
-# from web3._utils import normalizers
-# from web3._utils.abi import get_abi_output_types, map_abi_data
-# from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
-# from web3.contract import ACCEPTABLE_EMPTY_STRINGS
-from web3.exceptions import BadFunctionCallOutput
-
-from wallet.adapters.base import AdapterBase
-from wallet.adapters.exceptions import AlreadyKnownTransaction
-from wallet.models import Contract, Transaction
-from wallet.models.account import Account
-from wallet.types import Token
+from web3._utils.method_formatters import PYTHONIC_RESULT_FORMATTERS
+from web3._utils.rpc_abi import RPC
+from web3.datastructures import AttributeDict
+from web3.exceptions import BadFunctionCallOutput, TransactionNotFound, Web3RPCError
+from web3.types import RPCEndpoint, RPCResponse
+
+from wallet import hd, keygen, metrics, registry, signing
+from wallet.adapters.base import AccountCache, AdapterBase, AsyncAdapterBase
+from wallet.adapters.batch import BatchTransport
+from wallet.adapters.cache import MISS, ChainCache, EvmCachePolicy, chain_cache
+from wallet.adapters.cassette import REPLAY, ChainCassette, chain_cassette
+from wallet.adapters.decoder import FunctionPlan, get_decoder
+from wallet.adapters.exceptions import AlreadyKnownTransaction, NoEndpointAvailable, RetryableRPCError, RPCError
+from wallet.adapters.fees import AsyncFeeOracle, FeeOracle, get_fee_oracle
+from wallet.adapters.nonce import AsyncNonceManager, NonceStatus, get_nonce_manager
+from wallet.adapters.pool import EndpointPool, endpoint_uris, is_pooled, is_retryable
+from wallet.adapters.multicall import Multicall, balance_of_call, eth_balance_call, decode_uint
+from wallet.models import CompactAccount, CompactContract
+from wallet.types import Token, BalanceTable
 
 EthAccount.enable_unaudited_hdwallet_features()
 
+DERIVATION_PATH = "m/44'/60'/0'/0/{index}"
+BLOCK_TIME = 12  # seconds, paces confirmation polling when the network does not set it
+
+ERC20_ABI = [
+    {"constant": True, "inputs": [{"name": "_owner", "type": "address"}], "name": "balanceOf",
+     "outputs": [{"name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"},
+    {"constant": False, "inputs": [{"name": "_to", "type": "address"}, {"name": "_value", "type": "uint256"}],
+     "name": "transfer", "outputs": [{"name": "", "type": "bool"}], "stateMutability": "nonpayable",
+     "type": "function"},
+    {"constant": False, "inputs": [{"name": "_spender", "type": "address"}, {"name": "_value", "type": "uint256"}],
+     "name": "approve", "outputs": [{"name": "", "type": "bool"}], "stateMutability": "nonpayable",
+     "type": "function"},
+]
+
+# The chain id never changes, web3 validates it before every eth_call and eth_estimateGas
+PROVIDER_CACHE_OPTIONS = {'cache_allowed_requests': True, 'cacheable_requests': {RPC.eth_chainId}}
+
+
+@functools.lru_cache(maxsize=signing.KEY_CACHE_SIZE)
+def _eth_key(private_key: bytes) -> EthAccount:
+    return EthAccount.from_key(private_key)
+
+
+def sign_transactions(items: List[Tuple[bytes, dict]]) -> List[HexBytes]:
+    """
+    Sign (private key, transaction) pairs, runs in signing worker processes
+    """
+    return [_eth_key(private_key).sign_transaction(transaction).raw_transaction for private_key, transaction in items]
+
+
+def _function_by_selector(contract, selector: bytes) -> ContractFunction:
+    return contract.get_function_by_selector(selector)
+
+
+def account_from_key(private_key: bytes) -> CompactAccount:
+    return CompactAccount.create(address=EthAccount.from_key(private_key).address, private_key=private_key)
+
+
+class MeteredHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider reporting every HTTP request to the metrics hooks
+    """
+
+    def __init__(self, endpoint_uri: str, network: str = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.network = network
+
+    def _make_request(self, method: RPCEndpoint, request_data: bytes) -> bytes:
+        return metrics.measure(self.network, 'rpc', method,
+                               functools.partial(super()._make_request, method, request_data),
+                               lambda: len(request_data), len)
+
+    def make_batch_request(self, batch_requests: List[Tuple[RPCEndpoint, Any]]):
+        return metrics.measure(self.network, 'rpc', 'batch',
+                               functools.partial(super().make_batch_request, batch_requests))
+
+
+class MeteredAsyncHTTPProvider(AsyncHTTPProvider):
+    """
+    AsyncHTTPProvider reporting every HTTP request to the metrics hooks
+    """
+
+    def __init__(self, endpoint_uri: str, network: str = None, **kwargs):
+        super().__init__(endpoint_uri, **kwargs)
+        self.network = network
+
+    async def _make_request(self, method: RPCEndpoint, request_data: bytes) -> bytes:
+        return await metrics.measure_async(self.network, 'rpc', method,
+                                           functools.partial(super()._make_request, method, request_data),
+                                           lambda: len(request_data), len)
+
+    async def make_batch_request(self, batch_requests: List[Tuple[RPCEndpoint, Any]]):
+        return await metrics.measure_async(self.network, 'rpc', 'batch',
+                                           functools.partial(super().make_batch_request, batch_requests))
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider over several URIs routed by an EndpointPool. Reads may be hedged, writes are never duplicated
+    """
+    WRITE_METHODS = {'eth_sendRawTransaction', 'eth_sendTransaction'}
+
+    def __init__(self, endpoint_uris: List[str], pool_options: dict = None, request_kwargs: dict = None,
+                 network: str = None):
+        super().__init__(endpoint_uris[0], request_kwargs=request_kwargs)
+        # Retries of a single URI would delay the failover to the next one
+        self._providers = {uri: MeteredHTTPProvider(uri, network, request_kwargs=request_kwargs,
+                                                    exception_retry_configuration=None, **PROVIDER_CACHE_OPTIONS)
+                           for uri in endpoint_uris}
+        self.pool = EndpointPool(endpoint_uris, health_check=self._health_check,
+                                 **{'network': network, **(pool_options or {})})
+
+    def _health_check(self, uri: str):
+        response = self._providers[uri].make_request(RPC.eth_blockNumber, [])
+        if 'error' in response:
+            raise RPCError(response['error'])
+
+    @staticmethod
+    def _checked(response):
+        # Rate limits and overloaded nodes answer with an error object, fail over on them like on transport errors
+        if isinstance(response, dict) and is_retryable(response.get('error')):
+            raise RetryableRPCError(response)
+        return response
+
+    def _call(self, request: Callable[[str], Any], hedge: bool = False, method: str = None):
+        try:
+            return self.pool.call(lambda uri: self._checked(request(uri)), hedge=hedge, method=method)
+        except NoEndpointAvailable as e:
+            # Every endpoint answered with an error, web3 raises it as usual
+            if isinstance(e.__cause__, RetryableRPCError):
+                return e.__cause__.response
+            raise
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self._call(lambda uri: self._providers[uri].make_request(method, params),
+                          hedge=method not in self.WRITE_METHODS, method=method)
+
+    def make_batch_request(self, batch_requests: List[Tuple[RPCEndpoint, Any]]):
+        return self._call(lambda uri: self._providers[uri].make_batch_request(batch_requests), method='batch')
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return any(provider.is_connected(show_traceback) for provider in self._providers.values())
+
+
+class CachedHTTPProvider(JSONBaseProvider):
+    """
+    Answers final requests from a response cache and passes everything else to the wrapped provider
+    """
+
+    def __init__(self, provider: HTTPProvider, cache: ChainCache):
+        super().__init__(**PROVIDER_CACHE_OPTIONS)
+        self.provider = provider
+        self.cache = cache
+
+    @property
+    def endpoint_uri(self):
+        return self.provider.endpoint_uri
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        result = self.cache.get(method, params)
+        if result is not MISS:
+            return {'jsonrpc': '2.0', 'id': 0, 'result': result}
+        response = self.provider.make_request(method, params)
+        if 'result' in response:
+            self.cache.put(method, params, response['result'])
+        return response
+
+    def make_batch_request(self, batch_requests: List[Tuple[RPCEndpoint, Any]]):
+        responses = self.provider.make_batch_request(batch_requests)
+        if isinstance(responses, list):
+            for (method, params), response in zip(batch_requests, responses):
+                if 'result' in response:
+                    self.cache.put(method, params, response['result'])
+        return responses
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return self.provider.is_connected(show_traceback)
+
+
+class CassetteHTTPProvider(JSONBaseProvider):
+    """
+    Records the requests of the wrapped provider to a cassette or replays them from it
+    """
+
+    def __init__(self, provider: HTTPProvider, cassette: ChainCassette):
+        super().__init__(**PROVIDER_CACHE_OPTIONS)
+        self.provider = provider
+        self.cassette = cassette
+
+    @property
+    def endpoint_uri(self):
+        return self.provider.endpoint_uri
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self.cassette.call(method, params, lambda: self.provider.make_request(method, params))
+
+    def make_batch_request(self, batch_requests: List[Tuple[RPCEndpoint, Any]]):
+        # web3 matches batch responses to requests by position
+        return self.cassette.call('batch', batch_requests, lambda: self.provider.make_batch_request(batch_requests))
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return self.cassette.cassette.mode == REPLAY or self.provider.is_connected(show_traceback)
+
+
+def _head_block(provider: HTTPProvider) -> int:
+    response = provider.make_request(RPC.eth_blockNumber, [])
+    if 'error' in response:
+        raise RPCError(response['error'])
+    return int(response['result'], 16)
+
 
 class W3Adapter(AdapterBase):
-    def __init__(self, endpoint_uri, chain_id, decimals=None, **kwargs):
-        if isinstance(endpoint_uri, list):
-            endpoint_uri = endpoint_uri[0]
-        self._client = Web3(Web3.HTTPProvider(endpoint_uri))
+    def __init__(self, endpoint_uri, chain_id, decimals=None, multicall: str = None,
+                 multicall_options: dict = None, batch_options: dict = None, pool_options: dict = None,
+                 nonce_options: dict = None, fee_options: dict = None, account_cache_options: dict = None,
+                 block_time: float = None, confirmation_options: dict = None, cache_options: dict = None,
+                 network_name: str = None, cassette_options: dict = None, **kwargs):
+        """
+        :param pool_options: options of the EndpointPool of several URIs, e.g. hedge. The background health check
+            is opt-in, set health_check_interval in seconds to run it
+        :param cache_options: path and maxsize of a response cache for final data, see cache.get_response_cache
+        :param network_name: label of the requests reported to the metrics hooks
+        :param cassette_options: path, mode and speed of a cassette recording or replaying every request,
+            see cassette.get_cassette
+        """
+        network_name = network_name or (str(chain_id) if chain_id else None)
+        if is_pooled(endpoint_uri, pool_options):
+            provider = PooledHTTPProvider(endpoint_uris(endpoint_uri), pool_options, network=network_name)
+            self._pool = provider.pool
+        else:
+            provider = MeteredHTTPProvider(endpoint_uris(endpoint_uri)[0], network_name, **PROVIDER_CACHE_OPTIONS)
+            self._pool = None
+        self._cassette = chain_cassette(network_name or provider.endpoint_uri, cassette_options)
+        if self._cassette is not None:
+            provider = CassetteHTTPProvider(provider, self._cassette)
+        self._cache = chain_cache(chain_id or provider.endpoint_uri,
+                                  EvmCachePolicy(functools.partial(_head_block, provider)), cache_options)
+        if self._cache is not None:
+            provider = CachedHTTPProvider(provider, self._cache)
+        self._client = Web3(provider)
+        self._accounts = AccountCache(**(account_cache_options or {}))
         self._chain_id = chain_id
         self._decimals = decimals or 18
+        self._block_time = block_time or BLOCK_TIME
+        self._confirmation_options = dict(confirmation_options or {})
+        self._confirmation_depth = self._confirmation_options.pop('confirmations', 1)
+        self._multicall = Multicall(self._client, multicall, **(multicall_options or {}))
+        self._batch = BatchTransport(provider.endpoint_uri, pool=self._pool, cache=self._cache, network=network_name,
+                                     cassette=self._cassette, **(batch_options or {}))
+        self._nonces = get_nonce_manager(
+            chain_id,
+            lambda address, block: self._client.eth.get_transaction_count(Web3.to_checksum_address(address), block),
+            **(nonce_options or {}))
+        self._fees = get_fee_oracle(
+            chain_id or provider.endpoint_uri,
+            lambda state: FeeOracle(self._client.eth, chain_id, state=state, **(fee_options or {})))
 
     @staticmethod
-    def create_account(text: Union[str, bytes]) -> Account:
+    def _parse_account(text: Union[str, bytes]) -> CompactAccount:
         """
         Create an account from an address, private key or mnemonic
         :param text:
@@ -55,32 +283,44 @@ class W3Adapter(AdapterBase):
         """
         if isinstance(text, bytes) or len(text) in [64, 66]:
             acct = EthAccount.from_key(text)
-            return Account.create(address=acct.address, private_key=acct.key)
+            return CompactAccount.create(address=acct.address, private_key=acct.key)
         elif ' ' in text:
             acct = EthAccount.from_mnemonic(text)
-            return Account.create(address=acct.address, private_key=acct.key)
-        return Account.create(address=text)
+            return CompactAccount.create(address=acct.address, private_key=acct.key)
+        return CompactAccount.create(address=text)
 
-    def _get_account(self, account: Account):
+    def _get_account(self, account: CompactAccount):
         return self._client.eth.account.from_key(account.private_key)
 
-    def _get_contract(self, contract_address):
-        abi = self.get_abi(contract_address)
-        return self._client.eth.contract(address=Web3.to_checksum_address(contract_address), abi=abi)
+    def _get_contract(self, contract_address: str, abi: list) -> registry.ContractEntry:
+        return registry.get_contract(
+            self._chain_id, self._client, contract_address, abi,
+            lambda: self._client.eth.contract(address=Web3.to_checksum_address(contract_address), abi=abi),
+            lambda contract, name: getattr(contract.functions, name))
 
-    def generate_account(self, extra_entropy="") -> Account:
+    def generate_account(self, extra_entropy="") -> CompactAccount:
         eth_account = self._client.eth.account.create(extra_entropy)
-        return Account.create(address=eth_account.address, private_key=eth_account.key)
+        return CompactAccount.create(address=eth_account.address, private_key=eth_account.key)
+
+    @staticmethod
+    def generate_accounts(n: int, **kwargs) -> Optional[List[CompactAccount]]:
+        return keygen.generate_accounts(account_from_key, n, **kwargs)
+
+    @staticmethod
+    def derive_accounts(seed: bytes, start: int, count: int, path_template: str = None,
+                        **kwargs) -> List[CompactAccount]:
+        return hd.derive_accounts(seed, hd.SECP256K1, path_template or DERIVATION_PATH, start, count, account_from_key,
+                                  **kwargs)
 
-    def get_balance(self, account: Account, contract: Contract = None, token: Token = None) -> Decimal:
+    def get_balance(self, account: CompactAccount, contract: CompactContract = None, token: Token = None) -> Decimal:
         if token:
-            eth_contract = self._client.eth.contract(address=Web3.to_checksum_address(token.address), abi=token.get_abi())
-            balance = eth_contract.functions.balanceOf(account.address_bytes).call()
+            balance_of = self._get_contract(token.address, token.get_abi()).function('balanceOf')
+            balance = balance_of(account.address_bytes).call()
             return balance / 10 ** token.decimals
 
         if contract:
-            eth_contract = self._client.eth.contract(address=Web3.to_checksum_address(contract.address), abi=contract.get_abi())
-            balance = eth_contract.functions.balanceOf(account.address_bytes).call()
+            balance_of = self._get_contract(contract.address, contract.get_abi()).function('balanceOf')
+            balance = balance_of(account.address_bytes).call()
             return balance / 10 ** self._decimals
 
         try:
@@ -89,94 +329,238 @@ class W3Adapter(AdapterBase):
         except requests.exceptions.ReadTimeout as e:
             print(e)
 
-    def build_transaction(self, sender: Account, account: Account, amount: Decimal) -> dict:
+    def get_balances(self, accounts: List[CompactAccount], tokens: List[Token] = None,
+                     block_identifier='latest') -> BalanceTable:
+        """
+        Read native (token None) and ERC-20 balances of all accounts with Multicall3 aggregate3
+        :param accounts:
+        :param tokens: tokens to read, None for the native coin. Default is the native coin only
+        :return:
+        """
+        tokens = list(tokens or [None])
+        addresses = [Web3.to_checksum_address(account.address_bytes) for account in accounts]
+        results = self._multicall.aggregate(self._balance_calls(addresses, tokens), block_identifier)
+        return self._balance_table(addresses, tokens, results)
+
+    def _balance_calls(self, addresses: List[str], tokens: List[Token]) -> list:
+        calls = []
+        for address in addresses:
+            for token in tokens:
+                if token is None:
+                    calls.append(eth_balance_call(self._multicall.address, address))
+                else:
+                    calls.append(balance_of_call(token.address, address))
+        return calls
+
+    def _balance_table(self, addresses: List[str], tokens: List[Token], results: list) -> BalanceTable:
+        balances = []
+        errors = {}
+        columns = len(tokens)
+        for i in range(len(addresses)):
+            row = []
+            for j, token in enumerate(tokens):
+                result, error = results[i * columns + j]
+                value = decode_uint(result) if result else None
+                if value is None:
+                    errors[(i, j)] = error or 'invalid return data'
+                    row.append(None)
+                else:
+                    row.append(Decimal(value).scaleb(-(token.decimals if token else self._decimals)))
+            balances.append(row)
+        return BalanceTable(addresses=addresses, tokens=tokens, balances=balances, errors=errors)
+
+    def _request_batch(self, method: RPC, params: list, return_exceptions: bool = False) -> list:
+        """
+        Send the same method with every params in one JSON-RPC batch
+        :param return_exceptions: put exceptions of failed requests into the result instead of raising the first one
+        """
+        futures = self._batch.request_many([(method, p) for p in params])
+        formatter = PYTHONIC_RESULT_FORMATTERS.get(method)
+        results = []
+        for future in futures:
+            try:
+                result = future.result()
+                results.append(formatter(result) if formatter and result is not None else result)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def get_balance_batch(self, accounts: List[CompactAccount], block_identifier='latest',
+                          return_exceptions: bool = False) -> List[Decimal]:
+        balances = self._request_batch(RPC.eth_getBalance,
+                                       [[account.address_bytes, self._block_param(block_identifier)]
+                                        for account in accounts],
+                                       return_exceptions)
+        return [b if isinstance(b, Exception) else Decimal(b).scaleb(-self._decimals) for b in balances]
+
+    def get_transaction_count_batch(self, accounts: List[CompactAccount], block_identifier='pending',
+                                    return_exceptions: bool = False) -> List[int]:
+        return self._request_batch(RPC.eth_getTransactionCount,
+                                   [[account.address_bytes, self._block_param(block_identifier)]
+                                    for account in accounts],
+                                   return_exceptions)
+
+    def estimate_gas_batch(self, transactions: List[dict], return_exceptions: bool = False) -> List[int]:
+        return self._request_batch(RPC.eth_estimateGas,
+                                   [[{k: hex(v) if isinstance(v, int) else v for k, v in transaction.items()}]
+                                    for transaction in transactions],
+                                   return_exceptions)
+
+    def get_transaction_receipt_batch(self, tx_hashes: List[Union[str, bytes]],
+                                      return_exceptions: bool = False) -> List[AttributeDict]:
+        """
+        :return: receipts in input order, None for transactions that are not mined yet
+        """
+        receipts = self._request_batch(RPC.eth_getTransactionReceipt,
+                                       [[HexBytes(tx_hash).to_0x_hex()] for tx_hash in tx_hashes],
+                                       return_exceptions)
+        return [AttributeDict.recursive(r) if isinstance(r, dict) else r for r in receipts]
+
+    def _fetch_statuses(self, tx_hashes: List[str]) -> List[Optional[AttributeDict]]:
+        receipts = [None if isinstance(receipt, Exception) else receipt
+                    for receipt in self.get_transaction_receipt_batch(tx_hashes, return_exceptions=True)]
+        if self._confirmation_depth > 1 and any(receipts):
+            latest = self._client.eth.block_number
+            receipts = [receipt if receipt and latest - receipt['blockNumber'] + 1 >= self._confirmation_depth
+                        else None for receipt in receipts]
+        return receipts
+
+    @staticmethod
+    def _block_param(block_identifier):
+        return hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+
+    def build_transaction(self, sender: CompactAccount, account: CompactAccount, amount: Decimal) -> dict:
         sender_account = self._client.eth.account.from_key(sender.private_key)
         transaction = {
-            'chainId': self._chain_id,
+            'chainId': self._fees.chain_id,
             'from': sender_account.address,
             'to': account.address,
             'value': int(amount * 10 ** self._decimals),
-            'nonce': self._client.eth.get_transaction_count(sender_account.address),
         }
         return transaction
 
     def estimate_gas(self, transaction: dict):
         return self._client.eth.estimate_gas(transaction)
 
-    def sign_transaction(self, sender: Account, transaction: dict) -> HexBytes:
-        sender_account = self._client.eth.account.from_key(sender.private_key)
-        return self._client.eth.account.sign_transaction(transaction, sender_account.key).rawTransaction
-
-    def send(self, sender: Account, account: Account, amount: Decimal) -> str:
-        # sender_account = self._client.eth.account.from_key(sender.private_key)
-        transaction = self.build_transaction(sender, account, amount)
-        transaction['gas'] = 21000 or self.estimate_gas(transaction)
-        transaction['gasPrice'] = self._client.to_wei('10', 'gwei')
-
-        # transaction = {
-        #     # 'maxFeePerGas': 1,
-        #     # 'maxPriorityFeePerGas': 1,
-        # }
-        # gas = self._client.eth.estimate_gas(transaction)
-
-        # 2. Sign tx with a private key
-        # signed = self._client.eth.account.sign_transaction(transaction, sender_account.key)
+    def fees(self) -> dict:
+        """
+        Current fee fields of a transaction, cached for the fee oracle TTL
+        """
+        return self._fees.fees()
 
-        rawTransaction = self.sign_transaction(sender, transaction)
+    def sign_transaction(self, sender: CompactAccount, transaction: dict) -> HexBytes:
+        sender_account = self._client.eth.account.from_key(sender.private_key)
+        return self._client.eth.account.sign_transaction(transaction, sender_account.key).raw_transaction
 
-        # 3. Send the signed transaction
+    def send_raw_transaction(self, transaction: dict, raw_transaction: bytes) -> str:
+        """
+        Broadcast a signed transaction and report the outcome of its nonce to the nonce manager
+        """
+        address, nonce = transaction['from'], transaction['nonce']
         try:
-            tx_hash = self._client.eth.send_raw_transaction(rawTransaction)
-        except ValueError as e:
+            tx_hash = self._client.eth.send_raw_transaction(raw_transaction)
+        except (ValueError, Web3RPCError) as e:
+            self._nonces.rejected(address, nonce, e)
             raise AlreadyKnownTransaction(e)
-        return tx_hash.hex()
-
-    def transfer(self, sender: Account, receiver: Account, token: Token,
-                 amount: Union[int, float, str, decimal.Decimal]) -> str:
-        sender_account = self._client.eth.account.from_key(sender.private_key)
-        contract = self.create_contract(token.address)
-
-        token_amount = self._client.to_wei(amount, 'ether')
-
-        nonce = self._client.eth.getTransactionCount(sender.address)
-
-        transaction = contract.functions.transfer(receiver.address, token_amount).build_transaction({
-            'chainId': self._client.eth.chain_id,
-            'gas': 2000000,  # Adjust the gas limit as needed
-            'gasPrice': self._client.eth.gas_price,  # Adjust the gas price as needed or use w3.eth.generate_gas_price()
-            'nonce': nonce,
-        })
+        except Exception:
+            # The node may or may not have the transaction, read the nonce again next time
+            self._nonces.resync(address)
+            raise
+        self._nonces.sent(address, nonce)
+        return tx_hash.to_0x_hex()
+
+    def allocate_nonce(self, transaction: dict) -> bool:
+        """
+        Set the nonce of a transaction from the nonce manager where missing
+        :return: True if a nonce was allocated, it has to be sent or released
+        """
+        if 'nonce' in transaction:
+            return False
+        transaction['nonce'] = self._nonces.allocate(transaction['from'])
+        return True
 
-        # Sign the transaction with the private key
-        signed_txn = self._client.eth.account.sign_transaction(transaction, sender_account.private_key)
+    def release_nonce(self, transaction: dict):
+        """
+        Give back the nonce of a transaction that will not be sent
+        """
+        self._nonces.release(transaction['from'], transaction['nonce'])
 
-        # Attempt to send the transaction
+    def _sign_and_send(self, sender: CompactAccount, transaction: dict) -> str:
+        # The nonce is taken only once the transaction is about to be sent, so built transactions leave no gaps
+        allocated = self.allocate_nonce(transaction)
         try:
-            tx_hash = self._client.eth.send_raw_transaction(signed_txn.rawTransaction)
-            print(f"Transaction sent! Hash: {tx_hash.hex()}")
-        except Exception as e:
-            print(f"Error sending transaction: {e}")
-            raise Exception(f"Error sending transaction: {e}")
-        return tx_hash.hex()
-
-    def approve(self, sender: Account, spender: Account, token: Token, amount: Decimal) -> str:
-        contract = self.create_contract(token.address)
-
-        # spender = spender_address
-        max_amount = self._client.toWei(2 ** 64 - 1, 'ether')
-        nonce = self._client.eth.getTransactionCount(sender.address)
+            self._fees.fill(transaction)
+            raw_transaction = self.sign_transaction(sender, transaction)
+        except Exception:
+            if allocated:
+                self.release_nonce(transaction)
+            raise
+        return self.send_raw_transaction(transaction, raw_transaction)
 
-        tx = contract.functions.approve(spender.address, max_amount).buildTransaction({
-            'from': sender.address,
-            'nonce': nonce
-        })
+    def nonce_status(self, address: str) -> NonceStatus:
+        return self._nonces.status(Web3.to_checksum_address(address))
 
-        signed_tx = self._client.eth.account.signTransaction(tx, sender.private_key)
-        tx_hash = self._client.eth.sendRawTransaction(signed_tx.rawTransaction)
+    def resync_nonce(self, address: str):
+        self._nonces.resync(Web3.to_checksum_address(address))
 
-        return self._client.toHex(tx_hash)
+    def send(self, sender: CompactAccount, account: CompactAccount, amount: Decimal) -> str:
+        transaction = self.build_transaction(sender, account, amount)
+        return self._sign_and_send(sender, transaction)
+
+    def _build_contract_transaction(self, sender: CompactAccount, token: Union[Token, str], method: str, *args) -> dict:
+        address = token.address if isinstance(token, Token) else token
+        sender_address = Web3.to_checksum_address(sender.address)
+        return {
+            'chainId': self._fees.chain_id,
+            'from': sender_address,
+            'to': Web3.to_checksum_address(address),
+            'value': 0,
+            'data': get_decoder(ERC20_ABI).by_name[method].encode_input(*args),
+        }
 
-    def sign(self, sender: Account, message: bytes) -> str:
+    def transfer(self, sender: CompactAccount, receiver: CompactAccount, token: Token,
+                 amount: Union[int, float, str, decimal.Decimal]) -> str:
+        token_amount = int(Decimal(str(amount)).scaleb(token.decimals))
+        transaction = self._build_contract_transaction(sender, token, 'transfer',
+                                                       Web3.to_checksum_address(receiver.address), token_amount)
+        return self._sign_and_send(sender, transaction)
+
+    def approve(self, sender: CompactAccount, spender: CompactAccount, token: Union[Token, str],
+                amount: Decimal = None) -> str:
+        decimals = token.decimals if isinstance(token, Token) else self._decimals
+        token_amount = int(Decimal(str(amount)).scaleb(decimals)) if amount is not None else 2 ** 256 - 1
+        transaction = self._build_contract_transaction(sender, token, 'approve',
+                                                       Web3.to_checksum_address(spender.address), token_amount)
+        return self._sign_and_send(sender, transaction)
+
+    def sign_many(self, private_keys: List[Union[str, bytes]], transactions: List[dict], workers: int = None,
+                  chunk_size: int = None, executor=None) -> List[HexBytes]:
+        """
+        Sign many transactions across a process pool, missing chainId, fees and gas are filled first.
+        Missing nonces are allocated from the nonce manager, broadcast the results with send_raw_transaction
+        or give the nonces back with release_nonce
+        :param private_keys: key of each transaction
+        :param transactions: transactions, e.g. from build_transaction
+        :return: raw signed transactions in input order
+        """
+        transactions = [dict(transaction) for transaction in transactions]
+        allocated = []
+        try:
+            for transaction in transactions:
+                if self.allocate_nonce(transaction):
+                    allocated.append(transaction)
+                self._fees.fill(transaction)
+            items = [(bytes(HexBytes(private_key)), transaction)
+                     for private_key, transaction in zip(private_keys, transactions)]
+            return signing.sign_many(sign_transactions, items, workers, chunk_size, executor)
+        except Exception:
+            for transaction in reversed(allocated):
+                self.release_nonce(transaction)
+            raise
+
+    def sign(self, sender: CompactAccount, message: bytes) -> str:
         # sender_account = self._client.eth.account.from_key(sender.private_key)
 
         signable_message = defunct_hash_message(message)
@@ -197,124 +581,289 @@ class W3Adapter(AdapterBase):
     #         print(e, e.message)
     #         return False
 
-    def decode_calldata(self, contract: Contract, data: HexStr):
-        contract_eth = self._client.eth.contract(address=Web3.toChecksumAddress(contract.address), abi=contract.get_abi())
-        decoded_input = contract_eth.decode_function_input(data)
-        function, args = decoded_input
-
-        # output_names = [o['name'] for o in function_abi['outputs']]
-        # outputs = function_abi['outputs']
-        #
-        # contract_eth.in
-        # a = self.map_output(function.abi['inputs'][0], args['calls'][0])
-        mapped_input = self.map_output(function.abi['inputs'][0], args)
-        return function, mapped_input
+    def decode_calldata(self, contract: CompactContract, data: Union[HexStr, bytes]) -> Tuple[ContractFunction, dict]:
+        """
+        :return: the web3 function of the calldata and its arguments, see decode_calldata_plan for the fast path
+        """
+        function, args = self.decode_calldata_plan(contract, data)
+        entry = self._get_contract(contract.address, contract.get_abi())
+        return entry.function(function.selector, _function_by_selector), args
 
-    def decode_response(self, contract: Contract, function: Union[str, ABIFunction], return_data: Decodable):
-        if isinstance(function, str):
-            contract_eth = self._client.eth.contract(address=Web3.toChecksumAddress(contract.address), abi=contract.get_abi())
-            # fn_abi = getattr(contract_eth.functions, method)
-            function = contract_eth.find_functions_by_name(function)[0]
+    @staticmethod
+    def decode_calldata_plan(contract: CompactContract, data: Union[HexStr, bytes]) -> Tuple[FunctionPlan, dict]:
+        """
+        Like decode_calldata without a web3 contract, the function is a FunctionPlan
+        """
+        return get_decoder(contract.get_abi()).decode_input(HexBytes(data))
 
-        output_types = get_abi_output_types(function.abi)
+    def decode_response(self, contract: CompactContract, function: Union[str, FunctionPlan, ContractFunction],
+                        return_data: Decodable):
+        """
+        :return: the value of a single output, a dict keyed by output names for several outputs
+        """
+        function = get_decoder(contract.get_abi()).plan(function)
 
         try:
-            output_data = self._client.codec.decode(output_types, return_data)
+            return function.decode_output(return_data, keyed=True)
         except DecodingError as e:
-            # Provide a more helpful error message than the one provided by
-            # eth-abi-utils
             is_missing_code_error = (
                     return_data in ACCEPTABLE_EMPTY_STRINGS
                     and self._client.eth.get_code(contract.address) in ACCEPTABLE_EMPTY_STRINGS)
-            if is_missing_code_error:
-                msg = (
-                    "Could not transact with/call contract function, is contract "
-                    "deployed correctly and chain synced?"
-                )
-            else:
-                msg = (
-                    f"Could not decode contract function call to {function} with "
-                    f"return data: {str(return_data)}, output_types: {output_types}"
-                )
-            raise BadFunctionCallOutput(msg) from e
-
-        # normalizers = {
-        #     'abi': normalize_abi,
-        #     # 'address': partial(normalize_address, kwargs['web3'].ens),
-        #     'bytecode': normalize_bytecode,
-        #     'bytecode_runtime': normalize_bytecode,
-        # }
-
-        _normalizers = itertools.chain(
-            BASE_RETURN_NORMALIZERS,
-            (),
-        )
-        normalized_data = map_abi_data(_normalizers, output_types, output_data)
-
-        # if len(normalized_data) == 1:
-        #     return normalized_data[0]
-        # else:
-        #     return normalized_data
-        #
-        return self.decode_response2(contract, function, normalized_data[0] if len(normalized_data) == 1 else normalized_data)
-
-    def map_output(self, output: Union[Dict, str], output_value):
-        if isinstance(output_value, tuple):
-            output_value = list(output_value)
-        if isinstance(output, dict) and output['type'] in ['tuple[]'] and isinstance(output_value, dict):
-            if isinstance(output_value[output['name']], tuple):
-                output_value[output['name']] = list(output_value[output['name']])
-            for i, r in enumerate(output_value[output['name']]):
-                output_value[output['name']][i] = self.map_output(output, r)
-            return output_value
-        elif isinstance(output, dict) and output['type'] in ['tuple', 'tuple[]']:
-            tuple_components = output['components']
-            for i, component in enumerate(tuple_components):
-                if component.get('components'):
-                    output_value[i] = self.map_output(component, output_value[i])
-            tuple_types = [component['type'] for component in tuple_components]
-            tuple_names = [component['name'] for component in tuple_components]
-            decoded_tuple = [self.map_output(t, v) for t, v in zip(tuple_types, output_value)]
-            return dict(zip(tuple_names, decoded_tuple))
-        else:
-            return output_value
+            raise self._decoding_error(function, return_data, is_missing_code_error) from e
 
-    def decode_response2(self, contract: Contract, function: Union[str, ABIFunction], response: list):
-        if isinstance(function, str):
-            function_abi = next((f for f in contract.abi if f['type'] == 'function' and f['name'] == function), None)
-            output_names = [o['name'] for o in function_abi['outputs']]
-            outputs = function_abi['outputs']
-        else:
-            output_names = [o['name'] for o in function.abi['outputs']]
-            outputs = function.abi['outputs']
-        if isinstance(response, (list, tuple)):
-            ret = []
-            for r in response:
-                if len(outputs) == 1:
-                    a = self.map_output(outputs[0], r)
-                else:
-                    decoded_response = [self.map_output(o, v) for o, v in zip(outputs, response)]
-                    a = dict(zip(output_names, decoded_response))
-                ret.append(a)
-            return ret
+    @staticmethod
+    def _decoding_error(function: FunctionPlan, return_data: Decodable, is_missing_code_error: bool):
+        # Provide a more helpful error message than the one provided by
+        # eth-abi-utils
+        if is_missing_code_error:
+            msg = (
+                "Could not transact with/call contract function, is contract "
+                "deployed correctly and chain synced?"
+            )
         else:
-            if len(outputs) == 1:
-                return self.map_output(outputs[0], response)
-            else:
-                decoded_response = [self.map_output(o, v) for o, v in zip(outputs, response)]
-                return dict(zip(output_names, decoded_response))
+            msg = (
+                f"Could not decode contract function call to {function} with "
+                f"return data: {str(return_data)}, output_types: {function.output_types}"
+            )
+        return BadFunctionCallOutput(msg)
+
+    def decode_many(self, contract: CompactContract,
+                    items: Iterable[Tuple[Union[HexStr, bytes], Optional[Union[HexStr, bytes]]]]) -> Iterator[tuple]:
+        """
+        Decode (calldata, return data) pairs of one contract lazily
+        :return: iterator of (function, args, output), function is a FunctionPlan, output is None when there is
+            no return data
+        """
+        decoder = get_decoder(contract.get_abi())
+        for data, response in items:
+            function, args = decoder.decode_input(HexBytes(data))
+            output = self.decode_response(contract, function, HexBytes(response)) if response else None
+            yield function, args, output
 
-    def call(self, contract: Contract, method: str, args):
-        contract_eth = self._client.eth.contract(address=Web3.toChecksumAddress(contract.address), abi=contract.abi)
-        function = getattr(contract_eth.functions, method)
+    def call(self, contract: CompactContract, method: str, args):
+        function = get_decoder(contract.get_abi()).by_name[method]
 
-        response = function(args).call()
+        response = self._client.eth.call({'to': Web3.to_checksum_address(contract.address),
+                                          'data': function.encode_input(args)})
 
-        return self.decode_response(contract, method, response)
+        return self.decode_response(contract, function, response)
 
     def deploy_account(self, private_key: str) -> bool:
         return True
 
 
+class AsyncW3Adapter(AsyncAdapterBase, W3Adapter):
+    """
+    W3Adapter on AsyncWeb3. Methods that make requests are coroutines, the rest are shared with W3Adapter
+    """
+
+    def __init__(self, endpoint_uri, chain_id, decimals=None, multicall: str = None,
+                 multicall_options: dict = None, request_kwargs: dict = None, max_concurrency: int = None,
+                 account_cache_options: dict = None, block_time: float = None, confirmation_options: dict = None,
+                 nonce_options: dict = None, fee_options: dict = None, network_name: str = None, **kwargs):
+        """
+        :param network_name: label of the requests reported to the metrics hooks
+        """
+        confirmation_options = dict(confirmation_options or {})
+        self._confirmation_depth = confirmation_options.pop('confirmations', 1)
+        AsyncAdapterBase.__init__(self, max_concurrency, block_time or BLOCK_TIME, confirmation_options)
+        if isinstance(endpoint_uri, list):
+            endpoint_uri = endpoint_uri[0]
+        network_name = network_name or (str(chain_id) if chain_id else None)
+        self._client = AsyncWeb3(MeteredAsyncHTTPProvider(endpoint_uri, network_name, request_kwargs=request_kwargs))
+        self._accounts = AccountCache(**(account_cache_options or {}))
+        self._chain_id = chain_id
+        self._decimals = decimals or 18
+        self._multicall = Multicall(self._client, multicall, **(multicall_options or {}))
+        # Senders, fees and gas estimates are shared with the sync adapters of the chain
+        self._nonces = get_nonce_manager(
+            chain_id,
+            lambda address, block: self._limit(
+                self._client.eth.get_transaction_count(Web3.to_checksum_address(address), block)),
+            manager_class=AsyncNonceManager, **(nonce_options or {}))
+        self._fees = get_fee_oracle(
+            chain_id or endpoint_uri,
+            lambda state: AsyncFeeOracle(self._client.eth, chain_id, state=state, **(fee_options or {})))
+
+    def _get_contract(self, contract_address: str, abi: list) -> registry.ContractEntry:
+        return registry.get_contract(
+            ('async', self._chain_id), self._client, contract_address, abi,
+            lambda: self._client.eth.contract(address=Web3.to_checksum_address(contract_address), abi=abi),
+            lambda contract, name: getattr(contract.functions, name))
+
+    async def get_balance(self, account: CompactAccount, contract: CompactContract = None,
+                          token: Token = None) -> Decimal:
+        if token:
+            balance_of = self._get_contract(token.address, token.get_abi()).function('balanceOf')
+            balance = await self._limit(balance_of(account.address_bytes).call())
+            return balance / 10 ** token.decimals
+
+        if contract:
+            balance_of = self._get_contract(contract.address, contract.get_abi()).function('balanceOf')
+            balance = await self._limit(balance_of(account.address_bytes).call())
+            return balance / 10 ** self._decimals
+
+        balance = await self._limit(self._client.eth.get_balance(account.address_bytes))
+        return balance / 10 ** self._decimals
+
+    async def get_balances(self, accounts: List[CompactAccount], tokens: List[Token] = None,
+                           block_identifier='latest') -> BalanceTable:
+        tokens = list(tokens or [None])
+        addresses = [Web3.to_checksum_address(account.address_bytes) for account in accounts]
+        results = await self._multicall.aggregate_async(self._balance_calls(addresses, tokens), block_identifier,
+                                                        self._semaphore)
+        return self._balance_table(addresses, tokens, results)
+
+    async def _request_many(self, awaitables: list, return_exceptions: bool = False) -> list:
+        return await asyncio.gather(*(self._limit(awaitable) for awaitable in awaitables),
+                                    return_exceptions=return_exceptions)
+
+    async def get_balance_batch(self, accounts: List[CompactAccount], block_identifier='latest',
+                                return_exceptions: bool = False) -> List[Decimal]:
+        balances = await self._request_many([self._client.eth.get_balance(account.address_bytes, block_identifier)
+                                             for account in accounts], return_exceptions)
+        return [b if isinstance(b, Exception) else Decimal(b).scaleb(-self._decimals) for b in balances]
+
+    async def get_transaction_count_batch(self, accounts: List[CompactAccount], block_identifier='pending',
+                                          return_exceptions: bool = False) -> List[int]:
+        return await self._request_many([self._client.eth.get_transaction_count(account.address_bytes,
+                                                                                block_identifier)
+                                         for account in accounts], return_exceptions)
+
+    async def estimate_gas_batch(self, transactions: List[dict], return_exceptions: bool = False) -> List[int]:
+        return await self._request_many([self._client.eth.estimate_gas(transaction)
+                                         for transaction in transactions], return_exceptions)
+
+    async def _get_receipt(self, tx_hash):
+        try:
+            return await self._client.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    async def get_transaction_receipt_batch(self, tx_hashes: List[Union[str, bytes]],
+                                            return_exceptions: bool = False) -> List[AttributeDict]:
+        return await self._request_many([self._get_receipt(HexBytes(tx_hash)) for tx_hash in tx_hashes],
+                                        return_exceptions)
+
+    async def _fetch_statuses(self, tx_hashes: List[str]) -> List[Optional[AttributeDict]]:
+        receipts = [None if isinstance(receipt, Exception) else receipt
+                    for receipt in await self.get_transaction_receipt_batch(tx_hashes, return_exceptions=True)]
+        if self._confirmation_depth > 1 and any(receipts):
+            latest = await self._limit(self._client.eth.block_number)
+            receipts = [receipt if receipt and latest - receipt['blockNumber'] + 1 >= self._confirmation_depth
+                        else None for receipt in receipts]
+        return receipts
+
+    async def build_transaction(self, sender: CompactAccount, account: CompactAccount, amount: Decimal) -> dict:
+        return W3Adapter.build_transaction(self, sender, account, amount)
+
+    async def estimate_gas(self, transaction: dict):
+        return await self._limit(self._client.eth.estimate_gas(transaction))
+
+    async def fees(self) -> dict:
+        return await self._fees.fees()
+
+    def sign_transaction(self, sender: CompactAccount, transaction: dict) -> HexBytes:
+        return self._client.eth.account.sign_transaction(transaction, sender.private_key).raw_transaction
+
+    async def send_raw_transaction(self, transaction: dict, raw_transaction: bytes) -> str:
+        address, nonce = transaction['from'], transaction['nonce']
+        try:
+            tx_hash = await self._limit(self._client.eth.send_raw_transaction(raw_transaction))
+        except (ValueError, Web3RPCError) as e:
+            self._nonces.rejected(address, nonce, e)
+            raise AlreadyKnownTransaction(e)
+        except Exception:
+            # The node may or may not have the transaction, read the nonce again next time
+            self._nonces.resync(address)
+            raise
+        self._nonces.sent(address, nonce)
+        return tx_hash.to_0x_hex()
+
+    async def allocate_nonce(self, transaction: dict) -> bool:
+        if 'nonce' in transaction:
+            return False
+        transaction['nonce'] = await self._nonces.allocate(transaction['from'])
+        return True
+
+    async def _sign_and_send(self, sender: CompactAccount, transaction: dict) -> str:
+        allocated = await self.allocate_nonce(transaction)
+        try:
+            await self._fees.fill(transaction)
+            raw_transaction = self.sign_transaction(sender, transaction)
+        except Exception:
+            if allocated:
+                self.release_nonce(transaction)
+            raise
+        return await self.send_raw_transaction(transaction, raw_transaction)
+
+    async def nonce_status(self, address: str) -> NonceStatus:
+        return await self._nonces.status(Web3.to_checksum_address(address))
+
+    async def send(self, sender: CompactAccount, account: CompactAccount, amount: Decimal) -> str:
+        transaction = await self.build_transaction(sender, account, amount)
+        return await self._sign_and_send(sender, transaction)
+
+    async def transfer(self, sender: CompactAccount, receiver: CompactAccount, token: Token,
+                       amount: Union[int, float, str, decimal.Decimal]) -> str:
+        token_amount = int(Decimal(str(amount)).scaleb(token.decimals))
+        transaction = self._build_contract_transaction(sender, token, 'transfer',
+                                                       Web3.to_checksum_address(receiver.address), token_amount)
+        return await self._sign_and_send(sender, transaction)
+
+    async def approve(self, sender: CompactAccount, spender: CompactAccount, token: Union[Token, str],
+                      amount: Decimal = None) -> str:
+        decimals = token.decimals if isinstance(token, Token) else self._decimals
+        token_amount = int(Decimal(str(amount)).scaleb(decimals)) if amount is not None else 2 ** 256 - 1
+        transaction = self._build_contract_transaction(sender, token, 'approve',
+                                                       Web3.to_checksum_address(spender.address), token_amount)
+        return await self._sign_and_send(sender, transaction)
+
+    async def decode_response(self, contract: CompactContract, function: Union[str, FunctionPlan, ContractFunction],
+                              return_data: Decodable):
+        function = get_decoder(contract.get_abi()).plan(function)
+
+        try:
+            return function.decode_output(return_data, keyed=True)
+        except DecodingError as e:
+            is_missing_code_error = (
+                    return_data in ACCEPTABLE_EMPTY_STRINGS
+                    and await self._limit(self._client.eth.get_code(contract.address)) in ACCEPTABLE_EMPTY_STRINGS)
+            raise self._decoding_error(function, return_data, is_missing_code_error) from e
+
+    async def decode_many(self, contract: CompactContract,
+                          items: Iterable[Tuple[Union[HexStr, bytes], Optional[Union[HexStr, bytes]]]]
+                          ) -> AsyncIterator[tuple]:
+        decoder = get_decoder(contract.get_abi())
+        for data, response in items:
+            function, args = decoder.decode_input(HexBytes(data))
+            output = await self.decode_response(contract, function, HexBytes(response)) if response else None
+            yield function, args, output
+
+    async def call(self, contract: CompactContract, method: str, args):
+        function = get_decoder(contract.get_abi()).by_name[method]
+
+        response = await self._limit(self._client.eth.call({'to': Web3.to_checksum_address(contract.address),
+                                                            'data': function.encode_input(args)}))
+
+        return await self.decode_response(contract, function, response)
+
+    async def deploy_account(self, private_key: str) -> bool:
+        return True
+
+    async def close(self):
+        await self._client.provider.disconnect()
+
+
 def create_adapter(network, rpc: str = None, chain_id: int = None, **kwargs):
+    kwargs.setdefault('multicall', network.multicall)
+    kwargs.setdefault('block_time', network.block_time)
+    kwargs.setdefault('network_name', network.name)
     return W3Adapter(rpc or network.rpc, chain_id=chain_id or network.chain_id, **kwargs)
+
+
+def create_async_adapter(network, rpc: str = None, chain_id: int = None, **kwargs):
+    kwargs.setdefault('multicall', network.multicall)
+    kwargs.setdefault('block_time', network.block_time)
+    kwargs.setdefault('network_name', network.name)
+    return AsyncW3Adapter(rpc or network.rpc, chain_id=chain_id or network.chain_id, **kwargs)
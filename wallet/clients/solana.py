@@ -98,8 +98,10 @@ class SolanaClient(ClientBase):
             signatures = [signatures]
         signatures_solana = [Signature.from_string(signature) for signature in signatures]
         response = self._client.get_signature_statuses(signatures_solana)
-        if response.value[0]:
-            return response.value[0].confirmation_status in [TransactionConfirmationStatus.Confirmed, TransactionConfirmationStatus.Finalized]
+        return all(status is not None and
+                   status.confirmation_status in [TransactionConfirmationStatus.Confirmed,
+                                                  TransactionConfirmationStatus.Finalized]
+                   for status in response.value)
 
     def send(self, sender_key, receiver_address, amount, skip_confirmation=True) -> str:
         sender = self.get_keypair(sender_key)
@@ -0,0 +1,156 @@
+import hashlib
+import hmac
+import os
+import unicodedata
+from typing import Callable, Dict, List, Tuple
+
+SECP256K1 = 'secp256k1'
+ED25519 = 'ed25519'
+
+SECP256K1_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+HARDENED = 0x80000000
+SEED_ROUNDS = 2048
+MASTER_KEYS = {SECP256K1: b'Bitcoin seed', ED25519: b'ed25519 seed'}
+
+DERIVE_CHUNK_SIZE = 256  # indices per task
+
+# (private key, chain code)
+Node = Tuple[bytes, bytes]
+
+
+def validate_mnemonic(mnemonic: str):
+    """
+    Raise ValueError unless the mnemonic is a BIP39 phrase with a valid checksum. The phrase is never
+    part of the message
+    """
+    from eth_account.hdaccount import Mnemonic
+    try:
+        language = Mnemonic.detect_language(mnemonic)
+    except Exception:
+        raise ValueError('Invalid mnemonic: words are not from a single BIP39 wordlist') from None
+    if not Mnemonic(language).is_mnemonic_valid(mnemonic):
+        raise ValueError('Invalid mnemonic: wrong word count or checksum')
+
+
+def mnemonic_to_seed(mnemonic: str, passphrase: str = '') -> bytes:
+    """
+    BIP39 seed, the expensive PBKDF2 stretch that should run once per mnemonic.
+    The mnemonic is validated first, a typo would silently derive other addresses
+    """
+    mnemonic = unicodedata.normalize('NFKD', ' '.join(mnemonic.split()))
+    validate_mnemonic(mnemonic)
+    salt = unicodedata.normalize('NFKD', 'mnemonic' + passphrase)
+    return hashlib.pbkdf2_hmac('sha512', mnemonic.encode(), salt.encode(), SEED_ROUNDS)
+
+
+def parse_path(path: str) -> List[int]:
+    """
+    :param path: e.g. m/44'/60'/0'/0/1
+    """
+    segments = path.split('/')
+    if segments[0] != 'm':
+        raise ValueError(f"Derivation path must start with m: {path}")
+    indexes = []
+    for segment in segments[1:]:
+        hardened = segment.endswith("'") or segment.endswith('h')
+        index = int(segment.rstrip("'h"))
+        indexes.append(index + HARDENED if hardened else index)
+    return indexes
+
+
+def _compressed_public_key(private_key: bytes) -> bytes:
+    try:
+        import coincurve
+    except ImportError:
+        from eth_keys import keys
+        return keys.PrivateKey(private_key).public_key.to_compressed_bytes()
+    return coincurve.PrivateKey(private_key).public_key.format(compressed=True)
+
+
+def master_node(seed: bytes, curve: str) -> Node:
+    digest = hmac.new(MASTER_KEYS[curve], seed, hashlib.sha512).digest()
+    return digest[:32], digest[32:]
+
+
+def child_node(node: Node, index: int, curve: str) -> Node:
+    """
+    BIP32 child of a secp256k1 node or SLIP-10 child of an ed25519 node
+    """
+    key, chain_code = node
+    if curve == ED25519:
+        if index < HARDENED:
+            raise ValueError("ed25519 supports hardened derivation only")
+        data = b'\x00' + key + index.to_bytes(4, 'big')
+        digest = hmac.new(chain_code, data, hashlib.sha512).digest()
+        return digest[:32], digest[32:]
+
+    while True:
+        if index >= HARDENED:
+            data = b'\x00' + key + index.to_bytes(4, 'big')
+        else:
+            data = _compressed_public_key(key) + index.to_bytes(4, 'big')
+        digest = hmac.new(chain_code, data, hashlib.sha512).digest()
+        tweak = int.from_bytes(digest[:32], 'big')
+        child = (tweak + int.from_bytes(key, 'big')) % SECP256K1_ORDER
+        if tweak < SECP256K1_ORDER and child:
+            return child.to_bytes(32, 'big'), digest[32:]
+        # Invalid key, BIP32 proceeds with the next index
+        index += 1
+
+
+def derive_node(node: Node, indexes: List[int], curve: str, cache: Dict[tuple, Node] = None) -> Node:
+    """
+    Derive a path below a node. Intermediate nodes are kept in cache keyed by the path prefix
+    """
+    for i in range(len(indexes)):
+        prefix = tuple(indexes[:i + 1])
+        cached = cache.get(prefix) if cache is not None else None
+        if cached is None:
+            cached = child_node(node, indexes[i], curve)
+            if cache is not None:
+                cache[prefix] = cached
+        node = cached
+    return node
+
+
+def split_template(path_template: str) -> Tuple[str, str]:
+    """
+    Split a path template like m/44'/60'/0'/0/{index} into the fixed prefix and the indexed rest
+    """
+    segments = path_template.split('/')
+    for i, segment in enumerate(segments):
+        if '{index}' in segment:
+            return '/'.join(segments[:i]), '/'.join(segments[i:])
+    raise ValueError(f"Path template has no {{index}}: {path_template}")
+
+
+def _derive_chunk(args: tuple) -> list:
+    node, curve, rest, indices, to_account = args
+    cache = {}
+    accounts = []
+    for index in indices:
+        key, _ = derive_node(node, parse_path('m/' + rest.format(index=index)), curve, cache)
+        accounts.append(to_account(key))
+    return accounts
+
+
+def derive_accounts(seed: bytes, curve: str, path_template: str, start: int, count: int,
+                    to_account: Callable[[bytes], object], workers: int = None,
+                    chunk_size: int = None) -> list:
+    """
+    Derive count consecutive accounts from a seed. The fixed part of the path is derived once,
+    children are derived in chunks across a process pool. Only the parent node is sent to workers
+    :param to_account: module level function turning a private key into an account, it must be picklable
+    :param workers: processes to use, default is the number of cores. 1 derives on the calling thread
+    """
+    prefix, rest = split_template(path_template)
+    node = derive_node(master_node(seed, curve), parse_path(prefix), curve)
+    chunk_size = chunk_size or DERIVE_CHUNK_SIZE
+    workers = workers or os.cpu_count() or 1
+    indices = range(start, start + count)
+    tasks = [(node, curve, rest, indices[i:i + chunk_size], to_account) for i in range(0, count, chunk_size)]
+    if workers == 1 or len(tasks) <= 1:
+        return [account for task in tasks for account in _derive_chunk(task)]
+    from concurrent.futures import ProcessPoolExecutor  # loads multiprocessing
+    with ProcessPoolExecutor(min(workers, len(tasks))) as executor:
+        return [account for accounts in executor.map(_derive_chunk, tasks) for account in accounts]
@@ -0,0 +1,229 @@
+import logging
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import requests
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+
+from wallet.adapters.decoder import get_decoder
+from wallet.adapters.w3 import W3Adapter
+from wallet.types import TransferLog
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_ABI = [{"anonymous": False, "name": "Transfer", "type": "event", "inputs": [
+    {"indexed": True, "name": "from", "type": "address"},
+    {"indexed": True, "name": "to", "type": "address"},
+    {"indexed": False, "name": "value", "type": "uint256"}]}]
+TRANSFER_TOPIC = HexBytes('0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef')
+
+INITIAL_RANGE = 1000  # blocks per eth_getLogs request before the node limits are known
+MAX_RANGE = 10000
+TARGET_LOGS = 5000  # the range only grows while responses stay below this many logs
+CEILING_RETRY_RANGES = 20  # successful ranges before a range the node refused is tried again
+CONFIRMATION_WINDOW = 64  # blocks behind the head whose hashes are kept to detect reorgs
+MAX_TOPIC_ADDRESSES = 500  # larger receiver sets are filtered locally instead of in the topic filter
+
+# Messages of nodes refusing a range: geth, erigon, alchemy, infura, quicknode and others
+RANGE_LIMIT_ERRORS = ('more than', 'block range', 'range is too large', 'limit exceeded', 'too many',
+                      'response size', 'exceed', 'query timeout')
+
+
+class Checkpoint:
+    """
+    Scan progress and recent block hashes in a SQLite file. Both are written in one transaction,
+    so a restart resumes after the last completed range
+    """
+
+    def __init__(self, path: str, name: str):
+        self.name = name
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS checkpoints (name TEXT PRIMARY KEY, block INTEGER)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS block_hashes '
+                                     '(name TEXT, number INTEGER, hash TEXT, PRIMARY KEY (name, number))')
+
+    def block(self) -> Optional[int]:
+        row = self._connection.execute('SELECT block FROM checkpoints WHERE name = ?', (self.name,)).fetchone()
+        return row[0] if row else None
+
+    def block_hashes(self) -> Dict[int, str]:
+        rows = self._connection.execute('SELECT number, hash FROM block_hashes WHERE name = ?', (self.name,))
+        return dict(rows.fetchall())
+
+    def save(self, block: int, block_hashes: Dict[int, str], window: int):
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?)', (self.name, block))
+            self._connection.executemany('INSERT OR REPLACE INTO block_hashes VALUES (?, ?, ?)',
+                                         [(self.name, number, hash_) for number, hash_ in block_hashes.items()])
+            self._connection.execute('DELETE FROM block_hashes WHERE name = ? AND number <= ?',
+                                     (self.name, block - window))
+
+    def rewind(self, block: int):
+        """
+        Forget everything after block
+        """
+        with self._lock, self._connection:
+            self._connection.execute('UPDATE checkpoints SET block = ? WHERE name = ?', (block, self.name))
+            self._connection.execute('DELETE FROM block_hashes WHERE name = ? AND number > ?', (self.name, block))
+
+    def close(self):
+        self._connection.close()
+
+
+class RangeTooLarge(Exception):
+    pass
+
+
+class TransferIndexer:
+    """
+    Streams ERC-20 Transfer logs with eth_getLogs over block ranges sized to the node limits.
+    Progress is checkpointed to SQLite after every range, and block hashes within the confirmation window
+    are compared with the chain before every range to detect reorgs. Delivery is at least once:
+    a range interrupted before its checkpoint is scanned again after a restart
+    """
+
+    def __init__(self, adapter: W3Adapter, path: str, tokens: Iterable[str] = None, receivers: Iterable[str] = None,
+                 start_block: int = 0, name: str = None, confirmations: int = 0,
+                 window: int = CONFIRMATION_WINDOW, initial_range: int = INITIAL_RANGE, max_range: int = MAX_RANGE,
+                 on_reorg: Callable[[int], None] = None):
+        """
+        :param path: SQLite file of the checkpoint
+        :param tokens: token contracts to watch, None watches every token
+        :param receivers: only transfers to these addresses, None keeps every transfer
+        :param name: checkpoint name, several indexers can share one file
+        :param confirmations: stay this many blocks behind the head
+        :param on_reorg: called with the first invalidated block, transfers from that block on are delivered again
+        """
+        self._adapter = adapter
+        self._eth = adapter._client.eth
+        self.tokens = [Web3.to_checksum_address(token) for token in tokens] if tokens else None
+        self.receivers = {address.lower() for address in receivers} if receivers else None
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.window = window
+        self.range = initial_range
+        self.max_range = max_range
+        self._ceiling = max_range
+        self._successes = 0  # ranges read since the ceiling last moved
+        self._on_reorg = on_reorg
+        self._decoder = get_decoder(TRANSFER_ABI)
+        self.checkpoint = Checkpoint(path, name or f'transfers:{adapter._chain_id}')
+
+    def _filter(self, from_block: int, to_block: int) -> dict:
+        params = {'fromBlock': from_block, 'toBlock': to_block, 'topics': [TRANSFER_TOPIC]}
+        if self.tokens:
+            params['address'] = self.tokens
+        if self.receivers and len(self.receivers) <= MAX_TOPIC_ADDRESSES:
+            params['topics'] = [TRANSFER_TOPIC, None,
+                                ['0x' + '0' * 24 + address[2:] for address in sorted(self.receivers)]]
+        return params
+
+    def _get_logs(self, from_block: int, to_block: int) -> list:
+        try:
+            return self._eth.get_logs(self._filter(from_block, to_block))
+        except (Web3RPCError, ValueError) as e:
+            if any(text in str(e).lower() for text in RANGE_LIMIT_ERRORS):
+                raise RangeTooLarge(e)
+            raise
+        except (requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            raise RangeTooLarge(e)
+
+    def _decode(self, log) -> Optional[TransferLog]:
+        topics = log['topics']
+        # ERC-721 Transfer has the same topic with an indexed token id
+        if len(topics) != 3:
+            return None
+        _, args = self._decoder.decode_log(topics, log['data'])
+        if self.receivers and args['to'].lower() not in self.receivers:
+            return None
+        return TransferLog(token=log['address'], sender=args['from'], receiver=args['to'], value=args['value'],
+                           block_number=log['blockNumber'], block_hash=HexBytes(log['blockHash']).to_0x_hex(),
+                           tx_hash=HexBytes(log['transactionHash']).to_0x_hex(), log_index=log['logIndex'])
+
+    def _block_hashes(self, numbers: List[int]) -> Dict[int, str]:
+        blocks = self._adapter._request_batch('eth_getBlockByNumber', [[hex(number), False] for number in numbers])
+        return {number: HexBytes(block['hash']).to_0x_hex() for number, block in zip(numbers, blocks) if block}
+
+    def _check_reorg(self) -> Optional[int]:
+        """
+        Compare stored hashes with the chain, rewind the checkpoint to the last block that still matches
+        :return: the first invalidated block or None
+        """
+        stored = self.checkpoint.block_hashes()
+        if not stored:
+            return None
+        numbers = sorted(stored, reverse=True)
+        current = self._block_hashes(numbers[:1])
+        if current.get(numbers[0]) == stored[numbers[0]]:
+            return None
+        current.update(self._block_hashes(numbers[1:]))
+        valid = next((number for number in numbers if current.get(number) == stored[number]), None)
+        if valid is None:
+            valid = max(numbers[-1] - 1, self.start_block - 1)
+            logger.warning("Reorg deeper than the confirmation window, rescanning from %s", valid + 1)
+        self.checkpoint.rewind(valid)
+        return valid + 1
+
+    def scan(self, to_block: int = None) -> Iterator[TransferLog]:
+        """
+        Transfers from the checkpoint up to to_block, default is the head minus confirmations.
+        The checkpoint advances after the last transfer of each range is consumed
+        """
+        head = self._eth.block_number
+        to_block = min(to_block, head) if to_block is not None else head - self.confirmations
+        while True:
+            invalid = self._check_reorg()
+            if invalid is not None and self._on_reorg:
+                self._on_reorg(invalid)
+            last = self.checkpoint.block()
+            from_block = self.start_block if last is None else last + 1
+            if from_block > to_block:
+                return
+            end = min(from_block + self.range - 1, to_block)
+            try:
+                logs = self._get_logs(from_block, end)
+            except RangeTooLarge:
+                if end == from_block:
+                    raise
+                # Do not grow back to a range the node refused for a while
+                self.range = self._ceiling = max(1, (end - from_block + 1) // 2)
+                self._successes = 0
+                continue
+            self._successes += 1
+            if self._ceiling < self.max_range and self._successes >= CEILING_RETRY_RANGES:
+                # Limits on response size or query time depend on the load of the node, they may have passed
+                self._ceiling = min(self._ceiling * 2, self.max_range)
+                self._successes = 0
+            if len(logs) < TARGET_LOGS:
+                self.range = min(self.range * 2, self.max_range, self._ceiling)
+
+            # The hashes of the logs are the ones the transfers come from, they are stored as they are
+            hashes = {}
+            for log in logs:
+                hashes[log['blockNumber']] = HexBytes(log['blockHash']).to_0x_hex()
+            if head - end < self.window:
+                # Blocks without transfers can be reorganized too, keep the hash of every block in the window
+                canonical = self._block_hashes(list(range(max(from_block, head - self.window + 1), end + 1)))
+                orphaned = sorted(number for number, hash_ in hashes.items()
+                                  if number in canonical and canonical[number] != hash_)
+                if orphaned:
+                    # A reorg between eth_getLogs and the lookup, read the range again before yielding anything
+                    logger.warning("Logs of orphaned block %s, reading blocks %s-%s again", orphaned[0], from_block,
+                                   end)
+                    continue
+                for number, hash_ in canonical.items():
+                    hashes.setdefault(number, hash_)
+            for log in logs:
+                transfer = self._decode(log)
+                if transfer is not None:
+                    yield transfer
+            self.checkpoint.save(end, {number: hash_ for number, hash_ in hashes.items()
+                                       if head - number < self.window}, self.window)
+
+    def close(self):
+        self.checkpoint.close()
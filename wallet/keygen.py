@@ -0,0 +1,93 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Callable, List, Optional
+
+from wallet.models import CompactAccount
+
+GENERATE_CHUNK_SIZE = 1000  # keys per task, also the granularity of cancellation
+TASKS_PER_WORKER = 2  # tasks in flight per process, results are streamed as tasks complete
+
+
+class AddressPrefix:
+    """
+    Picklable predicate matching addresses that start with one of the prefixes
+    """
+
+    def __init__(self, *prefixes: str, case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+        self.prefixes = tuple(prefixes if case_sensitive else (prefix.lower() for prefix in prefixes))
+
+    def __call__(self, address: str) -> bool:
+        return (address if self.case_sensitive else address.lower()).startswith(self.prefixes)
+
+
+def _generate_chunk(args: tuple) -> List[CompactAccount]:
+    to_account, count, predicate = args
+    accounts = []
+    generated = 0
+    while generated < count:
+        try:
+            account = to_account(os.urandom(32))
+        except ValueError:
+            # Out of the curve order, practically never
+            continue
+        generated += 1
+        if predicate is None or predicate(account.address):
+            accounts.append(account)
+    return accounts
+
+
+def generate_accounts(to_account: Callable[[bytes], CompactAccount], n: int, workers: int = None,
+                      sink: Callable[[CompactAccount], None] = None, predicate: Callable[[str], bool] = None,
+                      chunk_size: int = None) -> Optional[List[CompactAccount]]:
+    """
+    Generate n random accounts in chunks across a process pool
+    :param to_account: module level function turning a private key into an account, it must be picklable
+    :param workers: processes to use, default is the number of cores. 1 generates on the calling thread
+    :param sink: receives every account as soon as its chunk is done, e.g. a CSV writer or a keystore.
+        Accounts are not collected when a sink is given
+    :param predicate: picklable filter on the address, e.g. AddressPrefix. Generation stops after n matches
+    :return: the accounts if there is no sink
+    """
+    chunk_size = chunk_size or GENERATE_CHUNK_SIZE
+    workers = workers or os.cpu_count() or 1
+    accounts = [] if sink is None else None
+    produced = 0
+
+    def consume(chunk: List[CompactAccount]):
+        nonlocal produced
+        for account in chunk[:n - produced]:
+            if sink is None:
+                accounts.append(account)
+            else:
+                sink(account)
+            produced += 1
+
+    scheduled = 0
+
+    def task() -> tuple:
+        nonlocal scheduled
+        # Without a predicate every key counts, the last chunk only needs the remaining ones
+        count = chunk_size if predicate else min(chunk_size, n - scheduled)
+        scheduled += count
+        return to_account, count, predicate
+
+    if workers == 1:
+        while produced < n:
+            consume(_generate_chunk(task()))
+        return accounts
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        try:
+            while produced < n:
+                while len(pending) < workers * TASKS_PER_WORKER and (predicate or scheduled < n):
+                    pending.add(executor.submit(_generate_chunk, task()))
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    consume(future.result())
+        finally:
+            for future in pending:
+                future.cancel()
+    return accounts
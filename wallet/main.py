@@ -1,15 +1,34 @@
+import asyncio
+import functools
+from concurrent.futures import Future
 from decimal import Decimal
-from typing import Union
+from typing import TYPE_CHECKING, Union, List, Iterable, Iterator, Tuple, Optional, AsyncIterator, Callable
 
-from eth_typing import HexStr
-from hexbytes import HexBytes
+from . import hd, metrics
+from .adapters import create_adapter, create_async_adapter
+from .models import CompactAccount, CompactContract
+from .types import Token, BalanceTable
 
-from .adapters import create_adapter
-from .models import Contract
-from .models.account import Account
-from .types import Token
+if TYPE_CHECKING:
+    from .models import Account, Contract
 
 
+def _hex_bytes(value) -> bytes:
+    # hexbytes comes with the EVM dependencies, TRON and Solana workers never load it
+    from hexbytes import HexBytes
+    return HexBytes(value)
+
+
+def _model(value):
+    # The adapters work with compact objects, pydantic models are built only for what is returned
+    return value.to_model() if isinstance(value, (CompactAccount, CompactContract)) else value
+
+
+def _sink_model(sink, account):
+    sink(account.to_model())
+
+
+@metrics.instrument
 class Wallet:
     # provider_options: dict = None,
     def __init__(self, network=None, testnet=None, rpc=None, chain_id=None, **kwargs):
@@ -34,18 +53,24 @@ class Wallet:
     def get_network(self):
         return self._network
 
-    def create_account(self, text: Union[str, bytes]) -> Account:
+    def _account(self, text: Union[str, bytes]):
         if isinstance(text, str):
             text = text.strip()
         return self._adapter.create_account(text)
 
-    def create_contract(self, contract_address: Union[Token, str, bytes], abi: list = None) -> Contract:
+    def _contract(self, contract_address: Union[Token, str, bytes], abi: list = None) -> CompactContract:
         if isinstance(contract_address, Token):
             contract_address = contract_address.address
         return self._adapter.create_contract(contract_address, abi)
 
+    def create_account(self, text: Union[str, bytes]) -> 'Account':
+        return _model(self._account(text))
+
+    def create_contract(self, contract_address: Union[Token, str, bytes], abi: list = None) -> 'Contract':
+        return _model(self._contract(contract_address, abi))
+
     def get_balance(self, address: Union[str, bytes], token: Token = None, decimals=None) -> Decimal:
-        account = self.create_account(address)
+        account = self._account(address)
         # if token:
         #     contract = self.create_contract(contract)
         balance = self._adapter.get_balance(account, token=token)
@@ -53,8 +78,56 @@ class Wallet:
             return balance.quantize(Decimal(f"1e-{decimals}"))
         return balance
 
-    def generate_account(self, **kwargs) -> Account:
-        return self._adapter.generate_account(**kwargs)
+    def get_balances(self, addresses: Iterable[Union[str, bytes]], tokens: List[Token] = None,
+                     decimals=None, **kwargs) -> BalanceTable:
+        """
+        Balances of many addresses in many tokens in as few requests as the adapter allows
+        :param addresses:
+        :param tokens: None in the list stands for the native coin. Default is the native coin only
+        :param decimals:
+        :return: table with a row per address and a column per token, failed cells are None
+        """
+        addresses = list(addresses)
+        accounts = [self._account(address) for address in addresses]
+        table = self._adapter.get_balances(accounts, tokens, **kwargs)
+        if decimals:
+            exp = Decimal(f"1e-{decimals}")
+            table = table._replace(balances=[[None if balance is None else Decimal(balance).quantize(exp)
+                                              for balance in row] for row in table.balances])
+        return table._replace(addresses=addresses)
+
+    def generate_account(self, **kwargs) -> 'Account':
+        return _model(self._adapter.generate_account(**kwargs))
+
+    def generate_accounts(self, n: int, workers: int = None, sink: Callable[['Account'], None] = None,
+                          predicate: Callable[[str], bool] = None, chunk_size: int = None,
+                          compact: bool = False) -> Optional[List['Account']]:
+        """
+        Generate n random accounts in parallel processes
+        :param workers: number of processes, default is the number of cores
+        :param sink: receives accounts as they are generated, e.g. a CSV writer or an encrypted keystore
+        :param predicate: picklable address filter like keygen.AddressPrefix('0xdead'), stops after n matches
+        :param chunk_size: keys per task
+        :param compact: return and sink CompactAccount objects instead of pydantic models, for large address books
+        :return: the accounts if there is no sink
+        """
+        if sink is not None and not compact:
+            sink = functools.partial(_sink_model, sink)
+        accounts = self._adapter.generate_accounts(n, workers=workers, sink=sink, predicate=predicate,
+                                                   chunk_size=chunk_size)
+        return accounts if compact or accounts is None else [account.to_model() for account in accounts]
+
+    def derive_accounts(self, mnemonic: str, start: int = 0, count: int = 1, path_template: str = None,
+                        passphrase: str = '', workers: int = None, compact: bool = False) -> List['Account']:
+        """
+        Derive consecutive HD accounts of the network from one mnemonic, the seed is stretched once
+        :param path_template: e.g. m/44'/60'/0'/0/{index}, default is the standard path of the network
+        :param workers: number of processes, default is the number of cores
+        :param compact: return CompactAccount objects instead of pydantic models
+        """
+        seed = hd.mnemonic_to_seed(mnemonic, passphrase)
+        accounts = self._adapter.derive_accounts(seed, start, count, path_template, workers=workers)
+        return accounts if compact else [account.to_model() for account in accounts]
 
     def send(self, private_key: Union[str, bytes], address, amount: Union[float, Decimal]):
         sender = self._adapter.create_account(private_key)
@@ -64,7 +137,7 @@ class Wallet:
     def transfer(self, private_key: Union[str, bytes], address, token: Token, amount: Union[float, Decimal]):
         sender = self._adapter.create_account(private_key)
         account = self._adapter.create_account(address)
-        return self._adapter.transfer(sender, account, amount)
+        return self._adapter.transfer(sender, account, token, amount)
 
     def sign(self, sender: Union[str, bytes], message: Union[str, bytes]) -> str:
         if isinstance(message, str):
@@ -72,43 +145,258 @@ class Wallet:
         sender = self._adapter.create_account(sender)
         return self._adapter.sign(sender, message)
 
+    def sign_many(self, private_keys: List[Union[str, bytes]], transactions: list, workers: int = None,
+                  chunk_size: int = None, executor=None) -> list:
+        """
+        Sign many transactions in parallel processes, parsed keys are cached per process
+        :param private_keys: key of each transaction
+        :param transactions: transaction dicts on EVM, built transactions on TRON
+        :param workers: number of processes, default is the number of cores
+        :param chunk_size: transactions per task
+        :param executor: a process pool to reuse between calls
+        :return: raw signed transactions on EVM, signatures on TRON, in input order
+        """
+        if len(private_keys) != len(transactions):
+            raise ValueError("private_keys and transactions must have the same length")
+        return self._adapter.sign_many(private_keys, transactions, workers=workers, chunk_size=chunk_size,
+                                       executor=executor)
+
+    def track_transactions(self, tx_ids: List[str], callback: Callable[[str, Future], None] = None,
+                           timeout: float = None) -> List[Future]:
+        """
+        Wait for many sent transactions in the background, they are polled together in batched requests
+        :param callback: called with (tx_id, future) when a transaction is confirmed or timed out
+        :param timeout: seconds until a future fails with TimeoutError
+        :return: futures of the receipts in input order
+        """
+        return self._adapter.track_transactions(tx_ids, callback, timeout)
+
+    def wait_for_transactions(self, tx_ids: List[str], timeout: float = None) -> list:
+        """
+        Block until every transaction is confirmed
+        :return: receipts in input order
+        """
+        return [future.result() for future in self.track_transactions(tx_ids, timeout=timeout)]
+
     def approve(self, sender: Union[str, bytes], spender: Union[str, bytes], contract: Union[str, bytes], amount: Union[float, Decimal]):
         sender = self._adapter.create_account(sender)
         spender = self._adapter.create_account(spender)
         return self._adapter.approve(sender, spender, contract, amount)
 
-    def estimate(self, contract: Union[Token, Contract, str, bytes],
+    def estimate(self, contract: Union[Token, 'Contract', str, bytes],
                  method: str,
                  amount: Union[float, Decimal], **kwargs):
         if isinstance(contract, Token):
             if amount:
                 amount = int(amount * 10 ** contract.decimals)
-            contract = self.create_contract(contract)
-        elif not isinstance(contract, Contract):
-            contract = self.create_contract(contract)
+            contract = self._contract(contract)
+        elif isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
         return self._adapter.estimate(contract, method, amount, **kwargs)
 
-    def call(self, contract: Union[Contract, str, bytes], method: str, args):
-        if not isinstance(contract, Contract):
-            contract = self.create_contract(contract)
+    def _payments(self, contract: Union[Token, 'Contract', str, bytes],
+                  payments: Iterable[Tuple[Union[str, bytes], Union[float, Decimal]]]) -> tuple:
+        if isinstance(contract, Token):
+            payments = [(recipient, int(amount * 10 ** contract.decimals) if amount else amount)
+                        for recipient, amount in payments]
+            contract = self._contract(contract)
+        elif isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        return contract, list(payments)
+
+    def estimate_many(self, contract: Union[Token, 'Contract', str, bytes], method: str,
+                      payments: Iterable[Tuple[Union[str, bytes], Union[float, Decimal]]], **kwargs) -> List[dict]:
+        """
+        Estimate one method of a contract for many recipients, e.g. a payout. Shared state like the resources
+        of the sender is read once
+        :param payments: (recipient, amount) pairs, amounts are in tokens when contract is a Token
+        :return: estimates in input order
+        """
+        contract, payments = self._payments(contract, payments)
+        return self._adapter.estimate_many(contract, method, payments, **kwargs)
+
+    def call(self, contract: Union['Contract', str, bytes], method: str, args):
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
         return self._adapter.call(contract, method, args)
 
-    def deploy_account(self, private_key: str):
-        return self._adapter.deploy_account(private_key)
+    def deploy_account(self, private_key: str, payer_key: str = None):
+        """
+        :param payer_key: account paying the rent exemption of a new Solana account
+        """
+        if payer_key is None:
+            return self._adapter.deploy_account(private_key)
+        return self._adapter.deploy_account(private_key, payer_key)
+
+    def decode_response(self, contract: Union['Contract', str, bytes], method: str, response: str):
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        return self._adapter.decode_response(contract, method, _hex_bytes(response))
+
+    def decode_call(self, contract: Union['Contract', str, bytes], data: str, response: str = None):
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        function, args = self._adapter.decode_calldata(contract, data)
+
+        if response:
+            output = self._adapter.decode_response(contract, function, _hex_bytes(response))
+        else:
+            output = None
+
+        return function, args, output
+
+    def decode_call_plan(self, contract: Union['Contract', str, bytes], data: str, response: str = None):
+        """
+        Like decode_call without a web3 contract, the function is a decoder FunctionPlan
+        """
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        function, args = self._adapter.decode_calldata_plan(contract, data)
+
+        if response:
+            output = self._adapter.decode_response(contract, function, _hex_bytes(response))
+        else:
+            output = None
+
+        return function, args, output
+
+    def decode_many(self, contract: Union['Contract', str, bytes],
+                    items: Iterable[Tuple[str, Optional[str]]]) -> Iterator[tuple]:
+        """
+        Lazily decode many (calldata, response) pairs of one contract
+        :return: iterator of (function, args, output) like decode_call_plan
+        """
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        return self._adapter.decode_many(contract, items)
+
+
+@metrics.instrument
+class AsyncWallet(Wallet):
+    """
+    asyncio Wallet. Methods that make requests are coroutines, requests share the adapter connection pool
+    and are limited by max_concurrency
+    """
+
+    def __init__(self, network=None, testnet=None, rpc=None, chain_id=None, **kwargs):
+        if not network and not testnet:
+            raise ValueError("Either network or testnet must be provided")
+
+        self._network = network or testnet
+        self._adapter = create_async_adapter(network or testnet, rpc, chain_id, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        await self._adapter.close()
+
+    async def get_balance(self, address: Union[str, bytes], token: Token = None, decimals=None) -> Decimal:
+        account = self._account(address)
+        balance = await self._adapter.get_balance(account, token=token)
+        if decimals:
+            return Decimal(balance).quantize(Decimal(f"1e-{decimals}"))
+        return balance
+
+    async def get_balances(self, addresses: Iterable[Union[str, bytes]], tokens: List[Token] = None,
+                           decimals=None, **kwargs) -> BalanceTable:
+        addresses = list(addresses)
+        accounts = [self._account(address) for address in addresses]
+        table = await self._adapter.get_balances(accounts, tokens, **kwargs)
+        if decimals:
+            exp = Decimal(f"1e-{decimals}")
+            table = table._replace(balances=[[None if balance is None else Decimal(balance).quantize(exp)
+                                              for balance in row] for row in table.balances])
+        return table._replace(addresses=addresses)
+
+    async def send(self, private_key: Union[str, bytes], address, amount: Union[float, Decimal]):
+        sender = self._adapter.create_account(private_key)
+        account = self._adapter.create_account(address)
+        return await self._adapter.send(sender, account, amount)
+
+    async def transfer(self, private_key: Union[str, bytes], address, token: Token, amount: Union[float, Decimal]):
+        sender = self._adapter.create_account(private_key)
+        account = self._adapter.create_account(address)
+        return await self._adapter.transfer(sender, account, token, amount)
+
+    async def approve(self, sender: Union[str, bytes], spender: Union[str, bytes], contract: Union[str, bytes],
+                      amount: Union[float, Decimal]):
+        sender = self._adapter.create_account(sender)
+        spender = self._adapter.create_account(spender)
+        return await self._adapter.approve(sender, spender, contract, amount)
+
+    async def estimate(self, contract: Union[Token, 'Contract', str, bytes],
+                       method: str,
+                       amount: Union[float, Decimal], **kwargs):
+        if isinstance(contract, Token):
+            if amount:
+                amount = int(amount * 10 ** contract.decimals)
+            contract = self._contract(contract)
+        elif isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        return await self._adapter.estimate(contract, method, amount, **kwargs)
+
+    async def estimate_many(self, contract: Union[Token, 'Contract', str, bytes], method: str,
+                            payments: Iterable[Tuple[Union[str, bytes], Union[float, Decimal]]],
+                            **kwargs) -> List[dict]:
+        contract, payments = self._payments(contract, payments)
+        return await self._adapter.estimate_many(contract, method, payments, **kwargs)
+
+    async def call(self, contract: Union['Contract', str, bytes], method: str, args):
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        return await self._adapter.call(contract, method, args)
+
+    async def deploy_account(self, private_key: str, payer_key: str = None):
+        if payer_key is None:
+            return await self._adapter.deploy_account(private_key)
+        return await self._adapter.deploy_account(private_key, payer_key)
+
+    def track_transactions(self, tx_ids: List[str], callback: Callable[[str, asyncio.Future], None] = None,
+                           timeout: float = None) -> List[asyncio.Future]:
+        """
+        Poll many sent transactions in a task of the running loop, in batched requests
+        :return: asyncio futures of the receipts in input order
+        """
+        return self._adapter.track_transactions(tx_ids, callback, timeout)
 
-    def decode_response(self, contract: Union[Contract, str, bytes], method: str, response: str):
-        if not isinstance(contract, Contract):
-            contract = self.create_contract(contract)
-        return self._adapter.decode_response(contract, method, HexBytes(response))
+    async def wait_for_transactions(self, tx_ids: List[str], timeout: float = None) -> list:
+        return await self._adapter.wait_for_transactions(tx_ids, timeout)
 
-    def decode_call(self, contract: Union[Contract, str, bytes], data: str, response: str = None):
-        if not isinstance(contract, Contract):
-            contract = self.create_contract(contract)
-        function, args = self._adapter.decode_calldata(contract, HexStr(data))
+    async def decode_response(self, contract: Union['Contract', str, bytes], method: str, response: str):
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        return await self._adapter.decode_response(contract, method, _hex_bytes(response))
+
+    async def decode_call(self, contract: Union['Contract', str, bytes], data: str, response: str = None):
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        function, args = self._adapter.decode_calldata(contract, data)
 
         if response:
-            output = self._adapter.decode_response(contract, function, HexBytes(response))
+            output = await self._adapter.decode_response(contract, function, _hex_bytes(response))
         else:
             output = None
 
         return function, args, output
+
+    async def decode_call_plan(self, contract: Union['Contract', str, bytes], data: str, response: str = None):
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        function, args = self._adapter.decode_calldata_plan(contract, data)
+
+        if response:
+            output = await self._adapter.decode_response(contract, function, _hex_bytes(response))
+        else:
+            output = None
+
+        return function, args, output
+
+    def decode_many(self, contract: Union['Contract', str, bytes],
+                    items: Iterable[Tuple[str, Optional[str]]]) -> AsyncIterator[tuple]:
+        if isinstance(contract, (str, bytes)):
+            contract = self._contract(contract)
+        return self._adapter.decode_many(contract, items)
@@ -0,0 +1,277 @@
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from wallet.types import RequestEvent
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # seconds
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152)  # bytes
+
+Hook = Callable[[RequestEvent], None]
+
+# Replaced, never mutated, so emitting needs no lock
+_hooks: Tuple[Hook, ...] = ()
+_hooks_lock = threading.Lock()
+
+
+def add_hook(hook: Hook) -> Hook:
+    """
+    Call hook with a RequestEvent after every measured operation, e.g. a Collector or a PrometheusHook
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + (hook,)
+    return hook
+
+
+def remove_hook(hook: Hook):
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def enabled() -> bool:
+    return bool(_hooks)
+
+
+def emit(event: RequestEvent):
+    for hook in _hooks:
+        try:
+            hook(event)
+        except Exception:
+            logger.exception("Metrics hook %r failed", hook)
+
+
+def measure(network: Optional[str], kind: str, method: str, call: Callable[[], Any],
+            request_size: Callable[[], int] = None, response_size: Callable[[Any], int] = None):
+    """
+    Run call and emit its duration, sizes and error class. Without hooks this is just call()
+    :param request_size: computed only when a hook is registered
+    :param response_size: receives the result
+    """
+    if not _hooks:
+        return call()
+    start = time.perf_counter()
+    try:
+        result = call()
+    except Exception as e:
+        emit(RequestEvent(network, kind, method, time.perf_counter() - start,
+                          request_size() if request_size else None, None, type(e).__name__))
+        raise
+    emit(RequestEvent(network, kind, method, time.perf_counter() - start,
+                      request_size() if request_size else None, response_size(result) if response_size else None))
+    return result
+
+
+async def measure_async(network: Optional[str], kind: str, method: str, call: Callable[[], Awaitable],
+                        request_size: Callable[[], int] = None, response_size: Callable[[Any], int] = None):
+    """
+    measure for a coroutine
+    """
+    if not _hooks:
+        return await call()
+    start = time.perf_counter()
+    try:
+        result = await call()
+    except Exception as e:
+        emit(RequestEvent(network, kind, method, time.perf_counter() - start,
+                          request_size() if request_size else None, None, type(e).__name__))
+        raise
+    emit(RequestEvent(network, kind, method, time.perf_counter() - start,
+                      request_size() if request_size else None, response_size(result) if response_size else None))
+    return result
+
+
+def instrument(cls):
+    """
+    Class decorator measuring every public method defined in the class as kind 'wallet'.
+    The network label is the name of self._network
+    """
+    for name, function in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(function):
+            continue
+        setattr(cls, name, _instrumented(function))
+    return cls
+
+
+def _network_name(wallet) -> Optional[str]:
+    network = getattr(wallet, '_network', None)
+    return getattr(network, 'name', None)
+
+
+def _instrumented(function):
+    name = function.__name__
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(self, *args, **kwargs):
+            if not _hooks:
+                return await function(self, *args, **kwargs)
+            return await measure_async(_network_name(self), 'wallet', name, lambda: function(self, *args, **kwargs))
+    else:
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            if not _hooks:
+                return function(self, *args, **kwargs)
+            return measure(_network_name(self), 'wallet', name, lambda: function(self, *args, **kwargs))
+    return wrapper
+
+
+class Histogram:
+    """
+    Counts per fixed bucket, quantiles are interpolated within the bucket
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def stats(self) -> dict:
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'buckets': dict(zip(self.buckets + (float('inf'),), self.counts))}
+
+
+class MethodStats:
+    __slots__ = ('count', 'errors', 'latency', 'request_size', 'response_size')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = Counter()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_size = Histogram(SIZE_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+
+    def stats(self) -> dict:
+        return {'count': self.count, 'errors': dict(self.errors), 'latency': self.latency.stats(),
+                'request_size': self.request_size.stats(), 'response_size': self.response_size.stats()}
+
+
+class Collector:
+    """
+    In-process hook aggregating counts, error classes, latency and payload size histograms
+    per (network, kind, method)
+    """
+
+    def __init__(self):
+        self._methods: Dict[Tuple[Optional[str], str, str], MethodStats] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent):
+        key = (event.network, event.kind, event.method)
+        with self._lock:
+            stats = self._methods.get(key)
+            if stats is None:
+                stats = self._methods[key] = MethodStats()
+            stats.count += 1
+            if event.error is not None:
+                stats.errors[event.error] += 1
+            stats.latency.observe(event.duration)
+            if event.request_size is not None:
+                stats.request_size.observe(event.request_size)
+            if event.response_size is not None:
+                stats.response_size.observe(event.response_size)
+
+    def stats(self) -> Dict[Tuple[Optional[str], str, str], dict]:
+        with self._lock:
+            return {key: stats.stats() for key, stats in self._methods.items()}
+
+    def summary(self) -> List[dict]:
+        """
+        One flat row per (network, kind, method), sorted by total time
+        """
+        rows = [{'network': network, 'kind': kind, 'method': method, 'count': stats['count'],
+                 'errors': sum(stats['errors'].values()), 'total': stats['latency']['sum'],
+                 'p50': stats['latency']['p50'], 'p99': stats['latency']['p99']}
+                for (network, kind, method), stats in self.stats().items()]
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+
+
+class PrometheusHook:
+    """
+    Exports events to prometheus_client metrics labelled by network, kind and method
+    """
+
+    def __init__(self, registry=None, namespace: str = 'snakewallet'):
+        from prometheus_client import REGISTRY, Counter as PromCounter, Histogram as PromHistogram
+
+        registry = registry or REGISTRY
+        labels = ('network', 'kind', 'method')
+        self.requests = PromCounter('requests', 'Measured operations', labels, namespace=namespace,
+                                    registry=registry)
+        self.errors = PromCounter('errors', 'Failed operations', labels + ('error',), namespace=namespace,
+                                  registry=registry)
+        self.latency = PromHistogram('latency_seconds', 'Operation latency', labels, namespace=namespace,
+                                     buckets=LATENCY_BUCKETS, registry=registry)
+        self.request_size = PromHistogram('request_bytes', 'Request payload size', labels, namespace=namespace,
+                                          buckets=SIZE_BUCKETS, registry=registry)
+        self.response_size = PromHistogram('response_bytes', 'Response payload size', labels, namespace=namespace,
+                                           buckets=SIZE_BUCKETS, registry=registry)
+
+    def __call__(self, event: RequestEvent):
+        labels = (event.network or '', event.kind, event.method)
+        self.requests.labels(*labels).inc()
+        if event.error is not None:
+            self.errors.labels(*labels, event.error).inc()
+        self.latency.labels(*labels).observe(event.duration)
+        if event.request_size is not None:
+            self.request_size.labels(*labels).observe(event.request_size)
+        if event.response_size is not None:
+            self.response_size.labels(*labels).observe(event.response_size)
+
+
+class OpenTelemetryHook:
+    """
+    Records events with an OpenTelemetry meter, attributes are network, kind, method and error
+    """
+
+    def __init__(self, meter=None):
+        if meter is None:
+            from opentelemetry import metrics as otel_metrics
+            meter = otel_metrics.get_meter('snakewallet')
+        self.requests = meter.create_counter('snakewallet.requests', description='Measured operations')
+        self.latency = meter.create_histogram('snakewallet.latency', unit='s', description='Operation latency')
+        self.request_size = meter.create_histogram('snakewallet.request_size', unit='By')
+        self.response_size = meter.create_histogram('snakewallet.response_size', unit='By')
+
+    def __call__(self, event: RequestEvent):
+        attributes = {'network': event.network or '', 'kind': event.kind, 'method': event.method}
+        if event.error is not None:
+            attributes['error'] = event.error
+        self.requests.add(1, attributes)
+        self.latency.record(event.duration, attributes)
+        if event.request_size is not None:
+            self.request_size.record(event.request_size, attributes)
+        if event.response_size is not None:
+            self.response_size.record(event.response_size, attributes)
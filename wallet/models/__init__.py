@@ -1,6 +1,16 @@
-from .account import Account
-from .contract import Contract
-from .transaction import Transaction
+import importlib
 
+from .compact import CompactAccount, CompactContract
 
-__all__ = ["Account", "Contract", "Transaction"]
+_MODELS = {'Account': 'account', 'Contract': 'contract', 'Transaction': 'transaction'}
+
+
+def __getattr__(name):
+    # The pydantic models are imported on first use, the adapters only need the compact classes
+    module = _MODELS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f'{__name__}.{module}'), name)
+
+
+__all__ = ["Account", "Contract", "Transaction", "CompactAccount", "CompactContract"]
@@ -1,7 +1,6 @@
 from typing import Union, Optional
 
 import base58
-from hexbytes import HexBytes
 from pydantic import BaseModel
 
 
@@ -26,6 +25,7 @@ class Account(BaseModel):
         #     else:
         #         address = bytes.fromhex(address)
         if isinstance(private_key, str):
+            from hexbytes import HexBytes
             private_key = HexBytes(private_key)
         return Account(address=address, private_key=private_key)
 
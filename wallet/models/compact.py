@@ -0,0 +1,63 @@
+import sys
+from typing import NamedTuple, Optional, Union
+
+from wallet.registry import load_abi
+
+
+def intern_address(address: Optional[str]) -> Optional[str]:
+    return sys.intern(address) if isinstance(address, str) else address
+
+
+class CompactAccount(NamedTuple):
+    """
+    Immutable account without per instance dict, the adapters use it in place of the pydantic Account
+    """
+    address: Optional[str] = None
+    private_key: Optional[bytes] = None  # raw bytes, a str key is stored UTF-8 encoded like the pydantic Account
+
+    @staticmethod
+    def create(address: str = None, private_key: Union[str, bytes] = None) -> 'CompactAccount':
+        """
+        Same rules as Account.create: 64 characters without a private key are a hex private key.
+        The address is interned, so an address parsed many times is stored once
+        """
+        if not private_key and len(address) == 64:
+            private_key = address
+            address = None
+        if isinstance(private_key, str):
+            private_key = bytes.fromhex(private_key[2:] if private_key[:2] in ('0x', '0X') else private_key)
+        return CompactAccount(intern_address(address), private_key)
+
+    @property
+    def address_bytes(self):
+        return self.address
+
+    def to_model(self):
+        """
+        The pydantic Account, built without validation
+        """
+        from wallet.models.account import Account
+        return Account.model_construct(address=self.address, private_key=self.private_key)
+
+    def __repr__(self):
+        # The private key is never shown
+        return f"CompactAccount(address={self.address!r})"
+
+
+class CompactContract(NamedTuple):
+    """
+    Contract address and ABI, the adapters use it in place of the pydantic Contract. The ABI list is shared
+    """
+    address: str
+    abi: Optional[list] = None
+
+    def get_abi(self, path: str = None) -> list:
+        # load_abi caches the parsed file, there is nothing to store on the instance
+        return self.abi or load_abi(f'{path or "wallet/abi/"}{self.address}.json')
+
+    def to_model(self):
+        from wallet.models.contract import Contract
+        return Contract.model_construct(address=self.address, abi=self.abi)
+
+    def __repr__(self):
+        return f"CompactContract(address={self.address!r})"
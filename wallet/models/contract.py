@@ -1,8 +1,9 @@
-import json
 from typing import Optional
 
 from pydantic import BaseModel
 
+from wallet.registry import load_abi
+
 
 class Contract(BaseModel):
     address: str
@@ -14,6 +15,5 @@ class Contract(BaseModel):
 
     def get_abi(self, path: str = None) -> list:
         if not self.abi:
-            with open(f'{path or "wallet/abi/"}{self.address}.json') as f:
-                self.abi = json.load(f)
+            self.abi = load_abi(f'{path or "wallet/abi/"}{self.address}.json')
         return self.abi
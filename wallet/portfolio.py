@@ -0,0 +1,221 @@
+import inspect
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from wallet.main import Wallet
+from wallet.types import BalanceTable, Network, NetworkBalances, Token
+
+DEFAULT_CONCURRENCY = 4  # get_balances calls in flight per network
+CHUNK_SIZE = 200  # addresses per get_balances call
+
+
+def network_key(network: Network) -> str:
+    return network.name or str(network.rpc)
+
+
+def _lookup(options: dict, network: Network, default=None):
+    # Per network options are keyed by network name or by adapter, e.g. {'w3': ..., 'TRON': ...}
+    for key in (network_key(network), network.adapter):
+        if key in options:
+            return options[key]
+    return default
+
+
+def _failed_table(addresses: list, tokens: list, error: str) -> BalanceTable:
+    return BalanceTable(addresses=addresses, tokens=tokens, balances=[[None] * len(tokens) for _ in addresses],
+                        errors={(i, j): error for i in range(len(addresses)) for j in range(len(tokens))})
+
+
+class _NetworkScan:
+    """
+    Chunks of one network, the last chunk to finish puts the scan into the done queue
+    """
+
+    def __init__(self, network: Network, addresses: list, tokens: list, chunk_size: int, started: float,
+                 done: queue.Queue):
+        self.network = network
+        self.addresses = addresses
+        self.tokens = tokens
+        self.started = started
+        self.chunks = [(i, min(i + chunk_size, len(addresses))) for i in range(0, len(addresses), chunk_size)]
+        self.tables: List[Optional[BalanceTable]] = [None] * len(self.chunks)
+        self.futures: List[Future] = []
+        self.seconds = None
+        self._remaining = len(self.chunks)
+        self._done = done
+        self._lock = threading.Lock()
+        if not self.chunks:
+            self.seconds = 0.0
+            done.put(self)
+
+    def finish(self, index: int, table: BalanceTable):
+        with self._lock:
+            self.tables[index] = table
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            self.seconds = time.monotonic() - self.started
+            self._done.put(self)
+
+    def result(self) -> NetworkBalances:
+        """
+        The chunks merged into one table, chunks that did not finish fail with TimeoutError
+        """
+        balances = []
+        errors = {}
+        with self._lock:
+            tables = list(self.tables)
+        for (start, end), table in zip(self.chunks, tables):
+            if table is None:
+                table = _failed_table(self.addresses[start:end], self.tokens, 'TimeoutError: scan timed out')
+            balances.extend(table.balances)
+            errors.update({(start + i, j): error for (i, j), error in table.errors.items()})
+        seconds = self.seconds if self.seconds is not None else time.monotonic() - self.started
+        table = BalanceTable(addresses=self.addresses, tokens=self.tokens, balances=balances, errors=errors)
+        return NetworkBalances(network=self.network, table=table, seconds=seconds)
+
+
+class PortfolioScanner:
+    """
+    Balances of a set of addresses on many networks at once. Every network has its own thread pool,
+    so a slow or failing chain delays only its own result. A network is read with the get_balances
+    of its adapter, Multicall3 on EVM, in chunks of chunk_size addresses. Adapters that send the requests of
+    a chunk concurrently, e.g. TRON, share one request pool of the network, so concurrency also bounds them
+    """
+
+    def __init__(self, wallets: Iterable[Wallet] = None, wallet_options: dict = None,
+                 concurrency: Union[int, Dict[str, int]] = DEFAULT_CONCURRENCY, chunk_size: int = CHUNK_SIZE):
+        """
+        :param wallets: wallets to reuse, other networks get a Wallet created with wallet_options
+        :param concurrency: chunks and requests in flight per network, a dict is keyed by network name or adapter
+        :param chunk_size: addresses per get_balances call
+        """
+        self._wallets: Dict[str, Wallet] = {network_key(wallet.get_network()): wallet for wallet in wallets or ()}
+        self._wallet_options = wallet_options or {}
+        self._concurrency = concurrency
+        self.chunk_size = chunk_size
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        # Requests of the chunks, separate from the chunk pool: a chunk waiting for its requests holds no worker
+        self._request_executors: Dict[str, ThreadPoolExecutor] = {}
+        self._wallet_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def wallet(self, network: Network) -> Wallet:
+        key = network_key(network)
+        wallet = self._wallets.get(key)
+        if wallet is not None:
+            return wallet
+        with self._lock:
+            lock = self._wallet_locks.setdefault(key, threading.Lock())
+        # Wallets of different networks are created in parallel, the first one of a chain imports its SDK
+        with lock:
+            wallet = self._wallets.get(key)
+            if wallet is None:
+                wallet = self._wallets[key] = Wallet(network, **self._wallet_options)
+        return wallet
+
+    def concurrency(self, network: Network) -> int:
+        if isinstance(self._concurrency, int):
+            return self._concurrency
+        return _lookup(self._concurrency, network, DEFAULT_CONCURRENCY)
+
+    def _executor(self, network: Network, executors: Dict[str, ThreadPoolExecutor] = None,
+                  prefix: str = 'portfolio') -> ThreadPoolExecutor:
+        executors = self._executors if executors is None else executors
+        key = network_key(network)
+        with self._lock:
+            executor = executors.get(key)
+            if executor is None:
+                executor = executors[key] = ThreadPoolExecutor(self.concurrency(network),
+                                                               thread_name_prefix=f'{prefix}-{key}')
+            return executor
+
+    def _balance_options(self, network: Network, wallet: Wallet) -> dict:
+        if 'executor' not in inspect.signature(wallet.adapter.get_balances).parameters:
+            return {}
+        return {'executor': self._executor(network, self._request_executors, 'portfolio-requests')}
+
+    def _read(self, scan: _NetworkScan, index: int):
+        start, end = scan.chunks[index]
+        addresses = scan.addresses[start:end]
+        try:
+            wallet = self.wallet(scan.network)
+            table = wallet.get_balances(addresses, scan.tokens, **self._balance_options(scan.network, wallet))
+        except Exception as e:
+            table = _failed_table(addresses, scan.tokens, f'{e.__class__.__name__}: {e}')
+        scan.finish(index, table)
+
+    def scan(self, addresses: Union[Iterable[str], Dict[str, Iterable[str]]],
+             holdings: Iterable[Tuple[Network, Optional[Token]]], timeout: float = None) -> Iterator[NetworkBalances]:
+        """
+        Read every holding of every address, all networks at the same time
+        :param addresses: addresses to read on every network, or a dict of them keyed by network name or adapter,
+            e.g. {'w3': evm_addresses, 'tron': tron_addresses}
+        :param holdings: (network, token) pairs, token None is the native coin
+        :param timeout: seconds for the whole scan. Networks still running then are returned with the chunks
+            that finished, the other cells fail with TimeoutError
+        :return: a NetworkBalances per network, in the order the networks finish
+        """
+        started = time.monotonic()
+        networks: Dict[str, Tuple[Network, list]] = {}
+        for network, token in holdings:
+            tokens = networks.setdefault(network_key(network), (network, []))[1]
+            if token not in tokens:
+                tokens.append(token)
+        if not isinstance(addresses, dict):
+            addresses = list(addresses)
+
+        done = queue.Queue()
+        scans = []
+        for network, tokens in networks.values():
+            network_addresses = list(_lookup(addresses, network, ())) if isinstance(addresses, dict) else addresses
+            scan = _NetworkScan(network, network_addresses, tokens, self.chunk_size, started, done)
+            executor = self._executor(network)
+            scan.futures = [executor.submit(self._read, scan, index) for index in range(len(scan.chunks))]
+            scans.append(scan)
+
+        pending = {id(scan): scan for scan in scans}
+        try:
+            while pending:
+                remaining = None if timeout is None else timeout - (time.monotonic() - started)
+                try:
+                    scan = done.get(timeout=max(remaining, 0) if remaining is not None else None)
+                except queue.Empty:
+                    break
+                del pending[id(scan)]
+                yield scan.result()
+            for scan in list(pending.values()):
+                for future in scan.futures:
+                    future.cancel()
+                del pending[id(scan)]
+                yield scan.result()
+        finally:
+            # The consumer stopped early, chunks that did not start are not needed
+            for scan in pending.values():
+                for future in scan.futures:
+                    future.cancel()
+
+    def scan_all(self, addresses: Union[Iterable[str], Dict[str, Iterable[str]]],
+                 holdings: Iterable[Tuple[Network, Optional[Token]]],
+                 timeout: float = None) -> Dict[str, NetworkBalances]:
+        """
+        :return: results of scan keyed by network name
+        """
+        return {network_key(result.network): result for result in self.scan(addresses, holdings, timeout)}
+
+    def close(self):
+        with self._lock:
+            executors = list(self._executors.values()) + list(self._request_executors.values())
+            self._executors.clear()
+            self._request_executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
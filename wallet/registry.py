@@ -0,0 +1,180 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+ABI_CACHE_SIZE = 256
+CONTRACT_CACHE_SIZE = 1024
+COMPILED_CACHE_SIZE = 256
+
+
+class LRUCache:
+    """
+    Thread safe size bounded mapping that evicts the least recently used entry
+    and optionally entries older than ttl seconds
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None, on_evict: Callable[[Any], None] = None):
+        """
+        :param on_evict: called with every value that leaves the cache by eviction, expiry, pop or clear
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._on_evict = on_evict
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.RLock()
+
+    @property
+    def lock(self) -> threading.RLock:
+        """
+        Held while values are evicted, hold it to read a value that on_evict may modify
+        """
+        return self._lock
+
+    def get(self, key: Hashable, factory: Callable[[], Any] = None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._evict(self._data.pop(key)[0])
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return entry[0]
+        if factory is None:
+            return None
+        value = factory()
+        self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value):
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None and previous[0] is not value:
+                self._evict(previous[0])
+            self._data[key] = (value, time.monotonic() + self.ttl if self.ttl else None)
+            while len(self._data) > self.maxsize:
+                self._evict(self._data.popitem(last=False)[1][0])
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._evict(entry[0])
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            for value, _ in self._data.values():
+                self._evict(value)
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _evict(self, value):
+        if self._on_evict is not None:
+            self._on_evict(value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+class ContractEntry:
+    """
+    Compiled contract object with its parsed ABI and the function objects requested so far
+    """
+    __slots__ = ('abi', 'contract', '_functions', '_function_factory')
+
+    def __init__(self, abi: list, contract, function_factory: Callable[[Any, str], Any]):
+        self.abi = abi
+        self.contract = contract
+        self._functions = {}
+        self._function_factory = function_factory
+
+    def function(self, name: Hashable, factory: Callable[[Any, Hashable], Any] = None):
+        """
+        :param factory: builds the function object in place of the function factory, e.g. by selector
+        """
+        try:
+            return self._functions[name]
+        except KeyError:
+            function = self._functions[name] = (factory or self._function_factory)(self.contract, name)
+            return function
+
+
+_abis = LRUCache(ABI_CACHE_SIZE)
+_abi_hashes = LRUCache(ABI_CACHE_SIZE)
+_contracts = LRUCache(CONTRACT_CACHE_SIZE)
+_compiled = LRUCache(COMPILED_CACHE_SIZE)
+
+
+def load_abi(filename: str) -> list:
+    """
+    Parsed ABI file, missing files are remembered too. The returned list is shared, do not modify it
+    """
+    def factory():
+        try:
+            with open(filename) as f:
+                return json.load(f)
+        except FileNotFoundError as e:
+            return e
+    abi = _abis.get(filename, factory)
+    if isinstance(abi, FileNotFoundError):
+        raise FileNotFoundError(abi.errno, abi.strerror, filename)
+    return abi
+
+
+def abi_hash(abi: list) -> str:
+    # The hash is remembered per list object, ABIs are expected to be immutable once used
+    entry = _abi_hashes.get(id(abi))
+    if entry is None or entry[0] is not abi:
+        entry = (abi, hashlib.sha1(json.dumps(abi, sort_keys=True).encode()).hexdigest())
+        _abi_hashes.set(id(abi), entry)
+    return entry[1]
+
+
+def get_contract(chain: Hashable, client, address: str, abi: list,
+                 factory: Callable[[], Any], function_factory: Callable[[Any, str], Any]) -> ContractEntry:
+    """
+    Process wide compiled contract keyed by (chain, client, address, ABI hash). The contract object is bound
+    to the client it was built with, so every client gets its own entry
+    :param client: client of the adapter, factory binds the contract to it
+    :param factory: builds the library contract object on a miss
+    :param function_factory: returns a function object of the contract by name
+    """
+    # The cached contract references the client, so its id is not reused while the entry exists
+    key = (chain, id(client), address.lower() if address.startswith('0x') else address, abi_hash(abi))
+    return _contracts.get(key, lambda: ContractEntry(abi, factory(), function_factory))
+
+
+def get_compiled(abi: list, factory: Callable[[list], Any]):
+    """
+    Chain independent object compiled from an ABI, e.g. a decoder, keyed by (factory, ABI hash)
+    """
+    return _compiled.get((factory, abi_hash(abi)), lambda: factory(abi))
+
+
+def stats() -> dict:
+    return {'abi': _abis.stats(), 'contract': _contracts.stats(), 'compiled': _compiled.stats()}
+
+
+def clear():
+    _abis.clear()
+    _abi_hashes.clear()
+    _contracts.clear()
+    _compiled.clear()
@@ -0,0 +1,35 @@
+import os
+from concurrent.futures import Executor
+from typing import Callable, List, Sequence, Tuple, TypeVar
+
+SIGN_CHUNK_SIZE = 256  # payloads per task, large enough to hide the cost of pickling
+KEY_CACHE_SIZE = 4096  # parsed key objects kept per process
+
+Payload = TypeVar('Payload')
+
+
+def chunks(items: Sequence, size: int) -> List[Sequence]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def sign_many(sign_chunk: Callable[[Sequence[Tuple[bytes, Payload]]], list],
+              items: Sequence[Tuple[bytes, Payload]], workers: int = None, chunk_size: int = None,
+              executor: Executor = None) -> list:
+    """
+    Sign (private key, payload) pairs in chunks across a process pool
+    :param sign_chunk: module level function signing a chunk, it must be picklable
+    :param workers: processes to use, default is the number of cores. 1 signs on the calling thread
+    :param executor: reuse an existing pool instead of starting one per call
+    :return: results in input order
+    """
+    chunk_size = chunk_size or SIGN_CHUNK_SIZE
+    workers = workers or os.cpu_count() or 1
+    if executor is None and (workers == 1 or len(items) <= chunk_size):
+        return sign_chunk(items)
+    parts = chunks(items, chunk_size)
+    if executor is not None:
+        results = executor.map(sign_chunk, parts)
+        return [result for part in results for result in part]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(workers, len(parts))) as executor:
+        return [result for part in executor.map(sign_chunk, parts) for result in part]
@@ -1,7 +1,7 @@
-import json
-from typing import TypedDict, NewType, Union, NamedTuple, List
+from decimal import Decimal
+from typing import TypedDict, NewType, Union, NamedTuple, List, Dict, Tuple, Optional
 
-from pydantic import BaseModel
+from wallet.registry import load_abi
 
 URI = NewType("URI", str)
 
@@ -21,6 +21,8 @@ class Network(NamedTuple):
     block_explorer: str = None
     coin_id: int = None  # https://github.com/trustwallet/wallet-core/blob/master/registry.json
     pancakeswap_id: str = None
+    multicall: str = None  # Multicall3 address if it is not deployed at the canonical one, TRON has none
+    block_time: float = None  # seconds between blocks, paces confirmation polling
 
 
 class EthereumNetwork(Network):
@@ -42,7 +44,122 @@ class Token(NamedTuple):
 
     def get_abi(self):
         try:
-            with open(f'wallet/abi/{self.address}.json') as f:
-                return json.load(f)
+            return load_abi(f'wallet/abi/{self.address}.json')
         except FileNotFoundError:
             return self._DEFAULT_ABI
+
+
+class BalanceTable(NamedTuple):
+    """
+    Dense result of a bulk balance query: balances[i][j] is the balance of addresses[i] in tokens[j],
+    None in tokens stands for the native coin. Failed cells are None and their error is in errors[(i, j)]
+    """
+    addresses: list
+    tokens: list
+    balances: list
+    errors: Dict[Tuple[int, int], str]
+
+    def get(self, address, token: Token = None):
+        return self.balances[self.addresses.index(address)][self.tokens.index(token)]
+
+    def failed(self) -> list:
+        return [(self.addresses[i], self.tokens[j], error) for (i, j), error in sorted(self.errors.items())]
+
+
+class NetworkBalances(NamedTuple):
+    """
+    Balances of one network in a portfolio scan, seconds is the time from the start of the scan
+    until the network finished. Cells that failed or timed out are None with their error in the table
+    """
+    network: Network
+    table: BalanceTable
+    seconds: float
+
+
+class RecipientCheck(NamedTuple):
+    """
+    Pre-flight checks of one payment. Fields of a failed check are None and its error is in errors
+    """
+    address: str
+    amount: Union[float, Decimal]
+    balance_native: Optional[Decimal]
+    balance_token: Optional[Decimal]
+    history: Optional[List[dict]]  # earlier transfers from the sender: tx_id, timestamp in ms and amount
+    risky: Optional[bool]  # marked as risky by Tronscan
+    estimate: Optional[dict]  # resources and fees of the transfer
+    errors: Dict[str, str]
+
+
+class PreflightReport(NamedTuple):
+    """
+    Pre-flight checks of payments from one sender. Estimates share one snapshot of the sender resources,
+    each as if its transfer were the only one
+    """
+    sender: str
+    token: Optional[Token]
+    sender_balance: Optional[Decimal]
+    recipients: List[RecipientCheck]
+    errors: Dict[str, str]
+    seconds: float
+
+    @property
+    def total_amount(self):
+        return sum(recipient.amount for recipient in self.recipients)
+
+    @property
+    def sufficient(self) -> bool:
+        return self.sender_balance is not None and self.sender_balance >= self.total_amount
+
+    @property
+    def energy_required(self) -> int:
+        return sum(recipient.estimate['energy_required'] for recipient in self.recipients if recipient.estimate)
+
+    @property
+    def energy_lack(self) -> int:
+        """
+        Energy to rent so that all transfers are paid with energy
+        """
+        available = next((recipient.estimate['energy_available'] for recipient in self.recipients
+                          if recipient.estimate), 0)
+        return max(self.energy_required - available, 0)
+
+
+class TransferLog(NamedTuple):
+    """
+    Decoded ERC-20 Transfer event, value is in the smallest token unit
+    """
+    token: str
+    sender: str
+    receiver: str
+    value: int
+    block_number: int
+    block_hash: str
+    tx_hash: str
+    log_index: int
+
+
+class Deposit(NamedTuple):
+    """
+    Transfer to a watched address found in a block, token is None for the native coin.
+    Amount is in the smallest unit
+    """
+    address: str
+    token: Optional[str]
+    amount: int
+    sender: str
+    tx_hash: str
+    block_number: int
+
+
+class RequestEvent(NamedTuple):
+    """
+    One measured operation: kind is 'rpc' for an outbound request, 'retry' for a failover to another endpoint
+    and 'wallet' for a Wallet method. Sizes are in bytes, None where they are not known
+    """
+    network: Optional[str]
+    kind: str
+    method: str
+    duration: float
+    request_size: Optional[int] = None
+    response_size: Optional[int] = None
+    error: Optional[str] = None  # exception class name
@@ -0,0 +1,339 @@
+import hashlib
+import heapq
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+
+import base58
+
+from wallet.types import Deposit
+
+MAGIC = b'WSET'
+HEADER = struct.Struct('<4sBBHQQ')  # magic, record size, hash count, reserved, record count, bloom bits
+EVM_RECORD_SIZE = 20
+TRON_RECORD_SIZE = 21  # 0x41 prefix and the 20 byte account
+BLOOM_ERROR_RATE = 0.001
+SORT_RUN_SIZE = 1_000_000  # addresses sorted in memory per run while building
+
+EVM_BLOCK_BATCH = 20  # full blocks per JSON-RPC batch, their Transfer logs come in the same batch
+TRON_BLOCK_BATCH = 100  # getblockbylimitnext limit
+TRON_LOG_WORKERS = 8  # concurrent gettransactioninfobyblocknum requests
+FOLLOW_INTERVAL = 3
+
+# Transfer(address,address,uint256) of ERC-20 and TRC-20 tokens
+TRANSFER_TOPIC = 'ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+
+
+def address_bytes(address: Union[str, bytes], record_size: int = EVM_RECORD_SIZE) -> bytes:
+    """
+    Packed binary form of an EVM (0x hex) or TRON (base58 or 41 hex) address
+    """
+    if isinstance(address, bytes):
+        raw = address
+    elif address.startswith('T'):
+        raw = base58.b58decode_check(address)
+    else:
+        raw = bytes.fromhex(address[2:] if address.startswith('0x') else address)
+    if len(raw) == record_size:
+        return raw
+    if record_size == TRON_RECORD_SIZE and len(raw) == EVM_RECORD_SIZE:
+        return b'\x41' + raw
+    if record_size == EVM_RECORD_SIZE and len(raw) == TRON_RECORD_SIZE:
+        return raw[1:]
+    raise ValueError(f"Not an address: {address!r}")
+
+
+def _bloom_positions(key: bytes, hashes: int, bits: int) -> Iterator[int]:
+    digest = hashlib.blake2b(key, digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+
+def _sorted_runs(records: Iterable[bytes], directory: str) -> List[BinaryIO]:
+    runs = []
+    run = []
+    for record in records:
+        run.append(record)
+        if len(run) >= SORT_RUN_SIZE:
+            runs.append(_write_run(sorted(set(run)), directory))
+            run = []
+    if run or not runs:
+        runs.append(_write_run(sorted(set(run)), directory))
+    return runs
+
+
+def _write_run(records: List[bytes], directory: str) -> BinaryIO:
+    f = tempfile.TemporaryFile(dir=directory)
+    f.write(b''.join(records))
+    f.seek(0)
+    return f
+
+
+def _read_run(f: BinaryIO, record_size: int) -> Iterator[bytes]:
+    while True:
+        record = f.read(record_size)
+        if not record:
+            return
+        yield record
+
+
+class WatchSet:
+    """
+    Set of watched addresses in a memory mapped file: a Bloom filter followed by the sorted packed addresses.
+    Lookups read the file through the page cache, so memory use does not grow with the number of addresses
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.record_size, self._hashes, _, self._count, self._bits = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a watch set file: {path}")
+        self._bloom_offset = HEADER.size
+        self._records_offset = HEADER.size + (self._bits + 7) // 8
+
+    @classmethod
+    def build(cls, path: str, addresses: Iterable[Union[str, bytes]], record_size: int = EVM_RECORD_SIZE,
+              error_rate: float = BLOOM_ERROR_RATE) -> 'WatchSet':
+        """
+        Write a watch set file. Addresses are sorted in runs on disk and merged, duplicates are dropped
+        :param record_size: 20 for EVM, 21 for TRON
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        runs = _sorted_runs((address_bytes(address, record_size) for address in addresses), directory)
+        try:
+            count = sum(os.fstat(run.fileno()).st_size for run in runs) // record_size
+            # Size the filter for the upper bound, duplicates across runs only make it sparser
+            bits = max(64, int(-max(count, 1) * math.log(error_rate) / math.log(2) ** 2))
+            hashes = max(1, round(bits / max(count, 1) * math.log(2)))
+            bloom = bytearray((bits + 7) // 8)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, record_size, hashes, 0, 0, bits))
+                f.write(bloom)
+                written = 0
+                previous = None
+                for record in heapq.merge(*(_read_run(run, record_size) for run in runs)):
+                    if record == previous:
+                        continue
+                    previous = record
+                    for position in _bloom_positions(record, hashes, bits):
+                        bloom[position >> 3] |= 1 << (position & 7)
+                    f.write(record)
+                    written += 1
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, record_size, hashes, 0, written, bits))
+                f.write(bloom)
+            os.replace(tmp, path)
+        finally:
+            for run in runs:
+                run.close()
+        return cls(path)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, address: Union[str, bytes]) -> bool:
+        try:
+            return self.contains(address_bytes(address, self.record_size))
+        except ValueError:
+            return False
+
+    def contains(self, record: bytes) -> bool:
+        """
+        :param record: packed address of record_size bytes
+        """
+        data = self._map
+        bloom_offset = self._bloom_offset
+        for position in _bloom_positions(record, self._hashes, self._bits):
+            if not data[bloom_offset + (position >> 3)] & (1 << (position & 7)):
+                return False
+        size = self.record_size
+        offset = self._records_offset
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = offset + mid * size
+            value = data[start:start + size]
+            if value == record:
+                return True
+            if value < record:
+                lo = mid + 1
+            else:
+                hi = mid
+        return False
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _transfer_recipient(topics: List[str], data: str) -> Optional[tuple]:
+    """
+    Sender, recipient and amount of a token Transfer log, None for other logs
+    :param topics: hex topics, with or without 0x
+    :param data: hex data, with or without 0x
+    """
+    # ERC-721 Transfer has the same topic with an indexed token id
+    if len(topics) != 3 or topics[0][-64:].lower() != TRANSFER_TOPIC:
+        return None
+    data = data[2:] if data.startswith('0x') else data
+    return topics[1][-40:], topics[2][-40:], int(data[:64] or '0', 16)
+
+
+class EvmBlockStreamer:
+    """
+    Pulls full blocks and their Transfer logs in JSON-RPC batches and emits native transfers and token transfers
+    to watched addresses. Token transfers come from logs, so calls through contracts and multisends are found too.
+    Native transfers are read from transaction values without receipts or traces: value moved by internal calls
+    is not seen, and deposits should be confirmed before crediting them, e.g. with track_transactions
+    """
+
+    def __init__(self, adapter, watch_set: WatchSet, batch_size: int = EVM_BLOCK_BATCH):
+        """
+        :param adapter: W3Adapter
+        """
+        self._adapter = adapter
+        self.watch_set = watch_set
+        self.batch_size = batch_size
+
+    def _blocks(self, numbers: List[int]) -> tuple:
+        """
+        :return: (blocks, Transfer logs of the blocks)
+        """
+        logs_filter = {'fromBlock': hex(numbers[0]), 'toBlock': hex(numbers[-1]), 'topics': ['0x' + TRANSFER_TOPIC]}
+        futures = self._adapter._batch.request_many([('eth_getBlockByNumber', [hex(number), True])
+                                                     for number in numbers] + [('eth_getLogs', [logs_filter])])
+        results = [future.result() for future in futures]
+        return results[:-1], results[-1] or []
+
+    def deposits(self, block: dict, logs: Iterable[dict] = ()) -> Iterator[Deposit]:
+        """
+        :param logs: Transfer logs of the block
+        """
+        number = int(block['number'], 16)
+        contains = self.watch_set.contains
+        for tx in block['transactions']:
+            to = tx.get('to')
+            value = int(tx['value'], 16)
+            if to and value and contains(bytes.fromhex(to[2:])):
+                yield Deposit(address=to, token=None, amount=value, sender=tx['from'], tx_hash=tx['hash'],
+                              block_number=number)
+        for log in logs:
+            transfer = _transfer_recipient(log['topics'], log['data'])
+            if transfer and not log.get('removed') and contains(bytes.fromhex(transfer[1])):
+                yield Deposit(address='0x' + transfer[1], token=log['address'], amount=transfer[2],
+                              sender='0x' + transfer[0], tx_hash=log['transactionHash'], block_number=number)
+
+    def stream(self, from_block: int, to_block: int) -> Iterator[Deposit]:
+        for start in range(from_block, to_block + 1, self.batch_size):
+            blocks, logs = self._blocks(list(range(start, min(start + self.batch_size, to_block + 1))))
+            by_block: Dict[int, list] = defaultdict(list)
+            for log in logs:
+                by_block[int(log['blockNumber'], 16)].append(log)
+            for block in blocks:
+                if block:
+                    yield from self.deposits(block, by_block.get(int(block['number'], 16), ()))
+
+    def follow(self, from_block: int, confirmations: int = 0, interval: float = FOLLOW_INTERVAL) -> Iterator[Deposit]:
+        """
+        Stream new blocks forever, confirmations blocks behind the head
+        """
+        while True:
+            head = self._adapter._client.eth.block_number - confirmations
+            if head >= from_block:
+                yield from self.stream(from_block, head)
+                from_block = head + 1
+            else:
+                time.sleep(interval)
+
+
+class TronBlockStreamer:
+    """
+    Pulls blocks in ranges with getblockbylimitnext and the logs of their transactions with
+    gettransactioninfobyblocknum, and emits TRX transfers and TRC-20 Transfer logs to watched addresses.
+    Token transfers made through other contracts are found too
+    """
+
+    def __init__(self, adapter, watch_set: WatchSet, batch_size: int = TRON_BLOCK_BATCH,
+                 workers: int = TRON_LOG_WORKERS):
+        """
+        :param adapter: TronAdapter
+        :param workers: concurrent requests for the transaction infos of the blocks of a range
+        """
+        self._adapter = adapter
+        self.watch_set = watch_set
+        self.batch_size = batch_size
+        self.workers = workers
+
+    def _blocks(self, from_block: int, to_block: int) -> list:
+        # endNum is exclusive
+        response = self._adapter._client.provider.make_request(
+            'wallet/getblockbylimitnext', {'startNum': from_block, 'endNum': to_block + 1})
+        return response.get('block', [])
+
+    def _transaction_infos(self, number: int) -> list:
+        return self._adapter._client.provider.make_request('wallet/gettransactioninfobyblocknum', {'num': number})
+
+    @staticmethod
+    def _base58(address_hex: str) -> str:
+        return base58.b58encode_check(bytes.fromhex(address_hex)).decode()
+
+    @staticmethod
+    def _has_calls(block: dict) -> bool:
+        return any(contract['type'] == 'TriggerSmartContract'
+                   for tx in block.get('transactions', []) for contract in tx['raw_data'].get('contract', []))
+
+    def deposits(self, block: dict, infos: Iterable[dict] = ()) -> Iterator[Deposit]:
+        """
+        :param infos: transaction infos of the block, their logs hold the token transfers
+        """
+        number = block['block_header']['raw_data']['number']
+        contains = self.watch_set.contains
+        for tx in block.get('transactions', []):
+            if tx.get('ret', [{}])[0].get('contractRet', 'SUCCESS') != 'SUCCESS':
+                continue
+            for contract in tx['raw_data'].get('contract', []):
+                value = contract['parameter']['value']
+                if contract['type'] == 'TransferContract' and contains(bytes.fromhex(value['to_address'])):
+                    yield Deposit(address=self._base58(value['to_address']), token=None, amount=value['amount'],
+                                  sender=self._base58(value['owner_address']), tx_hash=tx['txID'],
+                                  block_number=number)
+        for info in infos:
+            # Reverted transactions keep no logs, but a failed result is checked all the same
+            if info.get('result') == 'FAILED':
+                continue
+            for log in info.get('log', []):
+                transfer = _transfer_recipient(log.get('topics', []), log.get('data', ''))
+                if transfer and contains(b'\x41' + bytes.fromhex(transfer[1])):
+                    yield Deposit(address=self._base58('41' + transfer[1]), token=self._base58('41' + log['address']),
+                                  amount=transfer[2], sender=self._base58('41' + transfer[0]), tx_hash=info['id'],
+                                  block_number=number)
+
+    def stream(self, from_block: int, to_block: int) -> Iterator[Deposit]:
+        with ThreadPoolExecutor(self.workers) as executor:
+            for start in range(from_block, to_block + 1, self.batch_size):
+                blocks = self._blocks(start, min(start + self.batch_size - 1, to_block))
+                # Blocks without contract calls have no logs, their infos are not requested
+                numbers = [block['block_header']['raw_data']['number'] for block in blocks if self._has_calls(block)]
+                infos = dict(zip(numbers, executor.map(self._transaction_infos, numbers)))
+                for block in blocks:
+                    yield from self.deposits(block, infos.get(block['block_header']['raw_data']['number']) or ())
+
+    def follow(self, from_block: int, confirmations: int = 0, interval: float = FOLLOW_INTERVAL) -> Iterator[Deposit]:
+        while True:
+            head = self._adapter._client.get_latest_block_number() - confirmations
+            if head >= from_block:
+                yield from self.stream(from_block, head)
+                from_block = head + 1
+            else:
+                time.sleep(interval)